@@ -0,0 +1,293 @@
+import asyncio
+
+import metrics
+
+from partitioner import PricePartitioner
+from pipeline import ListingCollector
+
+
+class AsyncCrawlEngine:
+    """
+    Współbieżny silnik dla rekurencyjnego podziału cenowego.
+
+    Sprawdza liczność pod-zakresów, dzieli je i pobiera strony równolegle,
+    z ograniczoną liczbą jednoczesnych zapytań (semafor). Zapytania HTTP wykonywane
+    są w wątkach (asyncio.to_thread) przez współdzieloną sesję scrapera, więc
+    pula połączeń powinna mieć co najmniej 'concurrency' miejsc. Strony są parsowane w tych samych
+    wątkach (albo w puli procesów scrapera - ParsePool), a nie w pętli zdarzeń.
+    Deduplikacja odbywa się w pętli zdarzeń, więc wynik jest taki sam jak w sekwencyjnym
+    scrape_recursive. Nowe ogłoszenia trafiają do zapisu w tle (BatchWriter), jeśli go podano.
+    """
+
+    def __init__(self, scraper, concurrency=4, partitioner=None, writer=None, collector=None, checkpoint_key=None):
+        """
+        Args:
+            scraper (OLXGraphQLScraper): Scraper, którego metod używamy do zapytań i parsowania.
+            concurrency (int): Maksymalna liczba jednoczesnych zapytań do API.
+                Tempo zapytań reguluje współdzielony RateLimiter scrapera.
+            partitioner (PricePartitioner): Wyznacza punkty podziału zbyt dużych zakresów.
+            writer (BatchWriter): Zapis w tle; bez niego paczki są zapisywane bezpośrednio przez bazę scrapera.
+            collector (ListingCollector): Zbiór już widzianych ogłoszeń (deduplikacja), współdzielony ze scraperem.
+            checkpoint_key (str): Klucz crawla w punkcie kontrolnym scrapera (scraper.checkpoint), jeśli jest używany.
+        """
+        self.scraper = scraper
+        self.concurrency = max(1, concurrency)
+        self.partitioner = partitioner or PricePartitioner(limit=scraper.OLX_LIMIT)
+        self.writer = writer
+        self.checkpoint_key = checkpoint_key
+
+        self._semaphore = None
+        self._save_lock = None
+        self.collector = collector if collector is not None else ListingCollector()
+        self.total_saved_count = 0
+        self.leaves = []
+        # Zakresy jeszcze nieprzetworzone (front crawla do punktu kontrolnego): (price_from, price_to) -> count
+        self.pending = {}
+        # Offsety wznowienia zakresów z punktu kontrolnego: (price_from, price_to) -> offset następnej strony
+        self.offsets = {}
+        # Czy pobieranie przerwano (pominięte lub ucięte zakresy), bo osiągnięto target_results
+        self.stopped_at_target = False
+        self._checkpointing = False
+
+    def run(self, query, target_results, batch_size, category_id, state, ranges, leaves=None, offsets=None):
+        """
+        Uruchamia crawl i zwraca listę unikalnych ogłoszeń
+        (albo tylko próbkę, jeśli collector nie przechowuje pełnych ogłoszeń).
+
+        Args:
+            ranges (list): Zakresy startowe jako krotki (price_from, price_to, count);
+                count=None oznacza, że liczność trzeba sprawdzić.
+            leaves (list): Liście ukończone wcześniej (wznowienie z punktu kontrolnego).
+            offsets (dict): (price_from, price_to) -> offset, od którego wznowić pobieranie zakresu.
+        """
+        return asyncio.run(self._crawl(query, target_results, batch_size, category_id, state, ranges, leaves,
+                                       offsets))
+
+    async def _crawl(self, query, target_results, batch_size, category_id, state, ranges, leaves=None, offsets=None):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._save_lock = asyncio.Lock()
+        self.total_saved_count = 0
+        self.leaves = list(leaves or [])
+        self.offsets = dict(offsets or {})
+        self.pending = {(p_from, p_to): count for p_from, p_to, count in ranges}
+        self.stopped_at_target = False
+
+        ctx = {
+            'query': query,
+            'target_results': target_results,
+            'batch_size': batch_size,
+            'category_id': category_id,
+            'state': state
+        }
+        await asyncio.gather(*[
+            self._process_range(ctx, p_from, p_to, known_total=count) for p_from, p_to, count in ranges
+        ])
+        return self.collector.listings()
+
+    async def _call(self, func, *args, **kwargs):
+        """Wykonuje blokującą metodę scrapera w wątku, w ramach limitu współbieżności."""
+        async with self._semaphore:
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def _probe(self, ctx, p_from, p_to):
+        """Liczność zakresu i (jeśli zmieści się w limicie) jego pierwsza strona - zob. OLXGraphQLScraper._probe_task."""
+        return await self._call(
+            self.scraper._probe_task, self.partitioner, ctx['query'], ctx['category_id'], p_from, p_to,
+            ctx['batch_size'], ctx['state']
+        )
+
+    async def _range_done(self, p_from, p_to, leaf=None):
+        """Zdejmuje zakres z frontu crawla (opcjonalnie zapisując liść) i w razie potrzeby zapisuje punkt kontrolny."""
+        self.pending.pop((p_from, p_to), None)
+        self.offsets.pop((p_from, p_to), None)
+        metrics.QUEUE_DEPTH.set(len(self.pending), queue='ranges')
+        if leaf is not None:
+            self.leaves.append(leaf)
+
+        if self._checkpointing or not self.scraper._checkpoint_due():
+            return
+        # Migawka w pętli zdarzeń (spójna), zapis - po opróżnieniu kolejki zapisu - w wątku
+        pending = [(lo, hi, count) for (lo, hi), count in self.pending.items()]
+        leaves = list(self.leaves)
+        offsets = dict(self.offsets)
+        self._checkpointing = True
+        try:
+            await asyncio.to_thread(self.scraper._save_checkpoint, self.writer, self.checkpoint_key, pending, leaves,
+                                    offsets)
+        finally:
+            self._checkpointing = False
+
+    def _target_reached(self, ctx):
+        if len(self.collector) >= ctx['target_results']:
+            self.stopped_at_target = True
+            return True
+        return False
+
+    async def _process_range(self, ctx, p_from, p_to, known_total=None):
+        if self._target_reached(ctx):
+            return
+
+        if p_from is not None and p_to is not None and p_from > p_to:
+            print(f"   [OSTRZEŻENIE] Pominąłem nieprawidłowy zakres: {p_from:.2f} > {p_to:.2f}")
+            await self._range_done(p_from, p_to)
+            return
+
+        current_total = known_total
+        first_page = None
+        if current_total is None:
+            first_page, current_total = await self._probe(ctx, p_from, p_to)
+            if current_total is None:
+                print(f"   [INFO] Nie udało się sprawdzić zakresu {p_from:.2f}-{p_to:.2f}. Pomijam.")
+                await self._range_done(p_from, p_to)
+                return
+            self.pending[(p_from, p_to)] = current_total
+
+        if current_total == 0:
+            print(f"   [INFO] Brak wyników w zakresie {p_from:.2f}-{p_to:.2f}. Pomijam.")
+            await self._range_done(p_from, p_to, leaf=(p_from, p_to, 0))
+            return
+
+        limit = self.scraper.OLX_LIMIT
+
+        if current_total <= limit:
+            print(f"   [OK] Zakres {p_from:.2f}-{p_to:.2f} ma {current_total} ogłoszeń. Pobieram...")
+            await self._scrape_leaf(ctx, p_from, p_to, min(limit, current_total), first_page)
+            await self._range_done(p_from, p_to, leaf=(p_from, p_to, current_total))
+            return
+
+        # Pierwsza strona za dużego zakresu to próbka cen do wyznaczenia punktów podziału
+        if first_page:
+            self.partitioner.observe_prices(listing.price_value for listing in first_page)
+            await self._collect(ctx, first_page)
+
+        if PricePartitioner.can_split(p_from, p_to):
+            pieces = self.scraper._split_range(self.partitioner, p_from, p_to, current_total)
+            # Części zastępują zakres nadrzędny we froncie crawla
+            for lo, hi, count in pieces:
+                self.pending[(lo, hi)] = count
+            await self._range_done(p_from, p_to)
+            await asyncio.gather(*[
+                self._process_range(ctx, lo, hi, known_total=count) for lo, hi, count in pieces
+            ])
+            return
+
+        print(f"   [OSTRZEŻENIE] Nie można dalej podzielić zakresu {p_from:.2f}-{p_to:.2f} (total: {current_total}).")
+        print(f"   Dzielę go według dodatkowych wymiarów wyszukiwania (stan, region, sortowanie).")
+        # Rzadki przypadek - wykonywany sekwencyjnie w jednym wątku
+        if ctx['target_results'] - len(self.collector) < current_total:
+            self.stopped_at_target = True
+        listings, covered = await self._call(
+            self.scraper._scrape_unsplittable,
+            ctx['query'],
+            ctx['category_id'],
+            p_from,
+            p_to,
+            current_total,
+            max_results=ctx['target_results'] - len(self.collector),
+            batch_size=ctx['batch_size'],
+            state=ctx['state']
+        )
+        if not covered:
+            self.scraper._count_shortfall(p_from, p_to, current_total)
+        await self._collect(ctx, listings)
+        await self._range_done(p_from, p_to, leaf=(p_from, p_to, current_total))
+
+    async def _scrape_leaf(self, ctx, p_from, p_to, max_results, first_page=None):
+        """
+        Pobiera strony zakresu równolegle - po 'concurrency' stron naraz - i przekazuje każdą stronę
+        do deduplikacji i zapisu w kolejności offsetów, bez składania całego zakresu w pamięci.
+        'first_page' to strona pobrana już przy sprawdzaniu zakresu (nie jest pobierana ponownie).
+        Zakres przerwany w poprzednim uruchomieniu jest pobierany od offsetu z punktu kontrolnego.
+        """
+        start_offset = self.offsets.get((p_from, p_to), 0)
+        if start_offset:
+            print(f"   [CHECKPOINT] Wznawiam zakres {p_from:.2f}-{p_to:.2f} od offsetu {start_offset}.")
+        # Budżet target_results dotyczy nowych ogłoszeń (zob. _collect), nie pobranych wierszy
+        effective_max = min(max_results, self.scraper.OLX_LIMIT) - start_offset
+        if effective_max <= 0 or self._target_reached(ctx):
+            return
+
+        batch_size = ctx['batch_size']
+        first_offset = start_offset
+        if first_page is not None:
+            first_offset = batch_size if len(first_page) == batch_size else effective_max
+        offsets = [offset for offset in range(first_offset, start_offset + effective_max, batch_size)
+                   if offset < 1000]
+
+        fetched = 0
+        next_offset = start_offset
+        if first_page:
+            next_offset += batch_size
+            fetched = await self._collect_page(ctx, p_from, p_to, first_page[:effective_max], next_offset)
+
+        # Strony przetwarzamy w kolejności offsetów, zatrzymując się tak jak _scrape_batch
+        for window_start in range(0, len(offsets), self.concurrency):
+            if self._target_reached(ctx):
+                break
+            window = offsets[window_start:window_start + self.concurrency]
+            pages = await asyncio.gather(*[
+                self._call(
+                    self.scraper._fetch_parsed_page,
+                    ctx['query'],
+                    offset=offset,
+                    limit=batch_size,
+                    price_from=p_from,
+                    price_to=p_to,
+                    category_id=ctx['category_id'],
+                    state=ctx['state']
+                ) for offset in window
+            ])
+            finished = False
+            for parsed, _metadata in pages:
+                if not parsed:
+                    finished = True
+                    break
+                next_offset += batch_size
+                fetched += await self._collect_page(ctx, p_from, p_to, parsed[:effective_max - fetched],
+                                                    next_offset)
+                # Równolegle pobierane zakresy mogły w międzyczasie wyczerpać target_results
+                if len(parsed) < batch_size or fetched >= effective_max or self._target_reached(ctx):
+                    finished = True
+                    break
+            if finished:
+                break
+
+        print(f"   ✅ Zebrano {fetched} ogłoszeń z zakresu {p_from:.2f}-{p_to:.2f}.")
+
+    async def _collect_page(self, ctx, p_from, p_to, listings, next_offset):
+        """
+        Przekazuje stronę zakresu do deduplikacji i zapisu oraz zapamiętuje offset następnej strony
+        (punkt kontrolny zapisany w trakcie pobierania zakresu wznowi go od tego miejsca).
+
+        Returns:
+            int: Liczba ogłoszeń na stronie.
+        """
+        self.partitioner.observe_prices(listing.price_value for listing in listings)
+        await self._collect(ctx, listings)
+        self.offsets[(p_from, p_to)] = next_offset
+        return len(listings)
+
+    async def _collect(self, ctx, listings):
+        """
+        Deduplikuje pobrane ogłoszenia i zapisuje nowe do bazy (lub przekazuje je do zapisu w tle).
+        Przyjmuje najwyżej tyle nowych ogłoszeń, ile brakuje do target_results - zakresy pobierane
+        równolegle sprawdzają cel, zanim którykolwiek z nich coś zebrał.
+        """
+        new_listings_in_batch = self.collector.add_new(listings, limit=ctx['target_results'])
+        if self.collector.truncated:
+            self.stopped_at_target = True
+
+        if not new_listings_in_batch:
+            print("   ✓ Brak nowych ogłoszeń w tej partii.")
+            return
+
+        if self.writer is not None:
+            # put() może blokować przy pełnej kolejce (backpressure) - nie w pętli zdarzeń
+            await asyncio.to_thread(self.writer.put, new_listings_in_batch)
+            print(f"   📤 Przekazano {len(new_listings_in_batch)} nowych ogłoszeń do zapisu.")
+            return
+
+        async with self._save_lock:
+            saved = await asyncio.to_thread(self.scraper.db.save_to_database, new_listings_in_batch)
+        self.total_saved_count += saved
+        print(f"   💾 Dodano {len(new_listings_in_batch)} nowych ogłoszeń (Zapisano/Zakt: {saved})")
@@ -0,0 +1,162 @@
+"""
+Benchmark parsowania ogłoszeń: poprzedni parser (stdlib json, dwa przejścia po parametrach,
+parsowanie każdego znacznika czasu od nowa) kontra listing_parser.
+
+Uruchomienie:  python -m benchmarks.parse_bench [--listings 20000] [--repeat 5]
+
+Z --workers N mierzony jest też tryb ParsePool (N procesów, strony przekazywane z N wątków).
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import listing_parser
+from parse_pool import ParsePool
+from listing import Listing
+from mock_server import make_listing
+
+
+def make_page(listings):
+    """Surowa odpowiedź API (bytes) z podanymi ogłoszeniami."""
+    response = {'data': {'clientCompatibleListings': {
+        '__typename': 'ListingSuccess',
+        'data': listings,
+        'metadata': {'total_elements': len(listings), 'visible_total_count': len(listings)}
+    }}}
+    return json.dumps(response, ensure_ascii=False).encode('utf-8')
+
+
+def _legacy_timestamp(timestamp_str):
+    if not timestamp_str:
+        return None
+    try:
+        return datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+def _legacy_parse(listing):
+    """Parser sprzed listing_parser (punkt odniesienia benchmarku)."""
+    location = listing.get('location') or {}
+    map_data = listing.get('map') or {}
+    user = listing.get('user') or {}
+    contact = listing.get('contact') or {}
+    promotion = listing.get('promotion') or {}
+
+    price_info = None
+    for param in listing.get('params', []):
+        if param.get('key') == 'price':
+            value = param.get('value', {})
+            if value.get('__typename') == 'PriceParam':
+                price_info = {'value': value.get('value'), 'currency': value.get('currency'),
+                              'label': value.get('label'), 'negotiable': value.get('negotiable', False)}
+                break
+
+    params_list = []
+    for param in listing.get('params', []):
+        param_value = param.get('value') or {}
+        if param_value.get('__typename') == 'GenericParam':
+            params_list.append({'name': param.get('name'), 'key': param.get('key'), 'value': param_value.get('label')})
+
+    photos = listing.get('photos', [])
+    photo_urls = [photo.get('link', '').replace('{width}', '1200').replace('{height}', '900') for photo in photos]
+    city = location.get('city') or {}
+    region = location.get('region') or {}
+    district = location.get('district') or {}
+    category = listing.get('category') or {}
+
+    return Listing(
+        olx_id=listing.get('id'), title=listing.get('title'), url=listing.get('url'),
+        description=listing.get('description', ''),
+        created_time=_legacy_timestamp(listing.get('created_time')),
+        refreshed_time=_legacy_timestamp(listing.get('last_refresh_time')),
+        valid_to_time=_legacy_timestamp(listing.get('valid_to_time')),
+        offer_type=listing.get('offer_type'), business=listing.get('business', False),
+        price_value=price_info.get('value') if price_info else None,
+        price_label=price_info.get('label') if price_info else 'Brak ceny',
+        currency=price_info.get('currency') if price_info else None,
+        negotiable=price_info.get('negotiable') if price_info else False,
+        location_city=city.get('name'), location_region=region.get('name'),
+        location_district=district.get('name') if district else None,
+        latitude=map_data.get('lat'), longitude=map_data.get('lon'),
+        map_radius=map_data.get('radius'), map_zoom=map_data.get('zoom'),
+        user_id=user.get('uuid'), user_name=user.get('name'), user_type=user.get('seller_type'),
+        user_created=_legacy_timestamp(user.get('created')),
+        user_last_seen=_legacy_timestamp(user.get('last_seen')),
+        user_is_online=user.get('is_online', False), category_id=category.get('id'),
+        promoted=promotion.get('top_ad', False), highlighted=promotion.get('highlighted', False),
+        urgent=promotion.get('urgent', False), premium_ad=promotion.get('premium_ad_page', False),
+        promotion_options=promotion.get('options', []), photos_count=len(photos), photos_urls=photo_urls,
+        phone_protected=listing.get('protect_phone', False), chat_available=contact.get('chat', False),
+        courier_available=contact.get('courier', False),
+        params=json.dumps(params_list, ensure_ascii=False) if params_list else None,
+        scraped_at=datetime.now()
+    )
+
+
+def legacy_pipeline(pages):
+    count = 0
+    for page in pages:
+        batch = json.loads(page)['data']['clientCompatibleListings']['data']
+        count += len([_legacy_parse(listing) for listing in batch])
+    return count
+
+
+def fast_pipeline(pages):
+    count = 0
+    for page in pages:
+        batch = listing_parser.loads(page)['data']['clientCompatibleListings']['data']
+        count += len([listing_parser.parse_listing(listing) for listing in batch])
+    return count
+
+
+def pool_pipeline(pool, workers):
+    def run(pages):
+        with ThreadPoolExecutor(max_workers=workers) as threads:
+            return sum(len(listings) for listings, _metadata in threads.map(pool.parse, pages))
+    return run
+
+
+def measure(pipeline, pages, repeat):
+    """Najlepszy z 'repeat' przebiegów: (ogłoszenia/s, czas w s)."""
+    best = None
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = pipeline(pages)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return count / best, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parsowania ogłoszeń OLX.")
+    parser.add_argument('--listings', type=int, default=20000, help="Liczba syntetycznych ogłoszeń.")
+    parser.add_argument('--page-size', type=int, default=40, help="Liczba ogłoszeń na stronę odpowiedzi.")
+    parser.add_argument('--repeat', type=int, default=5, help="Liczba powtórzeń (liczy się najlepszy czas).")
+    parser.add_argument('--workers', type=int, default=0, help="Liczba procesów ParsePool (0 = bez puli).")
+    args = parser.parse_args()
+
+    listings = [make_listing(i) for i in range(args.listings)]
+    pages = [make_page(listings[i:i + args.page_size]) for i in range(0, len(listings), args.page_size)]
+
+    backend = 'orjson' if listing_parser.orjson is not None else 'json (stdlib)'
+    print(f"Ogłoszeń: {args.listings}, stron: {len(pages)}, dekoder: {backend}")
+
+    before, before_time = measure(legacy_pipeline, pages, args.repeat)
+    after, after_time = measure(fast_pipeline, pages, args.repeat)
+    print(f"  przed: {before:10.0f} ogłoszeń/s ({before_time:.3f} s)")
+    print(f"  po:    {after:10.0f} ogłoszeń/s ({after_time:.3f} s)")
+    print(f"  przyspieszenie: x{after / before:.2f}")
+
+    if args.workers > 0:
+        with ParsePool(args.workers, min_bytes=0) as pool:
+            pool.parse(pages[0])  # uruchomienie procesów poza pomiarem
+            pooled, pooled_time = measure(pool_pipeline(pool, args.workers), pages, args.repeat)
+        print(f"  pula ({args.workers} proc.): {pooled:10.0f} ogłoszeń/s ({pooled_time:.3f} s), x{pooled / before:.2f}")
+
+
+if __name__ == '__main__':
+    main()
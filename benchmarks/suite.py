@@ -0,0 +1,358 @@
+"""
+Zestaw benchmarków crawlera: parse_listing, save_to_database, scrape_latest i scrape_recursive
+na syntetycznym (MockGraphQLServer) lub nagranym (ReplayTransport) źródle danych i lokalnym PostgreSQL.
+
+Raportowane metryki: zapytania/s, ogłoszenia/s, p50/p95 czasu pobrania strony, liczba zapytań
+sprawdzających (liczność, cena graniczna, regiony) na crawl, zapisane wiersze/s i szczytowe RSS.
+Wyniki trafiają do pliku JSON; z --baseline są porównywane z poprzednim wynikiem, a pogorszenie
+powyżej progu kończy benchmark kodem 1.
+
+Uruchomienie:
+    python -m benchmarks.suite --source mock --total 20000 --latency 0.02
+    python -m benchmarks.suite --source replay --recordings .cache/recordings --no-db
+    python -m benchmarks.suite --baseline .cache/benchmarks/poprzedni.json
+
+Zapis do bazy używa osobnej bazy (--db-name, domyślnie 'olx_bench'), aby nie zmieniać danych produkcyjnych.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import config
+import listing_parser
+from benchmarks.parse_bench import make_page
+from database import Database
+from mock_server import make_listing
+from rate_limiter import RateLimiter
+from scraper import OLXGraphQLScraper
+from transport import TRANSPORT_MOCK, TRANSPORT_REPLAY, create_transport
+
+# Metryki, dla których mniejsza wartość jest lepsza (pozostałe liczbowe: większa jest lepsza)
+LOWER_IS_BETTER = ('elapsed_s', 'page_latency_p50_ms', 'page_latency_p95_ms', 'probe_count', 'requests',
+                   'peak_rss_mb', 'failed_requests')
+# Metryki porównywane z poprzednim wynikiem
+COMPARED_METRICS = ('requests_per_sec', 'listings_per_sec', 'rows_per_sec', 'page_latency_p50_ms',
+                    'page_latency_p95_ms', 'probe_count', 'peak_rss_mb')
+
+
+def percentile(values, fraction):
+    """Percentyl (metoda najbliższej rangi) z listy wartości."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    """Szczytowe RSS procesu w MB (ru_maxrss jest w KB na Linuksie i w bajtach na macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class TimingTransport:
+    """Transport mierzący czas, rozmiar i rodzaj (projekcję zapytania) każdego zapytania."""
+
+    def __init__(self, queries, inner=None):
+        """
+        Args:
+            queries (dict): Warianty zapytań scrapera (nazwa -> treść), do rozpoznania projekcji.
+            inner: Właściwy transport (metoda post(url, json, timeout)); można go ustawić później,
+                gdy zależy od sesji scrapera.
+        """
+        self.inner = inner
+        self._projections = {query: name for name, query in queries.items()}
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.bytes_received = 0
+
+    def post(self, url, json=None, timeout=None):
+        start = time.perf_counter()
+        response = self.inner.post(url, json=json, timeout=timeout)
+        elapsed = time.perf_counter() - start
+        projection = self._projections.get((json or {}).get('query'), 'other')
+        with self._lock:
+            self.latencies.setdefault(projection, []).append(elapsed)
+            self.bytes_received += len(response.content)
+        return response
+
+    def close(self):
+        self.inner.close()
+
+    def report(self, elapsed):
+        """Metryki zapytań dla etapu trwającego 'elapsed' sekund."""
+        pages = self.latencies.get('full', [])
+        requests_count = sum(len(values) for values in self.latencies.values())
+        p50 = percentile(pages, 0.5)
+        p95 = percentile(pages, 0.95)
+        return {
+            'requests': requests_count,
+            'requests_per_sec': round(requests_count / elapsed, 2) if elapsed else None,
+            'probe_count': requests_count - len(pages),
+            'requests_by_projection': {name: len(values) for name, values in sorted(self.latencies.items())},
+            'page_latency_p50_ms': round(p50 * 1000, 2) if p50 is not None else None,
+            'page_latency_p95_ms': round(p95 * 1000, 2) if p95 is not None else None,
+            'bytes_received': self.bytes_received
+        }
+
+
+class NullDatabase:
+    """Baza odrzucająca zapisy (--no-db) - mierzy sam crawler, bez kosztu PostgreSQL."""
+
+    def __init__(self):
+        self.current_run_id = None
+        self.save_totals = {'inserted': 0, 'changed': 0, 'unchanged': 0}
+
+    def save_to_database(self, listings_data):
+        return len(listings_data)
+
+    def close(self):
+        pass
+
+
+def build_scraper(args, database):
+    """Scraper z transportem wybranego źródła (opakowanym w TimingTransport) i limitem tempa z --rps."""
+    timing = TimingTransport({
+        'full': config.GRAPHQL_QUERY,
+        'count': config.GRAPHQL_COUNT_QUERY,
+        'price': config.GRAPHQL_PRICE_QUERY,
+        'region': config.GRAPHQL_REGION_QUERY
+    })
+    scraper = OLXGraphQLScraper(
+        database=database,
+        rate_limiter=RateLimiter(rate=args.rps, burst=max(1, int(args.rps)), min_rate=min(args.rps, 1)),
+        transport=timing
+    )
+    if args.source == 'mock':
+        timing.inner = create_transport(scraper.session, mode=TRANSPORT_MOCK,
+                                        mock_options={'total': args.total, 'latency': args.latency, 'seed': args.seed})
+    else:
+        timing.inner = create_transport(scraper.session, mode=TRANSPORT_REPLAY, directory=args.recordings)
+    return scraper
+
+
+def bench_parse(args):
+    listings = [make_listing(i) for i in range(args.parse_listings)]
+    pages = [make_page(listings[i:i + args.batch_size]) for i in range(0, len(listings), args.batch_size)]
+
+    start = time.perf_counter()
+    parsed = 0
+    for page in pages:
+        batch = listing_parser.loads(page)['data']['clientCompatibleListings']['data']
+        parsed += len([listing_parser.parse_listing(listing) for listing in batch])
+    elapsed = time.perf_counter() - start
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'listings': parsed,
+        'listings_per_sec': round(parsed / elapsed, 1),
+        'decoder': 'orjson' if listing_parser.orjson is not None else 'json',
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def bench_save(args, database):
+    """
+    Zapis syntetycznych ogłoszeń paczkami: pierwszy przebieg wstawia nowe wiersze (identyfikatory
+    z prefiksem przebiegu), drugi zapisuje te same, niezmienione ogłoszenia.
+    """
+    base = datetime(2025, 1, 1)
+    prefix = f"bench-{int(time.time())}"
+    listings = [
+        listing._replace(olx_id=f"{prefix}-{listing.olx_id}", scraped_at=base + timedelta(seconds=i))
+        for i, listing in enumerate(listing_parser.parse_listing(make_listing(i)) for i in range(args.save_rows))
+    ]
+    batch_size = config.PIPELINE_WRITE_BATCH
+
+    results = {}
+    for phase in ('insert', 'unchanged'):
+        start = time.perf_counter()
+        saved = 0
+        for i in range(0, len(listings), batch_size):
+            saved += database.save_to_database(listings[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+        results[phase] = {
+            'elapsed_s': round(elapsed, 3),
+            'rows': saved,
+            'rows_per_sec': round(saved / elapsed, 1) if elapsed else None
+        }
+    results['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+
+def bench_latest(args, database):
+    scraper = build_scraper(args, database)
+    try:
+        start = time.perf_counter()
+        saved = scraper.scrape_latest(args.query, max_results=999, batch_size=args.batch_size,
+                                      category_id=args.category)
+        elapsed = time.perf_counter() - start
+        result = scraper.transport.report(elapsed)
+    finally:
+        scraper.close()
+    result.update({
+        'elapsed_s': round(elapsed, 3),
+        'listings': saved,
+        'listings_per_sec': round(saved / elapsed, 1) if elapsed else None,
+        'failed_requests': scraper.failed_requests,
+        'peak_rss_mb': peak_rss_mb()
+    })
+    return result
+
+
+def bench_recursive(args, database):
+    scraper = build_scraper(args, database)
+    try:
+        start = time.perf_counter()
+        summary = scraper.scrape_recursive(
+            args.query,
+            target_results=args.target,
+            batch_size=args.batch_size,
+            category_id=args.category,
+            initial_price_from=args.price_from,
+            initial_price_to=args.price_to,
+            concurrency=args.concurrency,
+            keep_listings=False
+        )
+        elapsed = time.perf_counter() - start
+        result = scraper.transport.report(elapsed)
+    finally:
+        scraper.close()
+    result.update({
+        'elapsed_s': round(elapsed, 3),
+        'listings': summary['fetched'],
+        'listings_per_sec': round(summary['fetched'] / elapsed, 1) if elapsed else None,
+        'saved': summary['saved'],
+        'complete': summary['complete'],
+        'failed_requests': scraper.failed_requests,
+        'peak_rss_mb': peak_rss_mb()
+    })
+    return result
+
+
+def _flatten(results, prefix=''):
+    """Spłaszcza zagnieżdżone wyniki do par ('etap.metryka', wartość)."""
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{name}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, value
+
+
+def compare(results, baseline, threshold):
+    """
+    Porównuje wyniki z poprzednim przebiegiem.
+
+    Returns:
+        list: Opisy regresji (metryki gorsze o więcej niż 'threshold').
+    """
+    previous = dict(_flatten(baseline['results']))
+    regressions = []
+    print(f"\n📊 Porównanie z {baseline.get('timestamp')} ({baseline.get('git_commit')}):")
+    for name, value in _flatten(results):
+        metric = name.rsplit('.', 1)[-1]
+        if metric not in COMPARED_METRICS or not previous.get(name):
+            continue
+        old = previous[name]
+        change = (value - old) / old
+        worse = change > threshold if metric in LOWER_IS_BETTER else change < -threshold
+        marker = '❌' if worse else '  '
+        print(f"   {marker} {name}: {old} -> {value} ({change:+.1%})")
+        if worse:
+            regressions.append(f"{name}: {old} -> {value} ({change:+.1%})")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarki crawlera OLX.")
+    parser.add_argument('--source', choices=('mock', 'replay'), default='mock',
+                        help="Źródło danych: syntetyczny serwer albo nagrane odpowiedzi.")
+    parser.add_argument('--recordings', default=config.HTTP_RECORD_DIR, help="Katalog nagrań (--source replay).")
+    parser.add_argument('--total', type=int, default=20000, help="Liczba ogłoszeń serwera testowego.")
+    parser.add_argument('--latency', type=float, default=0.02, help="Opóźnienie odpowiedzi serwera testowego (s).")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--rps', type=float, default=200, help="Limit zapytań/s scrapera w benchmarku.")
+    parser.add_argument('--concurrency', type=int, default=config.CRAWL_CONCURRENCY)
+    parser.add_argument('--query', default='rowery elektryczne')
+    parser.add_argument('--category', type=int, default=767)
+    parser.add_argument('--price-from', type=float, default=1.0)
+    parser.add_argument('--price-to', type=float, default=60000.0)
+    parser.add_argument('--target', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=40)
+    parser.add_argument('--parse-listings', type=int, default=20000)
+    parser.add_argument('--save-rows', type=int, default=20000)
+    parser.add_argument('--no-db', action='store_true', help="Bez PostgreSQL (zapisy są odrzucane).")
+    parser.add_argument('--db-name', default=os.getenv("BENCH_DB_NAME", "olx_bench"),
+                        help="Baza PostgreSQL na potrzeby benchmarku.")
+    parser.add_argument('--stages', default='parse,save,latest,recursive',
+                        help="Etapy do uruchomienia (po przecinku).")
+    parser.add_argument('--output', default=None, help="Plik wyników JSON (domyślnie .cache/benchmarks/).")
+    parser.add_argument('--baseline', default=None, help="Wyniki poprzedniego przebiegu do porównania.")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Dopuszczalne pogorszenie (0.10 = 10%%).")
+    args = parser.parse_args()
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+
+    if args.no_db:
+        database = NullDatabase()
+    else:
+        database = Database(
+            db_config=dict(config.DB_CONFIG, database=args.db_name),
+            pool_min=config.DB_POOL_MIN,
+            pool_max=config.DB_POOL_MAX,
+            bulk_copy=config.DB_BULK_COPY,
+            copy_batch_size=config.DB_COPY_BATCH_SIZE
+        )
+
+    results = {}
+    try:
+        if 'parse' in stages:
+            results['parse_listing'] = bench_parse(args)
+        if 'save' in stages and not args.no_db:
+            results['save_to_database'] = bench_save(args, database)
+        if 'latest' in stages:
+            results['scrape_latest'] = bench_latest(args, database)
+        if 'recursive' in stages:
+            results['scrape_recursive'] = bench_recursive(args, database)
+    finally:
+        database.close()
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'results': results
+    }
+    output = args.output or os.path.join('.cache', 'benchmarks', f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"\n{'=' * 60}\n⏱️  WYNIKI BENCHMARKU\n{'=' * 60}")
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"\n💾 Zapisano: {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n❌ Wykryto {len(regressions)} regresji powyżej {args.threshold:.0%}.")
+            sys.exit(1)
+        print("\n✅ Brak regresji.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import json
+import os
+import time
+
+
+class CrawlCheckpoint:
+    """
+    Lokalny punkt kontrolny scrape_recursive (crash-safe wznowienie długiego crawla).
+
+    Zapisuje front crawla: zakresy cenowe do przetworzenia (z licznościami, jeśli znane),
+    ukończone liście oraz ostatni offset zakresu, który był w trakcie pobierania, wraz
+    z identyfikatorem przebiegu bazy (mark-and-sweep) i liczbą dotychczasowych błędów przebiegu
+    (nieudane zapytania i zapisy) - wznowiony przebieg z błędami nie może deaktywować ogłoszeń. Punkt jest zapisywany atomowo (plik
+    tymczasowy + os.replace) co 'interval_seconds', zawsze po zapisaniu do bazy wszystkich
+    ogłoszeń sprzed punktu - po restarcie crawl zaczyna od zapisanego frontu zamiast od zera.
+    """
+
+    def __init__(self, path, interval_seconds=30.0, max_age_seconds=24 * 3600):
+        """
+        Args:
+            path (str): Ścieżka do pliku JSON z punktem kontrolnym.
+            interval_seconds (float): Minimalny odstęp między kolejnymi zapisami.
+            max_age_seconds (float): Starszy punkt kontrolny jest ignorowany.
+        """
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self.max_age_seconds = max_age_seconds
+        self._last_saved = time.monotonic()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"   [CHECKPOINT] ⚠️  Nie można odczytać punktu kontrolnego ({self.path}): {e}")
+            return None
+        if time.time() - entry.get('updated_at', 0) > self.max_age_seconds:
+            return None
+        return entry
+
+    @property
+    def run_id(self):
+        """Identyfikator przebiegu bazy zapisany w aktualnym punkcie kontrolnym (lub None)."""
+        entry = self._read()
+        return entry.get('run_id') if entry else None
+
+    def load(self, key, run_id=None):
+        """
+        Zwraca zapisany front crawla lub None, jeśli brak punktu dla tego klucza i przebiegu.
+
+        Returns:
+            dict: Klucze 'pending' i 'leaves' (listy krotek (price_from, price_to, count)),
+                'offsets' (słownik (price_from, price_to) -> offset następnej strony)
+                oraz 'failures' (liczba błędów przebiegu przed punktem kontrolnym).
+        """
+        entry = self._read()
+        if not entry or entry.get('key') != key or entry.get('run_id') != run_id:
+            return None
+        return {
+            'pending': [tuple(task) for task in entry.get('pending', [])],
+            'leaves': [tuple(leaf) for leaf in entry.get('leaves', [])],
+            'offsets': {(lo, hi): offset for lo, hi, offset in entry.get('offsets', [])},
+            'failures': entry.get('failures', 0)
+        }
+
+    def due(self):
+        """Czy minął odstęp 'interval_seconds' od ostatniego zapisu."""
+        return time.monotonic() - self._last_saved >= self.interval_seconds
+
+    def save(self, key, run_id, pending, leaves, offsets=None, failures=0):
+        """Zapisuje front crawla (nadpisuje poprzedni punkt kontrolny)."""
+        entry = {
+            'key': key,
+            'run_id': run_id,
+            'updated_at': time.time(),
+            'pending': [list(task) for task in pending],
+            'leaves': [list(leaf) for leaf in leaves],
+            'offsets': [[lo, hi, offset] for (lo, hi), offset in (offsets or {}).items()],
+            'failures': failures
+        }
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self.path)
+            self._last_saved = time.monotonic()
+            print(f"   [CHECKPOINT] ✓ Zapisano punkt kontrolny ({len(entry['pending'])} zakresów do przetworzenia, "
+                  f"{len(entry['leaves'])} ukończonych).")
+        except OSError as e:
+            print(f"   [CHECKPOINT] ✗ Nie można zapisać punktu kontrolnego ({self.path}): {e}")
+
+    def clear(self):
+        """Usuwa punkt kontrolny (po zakończeniu crawla)."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"   [CHECKPOINT] ✗ Nie można usunąć punktu kontrolnego ({self.path}): {e}")
@@ -13,6 +13,16 @@ DB_CONFIG = {
     'password': os.getenv("DB_PASSWORD")
 }
 
+# Pula połączeń PostgreSQL
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 5))
+
+# Zapis masowy przez COPY + tabela tymczasowa (opcjonalny, np. przy pełnym skanowaniu; domyślnie INSERT VALUES).
+# DB_COPY_BATCH_SIZE dzieli na części jedno wywołanie save_to_database; przy zapisie w tle (scrape_recursive,
+# odświeżanie zakresów) paczki mają najwyżej PIPELINE_WRITE_BATCH ogłoszeń, więc większa wartość nic tam nie zmienia
+DB_BULK_COPY = os.getenv("DB_BULK_COPY", "false").lower() in ("1", "true", "yes")
+DB_COPY_BATCH_SIZE = int(os.getenv("DB_COPY_BATCH_SIZE", 5000))
+
 # Sprawdzenie, czy wszystkie zmienne DB zostały załadowane
 if not DB_CONFIG['password']:
     print("BŁĄD: Zmienne środowiskowe bazy danych (np. DB_PASSWORD) nie są ustawione.")
@@ -32,9 +42,93 @@ HEADERS = {
     'x-client': 'DESKTOP'
 }
 
-API_URL = 'https://www.olx.pl/apigateway/graphql'
+API_URL = os.getenv("OLX_API_URL", 'https://www.olx.pl/apigateway/graphql')
+
+# Transport HTTP: 'live' (API OLX), 'record' (API OLX + zapis odpowiedzi do HTTP_RECORD_DIR),
+# 'replay' (odtwarzanie nagranych odpowiedzi, bez sieci) albo 'mock' (lokalny serwer syntetycznych ogłoszeń)
+HTTP_TRANSPORT = os.getenv("HTTP_TRANSPORT", "live")
+HTTP_RECORD_DIR = os.getenv("HTTP_RECORD_DIR", ".cache/recordings")
+MOCK_SERVER_TOTAL = int(os.getenv("MOCK_SERVER_TOTAL", 20000))
+MOCK_SERVER_LATENCY = float(os.getenv("MOCK_SERVER_LATENCY", 0.05))
+
+# Konfiguracja puli połączeń HTTP (keep-alive)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 10))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 20))
+
+# Limiter zapytań (token bucket) z adaptacyjnym backoffem na 429/5xx
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", 4))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", 4))
+RATE_LIMIT_MIN_RPS = float(os.getenv("RATE_LIMIT_MIN_RPS", 0.2))
+RATE_LIMIT_BACKOFF_BASE = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", 1))
+RATE_LIMIT_BACKOFF_MAX = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", 60))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 4))
+
+# Cache planów podziału cenowego (liście z licznościami) między uruchomieniami
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", ".cache/partition_plans.json")
+PLAN_CACHE_TTL = float(os.getenv("PLAN_CACHE_TTL_HOURS", 48)) * 3600
+
+# Punkt kontrolny scrape_recursive (front crawla), zapisywany co CHECKPOINT_INTERVAL sekund.
+# Przerwany crawl (awaria, restart kontenera) jest wznawiany od frontu, jeśli punkt nie jest starszy niż CHECKPOINT_MAX_AGE.
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", ".cache/crawl_checkpoint.json")
+CHECKPOINT_INTERVAL = float(os.getenv("CHECKPOINT_INTERVAL_SECONDS", 30))
+CHECKPOINT_MAX_AGE = float(os.getenv("CHECKPOINT_MAX_AGE_HOURS", 24)) * 3600
+
+# Identyfikatory regionów OLX używane przy dzieleniu zakresów, których nie da się podzielić po cenie.
+# Puste = regiony są wykrywane z pierwszych stron danego zakresu.
+OLX_REGION_IDS = [int(region_id) for region_id in os.getenv("OLX_REGION_IDS", "").split(",") if region_id.strip()]
+
+# Liczba jednoczesnych zapytań w scrape_recursive (1 = tryb sekwencyjny)
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", 4))
+
+# Zapis w tle podczas scrape_recursive: paczka zapisywana po tylu ogłoszeniach lub po tylu sekundach,
+# a przy tylu oczekujących stronach pobieranie czeka na bazę (backpressure).
+# Przy DB_BULK_COPY rozmiar paczki to też rozmiar jednej operacji COPY + scalenie
+PIPELINE_WRITE_BATCH = int(os.getenv("PIPELINE_WRITE_BATCH", 500))
+PIPELINE_FLUSH_SECONDS = float(os.getenv("PIPELINE_FLUSH_SECONDS", 2))
+PIPELINE_MAX_PENDING_PAGES = int(os.getenv("PIPELINE_MAX_PENDING_PAGES", 50))
+
+# Parsowanie stron w puli procesów (0 = w bieżącym procesie). Odpowiedzi mniejsze niż
+# PARSE_POOL_MIN_BYTES są zawsze parsowane w bieżącym procesie.
+PARSE_POOL_WORKERS = int(os.getenv("PARSE_POOL_WORKERS", 0))
+PARSE_POOL_MIN_BYTES = int(os.getenv("PARSE_POOL_MIN_BYTES", 32768))
 
-# Zapytanie GraphQL (przeniesione z klasy dla czytelności)
+# Metryki (format Prometheus/OpenMetrics): endpoint http://127.0.0.1:METRICS_PORT/metrics (0 = wyłączony)
+# oraz zapis do pliku METRICS_DUMP_PATH na koniec przebiegu (pusty = bez zapisu)
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+METRICS_DUMP_PATH = os.getenv("METRICS_DUMP_PATH", "")
+
+# Profilowanie etapów (search, dekodowanie JSON, parse_listing, parse_timestamp, zapis do bazy, commit).
+# Raport etapów (JSON + stosy "folded" dla flamegraph) trafia do PROFILE_DIR; PROFILE_CPROFILE dodaje zrzut cProfile (.prof).
+PROFILE = os.getenv("PROFILE", "false").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", ".cache/profile")
+PROFILE_CPROFILE = os.getenv("PROFILE_CPROFILE", "false").lower() in ("1", "true", "yes")
+
+# Wyszukiwanie skanowane przez demona (daemon.py): zapytanie, kategoria, stan (puste = wszystkie) i zakres cen
+SCRAPE_QUERY = os.getenv("SCRAPE_QUERY", "rowery elektryczne")
+SCRAPE_CATEGORY_ID = int(os.getenv("SCRAPE_CATEGORY_ID", 767))
+SCRAPE_STATE = os.getenv("SCRAPE_STATE") or None
+SCRAPE_PRICE_FROM = float(os.getenv("SCRAPE_PRICE_FROM", 1000))
+SCRAPE_PRICE_TO = float(os.getenv("SCRAPE_PRICE_TO", 50000))
+
+# Harmonogram demona: często - przyrostowe pobieranie nowych ogłoszeń, co kilka godzin - odświeżenie
+# "gorących" zakresów cenowych (najwięcej nowych ogłoszeń i zmian cen w ostatnich SCHEDULER_HOT_WINDOW
+# godzinach), rzadko - pełne skanowanie z deaktywacją. Nieudany przebieg jest ponawiany po SCHEDULER_RETRY.
+SCHEDULER_INCREMENTAL_INTERVAL = float(os.getenv("SCHEDULER_INCREMENTAL_MINUTES", 15)) * 60
+SCHEDULER_REVALIDATE_INTERVAL = float(os.getenv("SCHEDULER_REVALIDATE_MINUTES", 180)) * 60
+SCHEDULER_FULL_INTERVAL = float(os.getenv("SCHEDULER_FULL_HOURS", 24)) * 3600
+SCHEDULER_RETRY = float(os.getenv("SCHEDULER_RETRY_MINUTES", 10)) * 60
+SCHEDULER_HOT_WINDOW = float(os.getenv("SCHEDULER_HOT_WINDOW_HOURS", 24))
+
+# Budżety przebiegów demona (liczba ogłoszeń / zakresów)
+INCREMENTAL_MAX_RESULTS = int(os.getenv("INCREMENTAL_MAX_RESULTS", 999))
+REVALIDATE_MAX_RANGES = int(os.getenv("REVALIDATE_MAX_RANGES", 10))
+REVALIDATE_MAX_RESULTS = int(os.getenv("REVALIDATE_MAX_RESULTS", 5000))
+FULL_SCAN_TARGET_RESULTS = int(os.getenv("FULL_SCAN_TARGET_RESULTS", 50000))
+
+# Zapytania GraphQL (przeniesione z klasy dla czytelności).
+# GRAPHQL_QUERY pobiera pełne ogłoszenia; pozostałe warianty zawierają tylko pola potrzebne
+# w danej fazie (sprawdzanie liczności, cena graniczna, wykrywanie regionów), więc odpowiedzi są wielokrotnie mniejsze.
 GRAPHQL_QUERY = """
 query ListingSearchQuery($searchParameters: [SearchParameter!] = {key: "", value: ""}) {
   clientCompatibleListings(searchParameters: $searchParameters) {
@@ -131,4 +225,80 @@ query ListingSearchQuery($searchParameters: [SearchParameter!] = {key: "", value
     }
   }
 }
-"""
\ No newline at end of file
+"""
+
+GRAPHQL_COUNT_QUERY = """
+query ListingCountQuery($searchParameters: [SearchParameter!] = {key: "", value: ""}) {
+  clientCompatibleListings(searchParameters: $searchParameters) {
+    __typename
+    ... on ListingSuccess {
+      metadata {
+        total_elements
+        visible_total_count
+      }
+    }
+    ... on ListingError {
+      error {
+        code
+        detail
+      }
+    }
+  }
+}
+"""
+
+GRAPHQL_PRICE_QUERY = """
+query ListingPriceQuery($searchParameters: [SearchParameter!] = {key: "", value: ""}) {
+  clientCompatibleListings(searchParameters: $searchParameters) {
+    __typename
+    ... on ListingSuccess {
+      data {
+        id
+        promotion {
+          top_ad
+        }
+        params {
+          key
+          value {
+            __typename
+            ... on PriceParam {
+              value
+              currency
+              negotiable
+              label
+            }
+          }
+        }
+      }
+    }
+    ... on ListingError {
+      error {
+        code
+        detail
+      }
+    }
+  }
+}
+"""
+
+GRAPHQL_REGION_QUERY = """
+query ListingRegionQuery($searchParameters: [SearchParameter!] = {key: "", value: ""}) {
+  clientCompatibleListings(searchParameters: $searchParameters) {
+    __typename
+    ... on ListingSuccess {
+      data {
+        id
+        location {
+          region { id name }
+        }
+      }
+    }
+    ... on ListingError {
+      error {
+        code
+        detail
+      }
+    }
+  }
+}
+"""
@@ -0,0 +1,175 @@
+import config
+import metrics
+import profiling
+from database import Database
+from scraper import OLXGraphQLScraper
+from plan_cache import PartitionPlanCache
+from checkpoint import CrawlCheckpoint
+from scheduler import Scheduler, Tier
+import signal
+import time
+
+# ========== DEMON (HARMONOGRAM: PRZYROSTOWO / GORĄCE ZAKRESY / PEŁNE SKANOWANIE) ==========
+# Jeden długotrwały proces zamiast osobnych uruchomień hourly.py i daily.py: sesja HTTP (keep-alive),
+# limiter zapytań, pula połączeń z bazą i plany podziału są współdzielone przez wszystkie przebiegi.
+
+
+def incremental_pass(scraper):
+    """Często: tylko ogłoszenia nowsze niż w poprzednim przebiegu (zwykle kilka zapytań)."""
+    scraper.scrape_incremental(
+        query=config.SCRAPE_QUERY,
+        max_results=config.INCREMENTAL_MAX_RESULTS,
+        batch_size=40,
+        category_id=config.SCRAPE_CATEGORY_ID,
+        state=config.SCRAPE_STATE
+    )
+
+
+def select_hot_ranges(leaves, activity, max_ranges, max_results):
+    """
+    Wybiera liście planu podziału z największą liczbą ostatnich zmian (przy remisie - najliczniejsze),
+    nie więcej niż 'max_ranges' zakresów i łącznie 'max_results' ogłoszeń.
+
+    Returns:
+        list: Krotki (price_from, price_to, count) posortowane po cenie.
+    """
+    activity = activity or [0] * len(leaves)
+    ranked = sorted(zip(leaves, activity), key=lambda item: (item[1], item[0][2]), reverse=True)
+
+    selected = []
+    budget = max_results
+    for leaf, _changes in ranked:
+        if len(selected) >= max_ranges:
+            break
+        if 0 < leaf[2] <= budget:
+            selected.append(leaf)
+            budget -= leaf[2]
+    return sorted(selected)
+
+
+def revalidate_pass(scraper, db, plan_cache):
+    """Co kilka godzin: ponowne pobranie "gorących" zakresów cenowych z planu ostatniego pełnego skanowania."""
+    plan_key = PartitionPlanCache.make_key(config.SCRAPE_QUERY, config.SCRAPE_CATEGORY_ID, config.SCRAPE_STATE,
+                                           config.SCRAPE_PRICE_FROM, config.SCRAPE_PRICE_TO)
+    leaves = plan_cache.load(plan_key)
+    if not leaves:
+        print("   [INFO] Brak planu podziału z pełnego skanowania. Pomijam odświeżanie zakresów.")
+        return
+
+    activity = db.get_range_activity(leaves, config.SCHEDULER_HOT_WINDOW)
+    hot_ranges = select_hot_ranges(leaves, activity, config.REVALIDATE_MAX_RANGES, config.REVALIDATE_MAX_RESULTS)
+    if not hot_ranges:
+        print("   [INFO] Brak zakresów mieszczących się w budżecie. Pomijam odświeżanie zakresów.")
+        return
+
+    scraper.scrape_price_ranges(
+        query=config.SCRAPE_QUERY,
+        price_ranges=hot_ranges,
+        batch_size=40,
+        category_id=config.SCRAPE_CATEGORY_ID,
+        state=config.SCRAPE_STATE,
+        max_results=config.REVALIDATE_MAX_RESULTS
+    )
+
+
+def full_pass(scraper, db, checkpoint):
+    """Rzadko: pełne skanowanie (jak daily.py) z deaktywacją niewidzianych ogłoszeń (mark-and-sweep)."""
+    run_id = None
+    if checkpoint.run_id is not None:
+        run_id = db.resume_run(checkpoint.run_id)
+    if run_id is None:
+        run_id = db.start_run()
+
+    try:
+        summary = scraper.scrape_recursive(
+            query=config.SCRAPE_QUERY,
+            target_results=config.FULL_SCAN_TARGET_RESULTS,
+            batch_size=40,
+            category_id=config.SCRAPE_CATEGORY_ID,
+            state=config.SCRAPE_STATE,
+            initial_price_from=config.SCRAPE_PRICE_FROM,
+            initial_price_to=config.SCRAPE_PRICE_TO,
+            concurrency=config.CRAWL_CONCURRENCY,
+            keep_listings=False
+        )
+    except BaseException:
+        # Także przerwanie sygnałem (KeyboardInterrupt z handle_stop). Z zapisanym punktem kontrolnym
+        # przebieg zostaje otwarty - ponowienie go wznowi
+        if checkpoint.run_id != run_id:
+            db.finish_run(run_id, success=False)
+        raise
+
+    db.finish_run(run_id, success=scraper.last_crawl_complete)
+    changes = summary['changes']
+    print(f"   Zmiany w bazie: nowe {changes.get('inserted', 0)}, zmienione {changes.get('changed', 0)}, "
+          f"bez zmian {changes.get('unchanged', 0)}.")
+    db.get_stats()
+
+
+if __name__ == "__main__":
+
+    if not config.DB_CONFIG['password']:
+        print("BŁĄD KRYTYCZNY: Brak hasła do bazy danych w pliku .env")
+        print("Zatrzymałem działanie skryptu.")
+    else:
+        if config.METRICS_PORT:
+            metrics.serve(config.METRICS_PORT)
+        profiler = profiling.install(cprofile=config.PROFILE_CPROFILE) if config.PROFILE else None
+
+        try:
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Uruchamiam demona scrapera...")
+
+            print("Łączenie z bazą danych...")
+            db = Database(
+                db_config=config.DB_CONFIG,
+                pool_min=config.DB_POOL_MIN,
+                pool_max=config.DB_POOL_MAX,
+                bulk_copy=config.DB_BULK_COPY,
+                copy_batch_size=config.DB_COPY_BATCH_SIZE
+            )
+            plan_cache = PartitionPlanCache(config.PLAN_CACHE_PATH, config.PLAN_CACHE_TTL)
+            checkpoint = CrawlCheckpoint(config.CHECKPOINT_PATH, config.CHECKPOINT_INTERVAL, config.CHECKPOINT_MAX_AGE)
+            scraper = OLXGraphQLScraper(database=db, plan_cache=plan_cache, checkpoint=checkpoint)
+
+            # Pełne skanowanie od razu, jeśli nie było udanego przebiegu albo jest przerwany crawl do wznowienia;
+            # w przeciwnym razie po upływie SCHEDULER_FULL_INTERVAL od ostatniego udanego przebiegu
+            last_run_age = db.get_last_run_age()
+            if checkpoint.run_id is not None or last_run_age is None:
+                full_first_run = 0.0
+            else:
+                full_first_run = config.SCHEDULER_FULL_INTERVAL - last_run_age
+
+            scheduler = Scheduler([
+                Tier('full', config.SCHEDULER_FULL_INTERVAL, lambda: full_pass(scraper, db, checkpoint),
+                     priority=2, first_run_in=full_first_run, covers=('revalidate',)),
+                Tier('revalidate', config.SCHEDULER_REVALIDATE_INTERVAL,
+                     lambda: revalidate_pass(scraper, db, plan_cache), priority=1),
+                Tier('incremental', config.SCHEDULER_INCREMENTAL_INTERVAL, lambda: incremental_pass(scraper)),
+            ], retry_seconds=config.SCHEDULER_RETRY)
+
+            def handle_stop(signum, frame):
+                print(f"\n⏹️  Otrzymano sygnał {signal.Signals(signum).name}. Kończę pracę demona...")
+                scheduler.stop()
+                # Trwający przebieg jest przerywany - pełne skanowanie zostanie wznowione z punktu kontrolnego
+                if scheduler.running:
+                    raise KeyboardInterrupt
+
+            signal.signal(signal.SIGTERM, handle_stop)
+            signal.signal(signal.SIGINT, handle_stop)
+
+            try:
+                scheduler.run_forever()
+            except KeyboardInterrupt:
+                print("   Przerwano bieżący przebieg.")
+            finally:
+                scraper.close()
+                db.close()
+
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Zakończono.")
+
+        except Exception as e:
+            print(f"\nNapotkano nieoczekiwany błąd główny: {e}")
+        finally:
+            metrics.report(config.METRICS_DUMP_PATH)
+            if profiler:
+                profiler.report(config.PROFILE_DIR, 'daemon')
@@ -1,6 +1,10 @@
 import config
+import metrics
+import profiling
 from database import Database
 from scraper import OLXGraphQLScraper
+from plan_cache import PartitionPlanCache
+from checkpoint import CrawlCheckpoint
 import time
 
 # ========== CODZIENNE URUCHOMIENIE (PEŁNE SKANOWANIE) ==========
@@ -11,22 +15,45 @@ if __name__ == "__main__":
         print("BŁĄD KRYTYCZNY: Brak hasła do bazy danych w pliku .env")
         print("Zatrzymałem działanie skryptu.")
     else:
+        if config.METRICS_PORT:
+            metrics.serve(config.METRICS_PORT)
+        profiler = profiling.install(cprofile=config.PROFILE_CPROFILE) if config.PROFILE else None
+        db = None
+        scraper = None
+
         try:
             start_time = time.time()
             print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Uruchamiam codzienne PEŁNE pobieranie...")
 
             print("Łączenie z bazą danych...")
-            db = Database(db_config=config.DB_CONFIG)
+            db = Database(
+                db_config=config.DB_CONFIG,
+                pool_min=config.DB_POOL_MIN,
+                pool_max=config.DB_POOL_MAX,
+                bulk_copy=config.DB_BULK_COPY,
+                copy_batch_size=config.DB_COPY_BATCH_SIZE
+            )
 
-            # === KROK 1: Deaktywacja wszystkich ogłoszeń ===
-            # To jest kluczowy element! Ustawiamy is_active=FALSE dla wszystkich.
-            db.deactivate_all_listings()
+            # === KROK 1: Rozpoczęcie (lub wznowienie) przebiegu ===
+            # Zamiast deaktywować wszystko na starcie, oznaczamy ogłoszenia widziane w tym
+            # przebiegu (last_seen_run_id), a niewidziane deaktywujemy na końcu (mark-and-sweep).
+            # Jeśli poprzednie uruchomienie zostało przerwane, kontynuujemy jego przebieg od punktu kontrolnego.
+            checkpoint = CrawlCheckpoint(config.CHECKPOINT_PATH, config.CHECKPOINT_INTERVAL, config.CHECKPOINT_MAX_AGE)
+            run_id = None
+            if checkpoint.run_id is not None:
+                run_id = db.resume_run(checkpoint.run_id)
+            if run_id is None:
+                run_id = db.start_run()
 
             # Pobieranie statystyk PRZED uruchomieniem
-            print("\n--- Statystyki PRZED (po deaktywacji) ---")
-            db.get_stats()  # Pokaże 0 aktywnych (jeśli dodasz taki filtr do stats)
+            print("\n--- Statystyki PRZED ---")
+            db.get_stats()
 
-            scraper = OLXGraphQLScraper(database=db)
+            scraper = OLXGraphQLScraper(
+                database=db,
+                plan_cache=PartitionPlanCache(config.PLAN_CACHE_PATH, config.PLAN_CACHE_TTL),
+                checkpoint=checkpoint
+            )
 
             CATEGORY_ELECTRIC_BIKES = 767
 
@@ -39,16 +66,32 @@ if __name__ == "__main__":
 
             # === KROK 2: Uruchomienie pełnego skanowania ===
             # Używamy scrape_recursive, aby pobrać WSZYSTKIE ogłoszenia
-            # Funkcja save_to_database automatycznie ustawi im is_active=TRUE
-            listings = scraper.scrape_recursive(
-                query='rowery elektryczne',
-                target_results=50000,  # Ustaw duży limit, aby pobrać wszystko
-                batch_size=40,
-                category_id=CATEGORY_ELECTRIC_BIKES,
-                state=STATE_FILTER,
-                initial_price_from=PRICE_FROM_FILTER,
-                initial_price_to=PRICE_TO_FILTER
-            )
+            # Funkcja save_to_database ustawi im is_active=TRUE i last_seen_run_id
+            try:
+                summary = scraper.scrape_recursive(
+                    query='rowery elektryczne',
+                    target_results=50000,  # Ustaw duży limit, aby pobrać wszystko
+                    batch_size=40,
+                    category_id=CATEGORY_ELECTRIC_BIKES,
+                    state=STATE_FILTER,
+                    initial_price_from=PRICE_FROM_FILTER,
+                    initial_price_to=PRICE_TO_FILTER,
+                    concurrency=config.CRAWL_CONCURRENCY,
+                    keep_listings=False  # Deduplikacja tylko po identyfikatorach (stała pamięć)
+                )
+            except BaseException:
+                # Także przerwanie przez Ctrl+C. Z zapisanym punktem kontrolnym przebieg zostaje otwarty -
+                # następne uruchomienie go wznowi
+                if checkpoint.run_id != run_id:
+                    db.finish_run(run_id, success=False)
+                raise
+
+            # === KROK 3: Deaktywacja ogłoszeń niewidzianych w tym przebiegu ===
+            # Wykonywana tylko, jeśli skanowanie przeszło cały zakres bez błędów.
+            db.finish_run(run_id, success=scraper.last_crawl_complete)
+            changes = summary['changes']
+            print(f"\nZmiany w bazie: nowe {changes.get('inserted', 0)}, zmienione {changes.get('changed', 0)}, "
+                  f"bez zmian {changes.get('unchanged', 0)}.")
 
             # Pobieranie statystyk PO uruchomieniu
             print("\n--- Statystyki PO ---")
@@ -59,4 +102,13 @@ if __name__ == "__main__":
             print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Zakończono.")
 
         except Exception as e:
-            print(f"\nNapotkano nieoczekiwany błąd główny: {e}")
\ No newline at end of file
+            print(f"\nNapotkano nieoczekiwany błąd główny: {e}")
+        finally:
+            # Sesja HTTP i procesy ParsePool scrapera, a potem pula połączeń z bazą
+            if scraper is not None:
+                scraper.close()
+            if db is not None:
+                db.close()
+            metrics.report(config.METRICS_DUMP_PATH)
+            if profiler:
+                profiler.report(config.PROFILE_DIR, 'daily')
\ No newline at end of file
@@ -1,30 +1,235 @@
+import hashlib
+import io
+import json
+import operator
+import threading
+import time
+import weakref
+from datetime import datetime
+
 import psycopg2
+from psycopg2 import extensions
 from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+
+import metrics
+from listing import Listing
+
+# Kolumny zapisywane przez save_to_database: pola rekordu Listing (w tej samej kolejności)
+# oraz kolumny ustawiane przy zapisie (kolejność zgodna z Database._listing_values)
+LISTING_COLUMNS = list(Listing._fields) + ['content_hash', 'is_active', 'last_seen_run_id']
+
+# Kolumny czasu - w tabeli tymczasowej COPY są typu TIMESTAMPTZ, aby strefa czasowa z OLX
+# była przeliczana tak samo jak przy zapisie przez execute_values
+TIMESTAMP_COLUMNS = {'created_time', 'refreshed_time', 'valid_to_time', 'user_created', 'user_last_seen', 'scraped_at'}
+
+# Zmienne pola ogłoszenia - ich skrót (content_hash) decyduje, czy wiersz trzeba przepisać
+HASHED_COLUMNS = [
+    'price_value', 'price_label', 'refreshed_time', 'promoted', 'highlighted', 'urgent',
+    'photos_count', 'photos_urls', 'params', 'description', 'title'
+]
+_hashed_values = operator.itemgetter(*(Listing._fields.index(column) for column in HASHED_COLUMNS))
+_PARAMS_HASH_INDEX = HASHED_COLUMNS.index('params')
+
+# Progi przedziałów cenowych w rozbiciu statystyk (get_stats)
+STATS_PRICE_BUCKETS = [0, 1000, 2000, 3000, 5000, 8000, 12000, 20000]
+
+_CONTENT_CHANGED = "listings.content_hash IS DISTINCT FROM EXCLUDED.content_hash"
+
+# Aktualizacja przy konflikcie: zmienione ogłoszenia są przepisywane, a niezmienione dostają
+# tylko znacznik przebiegu (wartości TOAST, np. opis i zdjęcia, nie są wtedy zapisywane ponownie)
+UPSERT_UPDATE_SET = ",\n".join(
+    [f"{column} = CASE WHEN {_CONTENT_CHANGED} THEN EXCLUDED.{column} ELSE listings.{column} END"
+     for column in HASHED_COLUMNS]
+    + [
+        f"updated_at = CASE WHEN {_CONTENT_CHANGED} THEN CURRENT_TIMESTAMP ELSE listings.updated_at END",
+        "content_hash = EXCLUDED.content_hash",
+        "is_active = TRUE",
+        "last_seen_run_id = COALESCE(EXCLUDED.last_seen_run_id, listings.last_seen_run_id)"
+    ]
+)
+
+# Niezmienione, aktywne ogłoszenia, już oznaczone bieżącym przebiegiem, są pomijane całkowicie.
+# RETURNING rozróżnia wiersze nowe (xmax = 0) i zmienione (updated_at ustawione w tej transakcji).
+UPSERT_CONFLICT_CLAUSE = f"""
+    ON CONFLICT (olx_id) DO UPDATE SET {UPSERT_UPDATE_SET}
+    WHERE {_CONTENT_CHANGED}
+        OR NOT listings.is_active
+        OR (EXCLUDED.last_seen_run_id IS NOT NULL
+            AND listings.last_seen_run_id IS DISTINCT FROM EXCLUDED.last_seen_run_id)
+    RETURNING (xmax = 0) AS inserted, (updated_at = CURRENT_TIMESTAMP) AS changed
+"""
+
+
+def _copy_text(value):
+    """Koduje wartość w formacie tekstowym COPY (NULL, bool, tablice TEXT[], znaki specjalne)."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        text = value.isoformat()
+    elif isinstance(value, (list, tuple)):
+        items = []
+        for item in value:
+            if item is None:
+                items.append('NULL')
+            else:
+                items.append('"' + str(item).replace('\\', '\\\\').replace('"', '\\"') + '"')
+        text = '{' + ','.join(items) + '}'
+    else:
+        text = str(value)
+    return (text.replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class CopyRowsReader(io.TextIOBase):
+    """Obiekt plikopodobny, który leniwie koduje krotki jako wiersze COPY (dla cursor.copy_expert)."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._buffer += '\t'.join(_copy_text(value) for value in row) + '\n'
+
+        if size < 0:
+            chunk, self._buffer = self._buffer, ''
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
 
 
 class Database:
     """Klasa do zarządzania połączeniem i operacjami na bazie danych PostgreSQL."""
 
-    def __init__(self, db_config):
+    # Połączenie bezczynne dłużej niż tyle sekund jest sprawdzane (SELECT 1) przed wydaniem
+    HEALTHCHECK_IDLE_SECONDS = 30
+
+    def __init__(self, db_config, pool_min=1, pool_max=5, bulk_copy=False, copy_batch_size=5000):
         """
         Inicjalizuje obiekt bazy danych i od razu tworzy tabelę, jeśli nie istnieje.
 
         Args:
             db_config (dict): Słownik konfiguracyjny dla psycopg2.
+            pool_min (int): Minimalna liczba utrzymywanych połączeń w puli.
+            pool_max (int): Maksymalna liczba połączeń w puli (kolejni chętni czekają na zwolnienie).
+            bulk_copy (bool): Zapis przez COPY do tabeli tymczasowej i jedno scalenie (zamiast INSERT VALUES).
+            copy_batch_size (int): Liczba wierszy na jedną operację COPY + scalenie w trybie masowym.
         """
         self.db_config = db_config
+        self.pool_min = pool_min
+        self.pool_max = max(pool_min, pool_max)
+        self.bulk_copy = bulk_copy
+        self.copy_batch_size = max(1, copy_batch_size)
+        self.current_run_id = None
+        self.run_save_failures = 0
+        # Błędy przebiegu zapisane w crawl_runs (także przez wcześniejsze, przerwane uruchomienia)
+        self.run_failures = 0
+        self.save_totals = {'inserted': 0, 'changed': 0, 'unchanged': 0}
+
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.pool_max)
+        # Połączenie -> czas ostatniego oddania do puli (wpis znika razem z połączeniem)
+        self._last_used = weakref.WeakKeyDictionary()
+
         self.setup_database()
 
+    def _get_pool(self):
+        """Zwraca pulę połączeń, tworząc ją przy pierwszym użyciu (lub po wcześniejszym błędzie)."""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadedConnectionPool(self.pool_min, self.pool_max, **self.db_config)
+            return self._pool
+
+    def _is_healthy(self, conn):
+        """
+        Sprawdza połączenie przed wydaniem. Połączenie widziane po raz pierwszy zostało właśnie
+        utworzone przez pulę - liczy się jako używane teraz i nie wymaga SELECT 1.
+        """
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        with self._pool_lock:
+            last_used = self._last_used.setdefault(conn, now)
+        if now - last_used < self.HEALTHCHECK_IDLE_SECONDS:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
     def get_connection(self):
-        """Tworzy i zwraca nowe połączenie PostgreSQL."""
+        """
+        Pobiera połączenie PostgreSQL z puli (blokuje, gdy wszystkie są zajęte).
+        Zerwane połączenia są odrzucane i zastępowane nowymi.
+        Połączenie należy oddać przez release_connection().
+        """
+        self._slots.acquire()
         try:
-            conn = psycopg2.connect(**self.db_config)
-            return conn
-        except psycopg2.OperationalError as e:
+            pool = self._get_pool()
+            # Jedna próba na każde połączenie w puli + jedno świeże
+            for _attempt in range(self.pool_max + 1):
+                conn = pool.getconn()
+                if self._is_healthy(conn):
+                    return conn
+                print("   [DB] ⚠️  Wykryto zerwane połączenie z bazą. Łączę ponownie...")
+                with self._pool_lock:
+                    self._last_used.pop(conn, None)
+                pool.putconn(conn, close=True)
+            raise psycopg2.OperationalError("nie udało się uzyskać sprawnego połączenia z puli")
+        except psycopg2.Error as e:
+            self._slots.release()
             print(f"✗ BŁĄD: Nie można połączyć się z bazą danych: {e}")
             print("Sprawdź konfigurację w pliku .env oraz czy baza PostgreSQL działa.")
             return None
 
+    def release_connection(self, conn):
+        """
+        Oddaje połączenie do puli; połączenia zerwane lub w nieznanym stanie są zamykane.
+        Połączenie oddane po close() (np. przez wątek zapisu w tle) jest po prostu zamykane.
+        """
+        try:
+            discard = conn.closed or conn.get_transaction_status() == extensions.TRANSACTION_STATUS_UNKNOWN
+            if not discard and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+
+            with self._pool_lock:
+                if discard or self._pool is None:
+                    self._last_used.pop(conn, None)
+                else:
+                    self._last_used[conn] = time.monotonic()
+
+                if self._pool is not None:
+                    self._pool.putconn(conn, close=bool(discard))
+                    return
+            if not conn.closed:
+                conn.close()
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Zamyka wszystkie połączenia w puli."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                self._last_used.clear()
+
     def setup_database(self):
         """Tworzy tabelę 'listings' wraz z indeksami, jeśli nie istnieje,
            oraz dodaje kolumnę 'is_active', jeśli jej brakuje."""
@@ -126,47 +331,529 @@ class Database:
                 else:
                     print("   [DB] ✓ Kolumna 'is_active' już istnieje.")
 
+            # Znaczniki czasu (high-water mark) dla trybu przyrostowego
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_watermarks (
+                    query_key TEXT PRIMARY KEY,
+                    watermark TIMESTAMPTZ NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Przebiegi pełnego skanowania (mark-and-sweep zamiast deaktywacji wszystkiego na starcie)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_runs (
+                    id SERIAL PRIMARY KEY,
+                    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    finished_at TIMESTAMP,
+                    status VARCHAR(20) DEFAULT 'running',
+                    deactivated_count INTEGER
+                )
+            ''')
+            cursor.execute("ALTER TABLE crawl_runs ADD COLUMN IF NOT EXISTS failures INTEGER DEFAULT 0")
+            cursor.execute("ALTER TABLE listings ADD COLUMN IF NOT EXISTS last_seen_run_id INTEGER")
+            # Bez indeksu na last_seen_run_id oznaczenie niezmienionego ogłoszenia może być aktualizacją HOT
+            cursor.execute("DROP INDEX IF EXISTS idx_last_seen_run_id")
+            cursor.execute("ALTER TABLE listings ADD COLUMN IF NOT EXISTS content_hash CHAR(32)")
+            conn.commit()
+
+            self._setup_history(cursor)
+            conn.commit()
 
         except Exception as e:
             print(f"✗ Błąd podczas tworzenia/aktualizacji tabeli: {e}")
             conn.rollback()
         finally:
             cursor.close()
-            conn.close()
+            self.release_connection(conn)
+
+    def _setup_history(self, cursor):
+        """
+        Tworzy tabelę historii 'listing_history' i wyzwalacz, który dopisuje do niej wiersz
+        tylko przy faktycznej zmianie śledzonego pola (cena, promowanie, tytuł, aktywność).
+        Dzięki wyzwalaczowi historia jest spójna niezależnie od ścieżki zapisu (execute_values, COPY, sweep).
+        Tytuł zapisywany jest tylko wtedy, gdy się zmienił (w pozostałych wierszach jest NULL).
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS listing_history (
+                id BIGSERIAL PRIMARY KEY,
+                listing_id INTEGER NOT NULL,
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                price_value DECIMAL(10, 2),
+                previous_price DECIMAL(10, 2),
+                promoted BOOLEAN,
+                is_active BOOLEAN,
+                title TEXT
+            )
+        ''')
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_history_listing ON listing_history(listing_id, changed_at)")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_history_price_drops ON listing_history(changed_at)
+            WHERE price_value < previous_price
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_changed_at ON listing_history(changed_at)")
+
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION record_listing_history() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    INSERT INTO listing_history (listing_id, price_value, promoted, is_active, title)
+                    VALUES (NEW.id, NEW.price_value, NEW.promoted, NEW.is_active, NEW.title);
+                ELSE
+                    INSERT INTO listing_history (listing_id, price_value, previous_price, promoted, is_active, title)
+                    VALUES (NEW.id, NEW.price_value, OLD.price_value, NEW.promoted, NEW.is_active,
+                            CASE WHEN NEW.title IS DISTINCT FROM OLD.title THEN NEW.title END);
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        # Wyzwalacze tworzymy tylko, gdy ich brakuje - DROP/CREATE TRIGGER przy każdym starcie
+        # zakładałby blokadę ACCESS EXCLUSIVE na tabeli 'listings'
+        cursor.execute("""
+            SELECT tgname FROM pg_trigger
+            WHERE tgrelid = 'listings'::regclass AND NOT tgisinternal
+        """)
+        existing_triggers = {row[0] for row in cursor.fetchall()}
+
+        if 'trg_listing_history_insert' not in existing_triggers:
+            cursor.execute("""
+                CREATE TRIGGER trg_listing_history_insert
+                AFTER INSERT ON listings
+                FOR EACH ROW EXECUTE PROCEDURE record_listing_history()
+            """)
+        if 'trg_listing_history_update' not in existing_triggers:
+            cursor.execute("""
+                CREATE TRIGGER trg_listing_history_update
+                AFTER UPDATE OF price_value, promoted, title, is_active ON listings
+                FOR EACH ROW
+                WHEN (OLD.price_value IS DISTINCT FROM NEW.price_value
+                      OR OLD.promoted IS DISTINCT FROM NEW.promoted
+                      OR OLD.title IS DISTINCT FROM NEW.title
+                      OR OLD.is_active IS DISTINCT FROM NEW.is_active)
+                EXECUTE PROCEDURE record_listing_history()
+            """)
+
+    def _fetch_dicts(self, query, params):
+        """Wykonuje zapytanie i zwraca wiersze jako listę słowników (lub None w przypadku błędu)."""
+        conn = self.get_connection()
+        if conn is None:
+            return None
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            columns = [column.name for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"✗ Błąd podczas odczytu historii ogłoszeń: {e}")
+            conn.rollback()
+            return None
+        finally:
+            cursor.close()
+            self.release_connection(conn)
+
+    def get_price_history(self, olx_id):
+        """
+        Zwraca szereg czasowy cen ogłoszenia: pierwszą obserwację i każdą zmianę ceny.
+
+        Args:
+            olx_id (str): Identyfikator ogłoszenia OLX.
+
+        Returns:
+            list: Słowniki (changed_at, price_value, previous_price, promoted, is_active),
+                posortowane od najstarszej zmiany.
+        """
+        rows = self._fetch_dicts("""
+            SELECT h.changed_at, h.price_value, h.previous_price, h.promoted, h.is_active
+            FROM listing_history h
+            JOIN listings l ON l.id = h.listing_id
+            WHERE l.olx_id = %s
+              AND (h.previous_price IS NULL OR h.price_value IS DISTINCT FROM h.previous_price)
+            ORDER BY h.changed_at, h.id
+        """, (str(olx_id),))
+        return rows or []
+
+    def get_price_drops(self, days=7, limit=None):
+        """
+        Zwraca obniżki cen z ostatnich 'days' dni (najnowsze najpierw).
+
+        Args:
+            days (float): Okno czasowe w dniach.
+            limit (int): Maksymalna liczba wyników (None - bez limitu).
+
+        Returns:
+            list: Słowniki (olx_id, title, url, changed_at, price_value, previous_price, drop_pct).
+        """
+        rows = self._fetch_dicts("""
+            SELECT l.olx_id, l.title, l.url, h.changed_at, h.price_value, h.previous_price,
+                   ROUND(100 * (h.previous_price - h.price_value) / NULLIF(h.previous_price, 0), 1) AS drop_pct
+            FROM listing_history h
+            JOIN listings l ON l.id = h.listing_id
+            WHERE h.price_value < h.previous_price
+              AND h.changed_at >= CURRENT_TIMESTAMP - make_interval(secs => %s)
+            ORDER BY h.changed_at DESC
+            LIMIT %s
+        """, (days * 86400, limit))
+        return rows or []
+
+    def get_range_activity(self, price_ranges, hours=24):
+        """
+        Liczy nowe ogłoszenia i zmiany cen (wpisy listing_history aktywnych ogłoszeń) z ostatnich
+        'hours' godzin w każdym z podanych zakresów cenowych.
+
+        Args:
+            price_ranges (list): Krotki (price_from, price_to, ...).
+            hours (float): Okno czasowe w godzinach.
+
+        Returns:
+            list: Liczba zmian dla każdego zakresu (w kolejności 'price_ranges') lub None w przypadku błędu.
+        """
+        if not price_ranges:
+            return []
+        rows = self._fetch_dicts("""
+            SELECT r.idx, COUNT(h.id) AS changes
+            FROM unnest(%s::numeric[], %s::numeric[]) WITH ORDINALITY AS r(price_from, price_to, idx)
+            LEFT JOIN listing_history h
+              ON h.changed_at >= CURRENT_TIMESTAMP - make_interval(secs => %s)
+             AND h.is_active IS NOT FALSE
+             AND h.price_value BETWEEN r.price_from AND r.price_to
+            GROUP BY r.idx
+            ORDER BY r.idx
+        """, ([price_range[0] for price_range in price_ranges], [price_range[1] for price_range in price_ranges],
+              hours * 3600))
+        if rows is None:
+            return None
+        return [row['changes'] for row in rows]
+
+    def get_last_run_age(self):
+        """
+        Zwraca liczbę sekund od zakończenia ostatniego udanego przebiegu pełnego skanowania
+        (None, jeśli takiego przebiegu nie było lub wystąpił błąd).
+        """
+        rows = self._fetch_dicts("""
+            SELECT EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP::timestamp - MAX(finished_at))) AS age
+            FROM crawl_runs
+            WHERE status = 'completed'
+        """, ())
+        if not rows or rows[0]['age'] is None:
+            return None
+        return float(rows[0]['age'])
+
+    def get_watermark(self, query_key):
+        """
+        Zwraca znacznik czasu najnowszego ogłoszenia zapisanego w poprzednim przebiegu przyrostowym.
+
+        Args:
+            query_key (str): Klucz zapytania (parametry wyszukiwania).
+
+        Returns:
+            datetime: Znacznik czasu lub None, jeśli zapytanie nie było jeszcze wykonywane.
+        """
+        conn = self.get_connection()
+        if conn is None:
+            return None
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT watermark FROM crawl_watermarks WHERE query_key = %s", (query_key,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            print(f"✗ Błąd podczas odczytu znacznika czasu: {e}")
+            return None
+        finally:
+            cursor.close()
+            self.release_connection(conn)
+
+    def set_watermark(self, query_key, watermark):
+        """Zapisuje znacznik czasu dla zapytania (nigdy nie cofa istniejącego)."""
+        conn = self.get_connection()
+        if conn is None:
+            return
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                INSERT INTO crawl_watermarks (query_key, watermark) VALUES (%s, %s)
+                ON CONFLICT (query_key) DO UPDATE SET
+                    watermark = GREATEST(crawl_watermarks.watermark, EXCLUDED.watermark),
+                    updated_at = CURRENT_TIMESTAMP
+            """, (query_key, watermark))
+            conn.commit()
+        except Exception as e:
+            print(f"✗ Błąd podczas zapisu znacznika czasu: {e}")
+            conn.rollback()
+        finally:
+            cursor.close()
+            self.release_connection(conn)
+
+    def start_run(self):
+        """
+        Rozpoczyna nowy przebieg skanowania. Ogłoszenia zapisane w trakcie przebiegu
+        są oznaczane jego identyfikatorem (last_seen_run_id).
+        Niezakończone wcześniejsze przebiegi (bez punktu kontrolnego do wznowienia) są zamykane
+        jako 'abandoned' - bez deaktywacji ogłoszeń.
+
+        Returns:
+            int: Identyfikator przebiegu lub None w przypadku błędu.
+        """
+        conn = self.get_connection()
+        if conn is None:
+            return None
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE crawl_runs SET finished_at = CURRENT_TIMESTAMP, status = 'abandoned'
+                WHERE finished_at IS NULL
+            """)
+            abandoned_count = cursor.rowcount
+            cursor.execute("INSERT INTO crawl_runs DEFAULT VALUES RETURNING id")
+            run_id = cursor.fetchone()[0]
+            conn.commit()
+            self.current_run_id = run_id
+            self.run_save_failures = 0
+            self.run_failures = 0
+            self.save_totals = {'inserted': 0, 'changed': 0, 'unchanged': 0}
+            if abandoned_count:
+                print(f"[DB] Zamknięto {abandoned_count} przerwanych przebiegów bez punktu kontrolnego.")
+            print(f"[DB] ✓ Rozpoczęto przebieg #{run_id}.")
+            return run_id
+        except Exception as e:
+            print(f"✗ Błąd podczas rozpoczynania przebiegu: {e}")
+            conn.rollback()
+            return None
+        finally:
+            cursor.close()
+            self.release_connection(conn)
+
+    def resume_run(self, run_id):
+        """
+        Wznawia niezakończony przebieg (np. po awarii crawla z punktem kontrolnym), aby ogłoszenia
+        zapisane przed i po wznowieniu miały ten sam last_seen_run_id.
+        Przywraca liczbę błędów przebiegu sprzed wznowienia (run_failures).
+
+        Returns:
+            int: Identyfikator przebiegu lub None, jeśli przebieg nie istnieje albo został już zakończony.
+        """
+        conn = self.get_connection()
+        if conn is None:
+            return None
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id, COALESCE(failures, 0) FROM crawl_runs WHERE id = %s AND finished_at IS NULL",
+                           (run_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            self.current_run_id = row[0]
+            self.run_save_failures = 0
+            self.run_failures = row[1]
+            self.save_totals = {'inserted': 0, 'changed': 0, 'unchanged': 0}
+            print(f"[DB] ✓ Wznowiono przebieg #{row[0]}.")
+            if self.run_failures:
+                print(f"[DB] ⚠️  Przed wznowieniem w przebiegu wystąpiło {self.run_failures} błędów - "
+                      f"deaktywacja zostanie pominięta.")
+            return row[0]
+        except Exception as e:
+            print(f"✗ Błąd podczas wznawiania przebiegu: {e}")
+            return None
+        finally:
+            cursor.close()
+            self.release_connection(conn)
+
+    def record_run_failures(self, run_id, failures):
+        """
+        Zapisuje w crawl_runs łączną liczbę błędów przebiegu (nieudane zapytania i zapisy), aby przetrwała
+        przerwanie crawla - wznowiony przebieg z błędami nie deaktywuje ogłoszeń (zob. resume_run).
+        """
+        if run_id is None or not failures:
+            return
+
+        conn = self.get_connection()
+        if conn is None:
+            return
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute("UPDATE crawl_runs SET failures = GREATEST(COALESCE(failures, 0), %s) WHERE id = %s",
+                           (failures, run_id))
+            conn.commit()
+            if run_id == self.current_run_id:
+                self.run_failures = max(self.run_failures, failures)
+        except Exception as e:
+            print(f"✗ Błąd podczas zapisu błędów przebiegu: {e}")
+            conn.rollback()
+        finally:
+            cursor.close()
+            self.release_connection(conn)
+
+    def finish_run(self, run_id, success):
+        """
+        Kończy przebieg. Jeśli zakończył się sukcesem, jednym zapytaniem deaktywuje
+        wszystkie aktywne ogłoszenia, których przebieg nie widział (sweep).
+        Po nieudanym przebiegu (lub nieudanym zapisie w jego trakcie, także przed wznowieniem
+        z punktu kontrolnego) flagi 'is_active' pozostają bez zmian.
+
+        Returns:
+            int: Liczba deaktywowanych ogłoszeń.
+        """
+        if run_id is None:
+            return 0
+
+        if success and self.run_save_failures:
+            print(f"[DB] ⚠️  {self.run_save_failures} zapisów w przebiegu #{run_id} nie powiodło się.")
+            success = False
+        if success and self.run_failures:
+            print(f"[DB] ⚠️  W przebiegu #{run_id} wystąpiło {self.run_failures} błędów pobierania lub zapisu.")
+            success = False
 
-    def deactivate_all_listings(self):
-        """Ustawia flagę 'is_active = FALSE' dla wszystkich aktywnych ogłoszeń."""
-        print("\n[DB] Deaktywowanie wszystkich ogłoszeń przed skanowaniem...")
         conn = self.get_connection()
         if conn is None:
             return 0
 
         cursor = conn.cursor()
         try:
-            # Deaktywujemy tylko te, które są obecnie aktywne
-            cursor.execute("UPDATE listings SET is_active = FALSE WHERE is_active = TRUE")
-            deactivated_count = cursor.rowcount
+            deactivated_count = 0
+            if success:
+                cursor.execute("""
+                    UPDATE listings SET is_active = FALSE
+                    WHERE is_active = TRUE AND last_seen_run_id IS DISTINCT FROM %s
+                """, (run_id,))
+                deactivated_count = cursor.rowcount
+
+            cursor.execute("""
+                UPDATE crawl_runs SET finished_at = CURRENT_TIMESTAMP, status = %s, deactivated_count = %s
+                WHERE id = %s
+            """, ('completed' if success else 'failed', deactivated_count, run_id))
             conn.commit()
-            print(f"[DB] ✓ Oznaczono {deactivated_count} ogłoszeń jako nieaktywne.")
+
+            if success:
+                print(f"[DB] ✓ Przebieg #{run_id} zakończony. Oznaczono {deactivated_count} niewidzianych ogłoszeń jako nieaktywne.")
+            else:
+                print(f"[DB] ⚠️  Przebieg #{run_id} nie zakończył się poprawnie. Pomijam deaktywację.")
             return deactivated_count
         except Exception as e:
-            print(f"✗ Błąd podczas deaktywacji ogłoszeń: {e}")
+            print(f"✗ Błąd podczas kończenia przebiegu: {e}")
             conn.rollback()
             return 0
         finally:
             cursor.close()
-            conn.close()
+            self.release_connection(conn)
+            if self.current_run_id == run_id:
+                self.current_run_id = None
+
+    @staticmethod
+    def _content_hash(listing):
+        """
+        Stabilny skrót (MD5) zmiennych pól ogłoszenia (HASHED_COLUMNS).
 
+        Parametry (JSON) są przed liczeniem skrótu kodowane ponownie biblioteką standardową, tak jak
+        zapisywał je parser przed wprowadzeniem orjson - skrót nie zależy od biblioteki JSON ani
+        od separatorów, a skróty zapisane wcześniej w bazie pozostają aktualne.
+        """
+        values = list(_hashed_values(listing))
+        params = values[_PARAMS_HASH_INDEX]
+        if params is not None:
+            values[_PARAMS_HASH_INDEX] = json.dumps(json.loads(params), ensure_ascii=False)
+        payload = json.dumps(values, default=str, ensure_ascii=False)
+        return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+    def _record_save(self, results, total):
+        """Zlicza wynik zapisu (RETURNING inserted, changed) i wyświetla podsumowanie paczki."""
+        inserted = sum(1 for row_inserted, _changed in results if row_inserted)
+        changed = sum(1 for row_inserted, row_changed in results if not row_inserted and row_changed)
+        unchanged = total - inserted - changed
+
+        self.save_totals['inserted'] += inserted
+        self.save_totals['changed'] += changed
+        self.save_totals['unchanged'] += unchanged
+        metrics.DB_ROWS_WRITTEN.inc(inserted, result='inserted')
+        metrics.DB_ROWS_WRITTEN.inc(changed, result='changed')
+        metrics.DB_ROWS_WRITTEN.inc(unchanged, result='unchanged')
+        print(f"   [DB] Nowe: {inserted}, zmienione: {changed}, bez zmian: {unchanged}")
+        return total
+
+    def _listing_values(self, listing):
+        """Zamienia rekord Listing na krotkę w kolejności LISTING_COLUMNS (pola rekordu + kolumny zapisu)."""
+        return (
+            *listing,
+            self._content_hash(listing),
+            True,  # <-- Ustawiamy 'is_active = TRUE' dla wstawianych/aktualizowanych
+            self.current_run_id
+        )
+
+    def _save_with_copy(self, conn, cursor, listings):
+        """
+        Tryb masowy: strumieniuje wiersze przez COPY do tymczasowej tabeli (bez WAL),
+        a następnie scala je z 'listings' jednym zapytaniem INSERT ... SELECT ... ON CONFLICT.
+        Wiersze są kodowane leniwie, partiami po 'copy_batch_size'.
+        """
+        columns = ', '.join(LISTING_COLUMNS)
+        staging_columns = ', '.join(
+            f"{column}::timestamptz AS {column}" if column in TIMESTAMP_COLUMNS else column
+            for column in LISTING_COLUMNS
+        )
+        try:
+            cursor.execute(f"""
+                CREATE TEMP TABLE IF NOT EXISTS listings_staging
+                ON COMMIT DELETE ROWS
+                AS SELECT {staging_columns} FROM listings WITH NO DATA
+            """)
+
+            results = []
+            for start in range(0, len(listings), self.copy_batch_size):
+                results.extend(self._copy_batch(cursor, columns, listings[start:start + self.copy_batch_size]))
+
+            self._commit(conn)
+            return self._record_save(results, len(listings))
+        except Exception as e:
+            print(f"✗ Błąd podczas zapisu (COPY) do bazy: {e}")
+            conn.rollback()
+            self.run_save_failures += 1
+            return 0
+        finally:
+            cursor.close()
+            self.release_connection(conn)
+
+    def _copy_batch(self, cursor, columns, batch):
+        """Jedna partia trybu masowego: COPY do tabeli tymczasowej i scalenie z 'listings' (zwraca RETURNING)."""
+        cursor.copy_expert(
+            f"COPY listings_staging ({columns}) FROM STDIN",
+            CopyRowsReader(self._listing_values(listing) for listing in batch)
+        )
+        cursor.execute(f"""
+            INSERT INTO listings ({columns})
+            SELECT {columns} FROM listings_staging
+            {UPSERT_CONFLICT_CLAUSE}
+        """)
+        results = cursor.fetchall()
+        cursor.execute("TRUNCATE listings_staging")
+        return results
+
+    def _commit(self, conn):
+        """Zatwierdza transakcję zapisu ogłoszeń (osobna metoda, by profilowanie mogło zmierzyć commit)."""
+        conn.commit()
+
+    @metrics.DB_WRITE_SECONDS.time()
     def save_to_database(self, listings_data):
         """
         Zapisuje listę ogłoszeń do bazy danych PostgreSQL (INSERT ... ON CONFLICT).
-        Wszystkie zapisywane/aktualizowane ogłoszenia są oznaczane jako 'is_active = TRUE'.
+        Wszystkie zapisywane/aktualizowane ogłoszenia są oznaczane jako 'is_active = TRUE'
+        oraz identyfikatorem bieżącego przebiegu (last_seen_run_id), jeśli trwa.
+        W trybie masowym (bulk_copy) wiersze trafiają do bazy przez COPY i tabelę tymczasową.
+
+        Ogłoszenia bez zmian (ten sam content_hash) nie są przepisywane - dostają tylko znacznik
+        przebiegu lub są pomijane. Liczby nowych/zmienionych/niezmienionych są sumowane w 'save_totals'.
 
         Args:
-            listings_data (list): Lista słowników z danymi ogłoszeń.
+            listings_data (list): Lista rekordów Listing.
 
         Returns:
-            int: Liczba zapisanych/zaktualizowanych wierszy.
+            int: Liczba przetworzonych (zapisanych, zaktualizowanych lub niezmienionych) ogłoszeń.
         """
         if not listings_data:
             return 0
@@ -175,8 +862,8 @@ class Database:
         seen_ids = set()
         unique_listings = []
         for listing in listings_data:
-            if listing['olx_id'] not in seen_ids:
-                seen_ids.add(listing['olx_id'])
+            if listing.olx_id not in seen_ids:
+                seen_ids.add(listing.olx_id)
                 unique_listings.append(listing)
 
         if len(unique_listings) < len(listings_data):
@@ -188,118 +875,149 @@ class Database:
 
         conn = self.get_connection()
         if conn is None:
+            self.run_save_failures += 1
             return 0
 
         cursor = conn.cursor()
 
+        if self.bulk_copy:
+            return self._save_with_copy(conn, cursor, unique_listings)
+
         # Zapytanie z ON CONFLICT DO UPDATE
-        insert_query = """
-            INSERT INTO listings (
-                olx_id, title, price_label, price_value, currency, negotiable,
-                location_city, location_region, location_district, latitude, longitude,
-                map_radius, map_zoom, created_time, refreshed_time, valid_to_time,
-                url, description, offer_type, business, user_id, user_name, user_type,
-                user_created, user_last_seen, user_is_online, category_id,
-                promoted, highlighted, urgent, premium_ad, promotion_options,
-                photos_count, photos_urls, params, phone_protected, chat_available,
-                courier_available, scraped_at, is_active
-            ) VALUES %s
-            ON CONFLICT (olx_id) DO UPDATE SET
-                price_value = EXCLUDED.price_value,
-                price_label = EXCLUDED.price_label,
-                refreshed_time = EXCLUDED.refreshed_time,
-                promoted = EXCLUDED.promoted,
-                highlighted = EXCLUDED.highlighted,
-                urgent = EXCLUDED.urgent,
-                photos_count = EXCLUDED.photos_count,
-                photos_urls = EXCLUDED.photos_urls,
-                params = EXCLUDED.params,
-                description = EXCLUDED.description,
-                title = EXCLUDED.title,
-                updated_at = CURRENT_TIMESTAMP,
-                is_active = TRUE
+        insert_query = f"""
+            INSERT INTO listings ({', '.join(LISTING_COLUMNS)}) VALUES %s
+            {UPSERT_CONFLICT_CLAUSE}
         """
 
         # Przygotowanie danych do execute_values
-        values = [
-            (
-                listing['olx_id'], listing['title'], listing['price_label'],
-                listing['price_value'], listing['currency'], listing['negotiable'],
-                listing['location_city'], listing['location_region'],
-                listing['location_district'], listing['latitude'], listing['longitude'],
-                listing['map_radius'], listing['map_zoom'], listing['created_time'],
-                listing['refreshed_time'], listing['valid_to_time'], listing['url'],
-                listing['description'], listing['offer_type'], listing['business'],
-                listing['user_id'], listing['user_name'], listing['user_type'],
-                listing['user_created'], listing['user_last_seen'], listing['user_is_online'],
-                listing['category_id'], listing['promoted'], listing['highlighted'],
-                listing['urgent'], listing['premium_ad'], listing['promotion_options'],
-                listing['photos_count'], listing['photos_urls'], listing['params'],
-                listing['phone_protected'], listing['chat_available'],
-                listing['courier_available'], listing['scraped_at'],
-                True  # <-- Ustawiamy 'is_active = TRUE' dla wstawianych/aktualizowanych
-            ) for listing in unique_listings
-        ]
+        values = [self._listing_values(listing) for listing in unique_listings]
 
         try:
-            execute_values(cursor, insert_query, values)
-            saved = cursor.rowcount
-            conn.commit()
-            return saved
+            results = execute_values(cursor, insert_query, values, fetch=True)
+            self._commit(conn)
+            return self._record_save(results, len(values))
         except Exception as e:
             print(f"✗ Błąd podczas zapisu do bazy: {e}")
             conn.rollback()
+            self.run_save_failures += 1
             return 0
         finally:
             cursor.close()
-            conn.close()
+            self.release_connection(conn)
+
+    def get_stats(self, price_buckets=None):
+        """
+        Pobiera i wyświetla statystyki bazy danych jednym przebiegiem po tabeli 'listings'
+        (agregaty z FILTER i GROUPING SETS zamiast osobnych zapytań).
+
+        Args:
+            price_buckets (list): Progi przedziałów cenowych (domyślnie STATS_PRICE_BUCKETS).
+
+        Returns:
+            dict: Statystyki ('total', 'active', 'inactive', 'avg_price', 'promoted',
+                'min_created', 'max_created') oraz rozbicia aktywnych ogłoszeń
+                'by_region' i 'by_price_bucket'; None w przypadku błędu.
+        """
+        buckets = sorted(price_buckets or STATS_PRICE_BUCKETS)
 
-    def get_stats(self):
-        """Pobiera i wyświetla podstawowe statystyki z bazy danych."""
         conn = self.get_connection()
         if conn is None:
             print("✗ Nie można pobrać statystyk, brak połączenia z bazą.")
-            return
+            return None
 
         cursor = conn.cursor()
 
         try:
-            cursor.execute("SELECT COUNT(*) FROM listings")
-            total = cursor.fetchone()[0]
-
-            cursor.execute("SELECT COUNT(*) FROM listings WHERE is_active = TRUE")
-            total_active = cursor.fetchone()[0]
-
-            cursor.execute("SELECT COUNT(*) FROM listings WHERE is_active = FALSE")
-            total_inactive = cursor.fetchone()[0]
-
-            cursor.execute(
-                "SELECT AVG(price_value) FROM listings WHERE price_value IS NOT NULL AND currency = 'PLN' AND is_active = TRUE")
-            avg_price_result = cursor.fetchone()[0]
-            avg_price = float(avg_price_result) if avg_price_result else None
-
-            cursor.execute("SELECT COUNT(*) FROM listings WHERE promoted = TRUE AND is_active = TRUE")
-            promoted = cursor.fetchone()[0]
-
-            cursor.execute("SELECT MIN(created_time), MAX(created_time) FROM listings WHERE is_active = TRUE")
-            min_date, max_date = cursor.fetchone()
-
-            print(f"\n{'=' * 60}")
-            print("📊 STATYSTYKI BAZY DANYCH")
-            print(f"{'=' * 60}")
-            print(f"   Ogłoszenia łącznie (w bazie): {total}")
-            print(f"   Ogłoszenia AKTYWNE: {total_active}")
-            print(f"   Ogłoszenia NIEAKTYWNE: {total_inactive}")
-            if avg_price:
-                print(f"   Średnia cena (Aktywne, PLN): {avg_price:.2f} PLN")
-            else:
-                print("   Średnia cena (Aktywne, PLN): Brak danych")
-            print(f"   Promowane (Aktywne): {promoted}")
-            if min_date:
-                print(f"   Zakres dat (Aktywne): od {min_date.strftime('%Y-%m-%d')} do {max_date.strftime('%Y-%m-%d')}")
+            cursor.execute("""
+                SELECT GROUPING(location_region) = 0 AS by_region,
+                       GROUPING(bucket) = 0 AS by_bucket,
+                       location_region,
+                       bucket,
+                       COUNT(*),
+                       COUNT(*) FILTER (WHERE is_active = TRUE),
+                       COUNT(*) FILTER (WHERE is_active = FALSE),
+                       AVG(price_value) FILTER (WHERE is_active = TRUE AND currency = 'PLN'),
+                       COUNT(*) FILTER (WHERE is_active = TRUE AND promoted = TRUE),
+                       MIN(created_time) FILTER (WHERE is_active = TRUE),
+                       MAX(created_time) FILTER (WHERE is_active = TRUE)
+                FROM (
+                    SELECT is_active, price_value, currency, promoted, created_time, location_region,
+                           width_bucket(price_value, %s::numeric[]) AS bucket
+                    FROM listings
+                ) AS l
+                GROUP BY GROUPING SETS ((), (location_region), (bucket))
+            """, (buckets,))
+
+            stats = {'by_region': [], 'by_price_bucket': []}
+            for (by_region, by_bucket, region, bucket, total, active, inactive,
+                 avg_price, promoted, min_date, max_date) in cursor.fetchall():
+                avg_price = float(avg_price) if avg_price is not None else None
+                if by_region:
+                    if active:
+                        stats['by_region'].append({'region': region, 'active': active, 'avg_price': avg_price})
+                elif by_bucket:
+                    if active and bucket is not None:
+                        stats['by_price_bucket'].append({
+                            'price_from': buckets[bucket - 1] if bucket > 0 else None,
+                            'price_to': buckets[bucket] if bucket < len(buckets) else None,
+                            'active': active,
+                            'avg_price': avg_price
+                        })
+                else:
+                    stats.update({
+                        'total': total,
+                        'active': active,
+                        'inactive': inactive,
+                        'avg_price': avg_price,
+                        'promoted': promoted,
+                        'min_created': min_date,
+                        'max_created': max_date
+                    })
+
+            stats['by_region'].sort(key=lambda row: row['active'], reverse=True)
+            stats['by_price_bucket'].sort(key=lambda row: row['price_from'] if row['price_from'] is not None else -1)
+
+            self._print_stats(stats)
+            return stats
 
         except Exception as e:
             print(f"✗ Błąd podczas pobierania statystyk: {e}")
+            return None
         finally:
             cursor.close()
-            conn.close()
\ No newline at end of file
+            self.release_connection(conn)
+
+    @staticmethod
+    def _print_stats(stats, top_regions=10):
+        """Wyświetla statystyki zwrócone przez get_stats."""
+        print(f"\n{'=' * 60}")
+        print("📊 STATYSTYKI BAZY DANYCH")
+        print(f"{'=' * 60}")
+        print(f"   Ogłoszenia łącznie (w bazie): {stats['total']}")
+        print(f"   Ogłoszenia AKTYWNE: {stats['active']}")
+        print(f"   Ogłoszenia NIEAKTYWNE: {stats['inactive']}")
+        if stats['avg_price']:
+            print(f"   Średnia cena (Aktywne, PLN): {stats['avg_price']:.2f} PLN")
+        else:
+            print("   Średnia cena (Aktywne, PLN): Brak danych")
+        print(f"   Promowane (Aktywne): {stats['promoted']}")
+        if stats['min_created']:
+            print(f"   Zakres dat (Aktywne): od {stats['min_created'].strftime('%Y-%m-%d')} "
+                  f"do {stats['max_created'].strftime('%Y-%m-%d')}")
+
+        if stats['by_region']:
+            print(f"\n   Regiony (Aktywne, top {top_regions}):")
+            for row in stats['by_region'][:top_regions]:
+                avg = f"{row['avg_price']:.2f} PLN" if row['avg_price'] else "brak danych"
+                print(f"      {row['region'] or 'brak regionu'}: {row['active']} (śr. {avg})")
+
+        if stats['by_price_bucket']:
+            print("\n   Przedziały cenowe (Aktywne):")
+            for row in stats['by_price_bucket']:
+                if row['price_from'] is None:
+                    label = f"< {row['price_to']}"
+                elif row['price_to'] is None:
+                    label = f">= {row['price_from']}"
+                else:
+                    label = f"{row['price_from']}-{row['price_to']}"
+                print(f"      {label} PLN: {row['active']}")
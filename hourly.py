@@ -0,0 +1,66 @@
+import config
+import metrics
+import profiling
+from database import Database
+from scraper import OLXGraphQLScraper
+import time
+
+# ========== CO GODZINĘ (PRZYROSTOWE POBIERANIE NOWYCH OGŁOSZEŃ) ==========
+
+if __name__ == "__main__":
+
+    if not config.DB_CONFIG['password']:
+        print("BŁĄD KRYTYCZNY: Brak hasła do bazy danych w pliku .env")
+        print("Zatrzymałem działanie skryptu.")
+    else:
+        if config.METRICS_PORT:
+            metrics.serve(config.METRICS_PORT)
+        profiler = profiling.install(cprofile=config.PROFILE_CPROFILE) if config.PROFILE else None
+        db = None
+        scraper = None
+
+        try:
+            start_time = time.time()
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Uruchamiam przyrostowe pobieranie...")
+
+            print("Łączenie z bazą danych...")
+            db = Database(
+                db_config=config.DB_CONFIG,
+                pool_min=config.DB_POOL_MIN,
+                pool_max=config.DB_POOL_MAX,
+                bulk_copy=config.DB_BULK_COPY,
+                copy_batch_size=config.DB_COPY_BATCH_SIZE
+            )
+
+            scraper = OLXGraphQLScraper(database=db)
+
+            CATEGORY_ELECTRIC_BIKES = 767
+
+            # Ustaw 'None', aby pobrać wszystkie (nowe i używane)
+            STATE_FILTER = None
+
+            # Pobieramy tylko ogłoszenia nowsze niż w poprzednim przebiegu.
+            # Nie deaktywujemy ogłoszeń - to zadanie pełnego skanowania (daily.py).
+            scraper.scrape_incremental(
+                query='rowery elektryczne',
+                max_results=999,
+                batch_size=40,
+                category_id=CATEGORY_ELECTRIC_BIKES,
+                state=STATE_FILTER
+            )
+
+            end_time = time.time()
+            print(f"\nCałkowity czas operacji: {end_time - start_time:.2f} sek.")
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Zakończono.")
+
+        except Exception as e:
+            print(f"\nNapotkano nieoczekiwany błąd główny: {e}")
+        finally:
+            # Sesja HTTP i procesy ParsePool scrapera, a potem pula połączeń z bazą
+            if scraper is not None:
+                scraper.close()
+            if db is not None:
+                db.close()
+            metrics.report(config.METRICS_DUMP_PATH)
+            if profiler:
+                profiler.report(config.PROFILE_DIR, 'hourly')
@@ -0,0 +1,54 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import List, NamedTuple, Optional, Union
+
+
+class Listing(NamedTuple):
+    """
+    Sparsowane ogłoszenie OLX (wynik OLXGraphQLScraper.parse_listing).
+
+    Krotka nazwana nie ma słownika atrybutów (__dict__), więc zajmuje wielokrotnie mniej
+    pamięci niż słownik z 39 kluczami. Kolejność pól jest taka sama jak kolejność kolumn
+    w INSERT (database.LISTING_COLUMNS), dzięki czemu rekord trafia do zapisu bez przepisywania pól.
+    Pola są dostępne jako atrybuty (listing.title); _asdict() zwraca zwykły słownik.
+    """
+
+    olx_id: str
+    title: Optional[str]
+    price_label: Optional[str]
+    price_value: Optional[Union[float, Decimal]]
+    currency: Optional[str]
+    negotiable: bool
+    location_city: Optional[str]
+    location_region: Optional[str]
+    location_district: Optional[str]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    map_radius: Optional[int]
+    map_zoom: Optional[int]
+    created_time: Optional[datetime]
+    refreshed_time: Optional[datetime]
+    valid_to_time: Optional[datetime]
+    url: Optional[str]
+    description: Optional[str]
+    offer_type: Optional[str]
+    business: bool
+    user_id: Optional[str]
+    user_name: Optional[str]
+    user_type: Optional[str]
+    user_created: Optional[datetime]
+    user_last_seen: Optional[datetime]
+    user_is_online: bool
+    category_id: Optional[Union[int, str]]
+    promoted: bool
+    highlighted: bool
+    urgent: bool
+    premium_ad: bool
+    promotion_options: List[str]
+    photos_count: int
+    photos_urls: List[str]
+    params: Optional[str]
+    phone_protected: bool
+    chat_available: bool
+    courier_available: bool
+    scraped_at: datetime
@@ -0,0 +1,161 @@
+import json
+from datetime import datetime
+from functools import lru_cache
+
+from listing import Listing
+
+try:
+    import orjson
+except ImportError:  # orjson jest opcjonalny - bez niego używamy biblioteki standardowej
+    orjson = None
+
+# Rozmiar cache sparsowanych znaczników czasu (np. user.created powtarza się u każdego ogłoszenia sprzedawcy)
+TIMESTAMP_CACHE_SIZE = 8192
+
+PHOTO_WIDTH = '1200'
+PHOTO_HEIGHT = '900'
+
+
+def loads(data):
+    """Dekoduje odpowiedź JSON (bytes lub str) - przez orjson, jeśli jest dostępny."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj):
+    """
+    Koduje obiekt do zwartego JSON (str) bez escapowania znaków spoza ASCII.
+    Wynik z orjson i bez niego może się różnić zapisem liczb (np. 1e16 i 1e+16, NaN jako null),
+    dlatego skrót treści ogłoszenia (Database._content_hash) liczony jest z postaci kanonicznej.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def parse_timestamp(timestamp_str):
+    """Konwertuje timestamp ISO z OLX na obiekt datetime (wyniki są zapamiętywane)."""
+    if not timestamp_str:
+        return None
+    try:
+        return datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+    except ValueError:
+        print(f"Nie udało się sparsować daty: {timestamp_str}")
+        return None
+
+
+def _split_params(params):
+    """
+    Jedno przejście po parametrach ogłoszenia.
+
+    Returns:
+        tuple: (wartość PriceParam albo None, lista parametrów GenericParam do JSONB)
+    """
+    price = None
+    generic = []
+    for param in params:
+        value = param.get('value') or {}
+        typename = value.get('__typename')
+        if typename == 'GenericParam':
+            generic.append({
+                'name': param.get('name'),
+                'key': param.get('key'),
+                'value': value.get('label')
+            })
+        elif typename == 'PriceParam' and price is None and param.get('key') == 'price':
+            price = value
+    return price, generic
+
+
+def extract_price(params):
+    """Wyciąga dane o cenie z listy parametrów."""
+    price, _generic = _split_params(params)
+    if price is None:
+        return None
+    return {
+        'value': price.get('value'),
+        'currency': price.get('currency'),
+        'label': price.get('label'),
+        'negotiable': price.get('negotiable', False)
+    }
+
+
+def parse_listing(listing):
+    """Przetwarza surowy słownik JSON ogłoszenia na rekord Listing (format do bazy danych)."""
+    location = listing.get('location') or {}
+    map_data = listing.get('map') or {}
+    user = listing.get('user') or {}
+    contact = listing.get('contact') or {}
+    promotion = listing.get('promotion') or {}
+    price, params_list = _split_params(listing.get('params') or ())
+
+    photos = listing.get('photos', [])
+    photo_urls = [
+        photo.get('link', '').replace('{width}', PHOTO_WIDTH).replace('{height}', PHOTO_HEIGHT) for photo in photos
+    ]
+
+    city = location.get('city') or {}
+    region = location.get('region') or {}
+    district = location.get('district') or {}
+    category = listing.get('category') or {}
+
+    return Listing(
+        olx_id=listing.get('id'),
+        title=listing.get('title'),
+        url=listing.get('url'),
+        description=listing.get('description', ''),
+        created_time=parse_timestamp(listing.get('created_time')),
+        refreshed_time=parse_timestamp(listing.get('last_refresh_time')),
+        valid_to_time=parse_timestamp(listing.get('valid_to_time')),
+        offer_type=listing.get('offer_type'),
+        business=listing.get('business', False),
+        price_value=price.get('value') if price is not None else None,
+        price_label=price.get('label') if price is not None else 'Brak ceny',
+        currency=price.get('currency') if price is not None else None,
+        negotiable=price.get('negotiable', False) if price is not None else False,
+        location_city=city.get('name'),
+        location_region=region.get('name'),
+        location_district=district.get('name'),
+        latitude=map_data.get('lat'),
+        longitude=map_data.get('lon'),
+        map_radius=map_data.get('radius'),
+        map_zoom=map_data.get('zoom'),
+        user_id=user.get('uuid'),
+        user_name=user.get('name'),
+        user_type=user.get('seller_type'),
+        user_created=parse_timestamp(user.get('created')),
+        user_last_seen=parse_timestamp(user.get('last_seen')),
+        user_is_online=user.get('is_online', False),
+        category_id=category.get('id'),
+        promoted=promotion.get('top_ad', False),  # <-- To jest flaga ogłoszenia 'TOP'
+        highlighted=promotion.get('highlighted', False),
+        urgent=promotion.get('urgent', False),
+        premium_ad=promotion.get('premium_ad_page', False),
+        promotion_options=promotion.get('options', []),
+        photos_count=len(photos),
+        photos_urls=photo_urls,
+        phone_protected=listing.get('protect_phone', False),
+        chat_available=contact.get('chat', False),
+        courier_available=contact.get('courier', False),
+        params=dumps(params_list) if params_list else None,
+        scraped_at=datetime.now()
+    )
+
+
+def parse_page(payload):
+    """
+    Dekoduje surową odpowiedź API (bytes) i parsuje wszystkie ogłoszenia strony.
+    Funkcja poziomu modułu, więc może być wykonywana w procesach ParsePool.
+
+    Returns:
+        tuple: (lista rekordów Listing, metadata) albo (None, None), gdy odpowiedź nie jest 'ListingSuccess'.
+
+    Raises:
+        ValueError: Gdy odpowiedź nie jest poprawnym JSON.
+    """
+    listings_data = (loads(payload).get('data') or {}).get('clientCompatibleListings') or {}
+    if listings_data.get('__typename') != 'ListingSuccess':
+        return None, None
+    return [parse_listing(listing) for listing in listings_data.get('data') or ()], listings_data.get('metadata', {})
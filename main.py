@@ -1,6 +1,9 @@
 import config
+import metrics
+import profiling
 from database import Database
 from scraper import OLXGraphQLScraper
+from plan_cache import PartitionPlanCache
 
 # ========== GŁÓWNY PUNKT URUCHOMIENIA ==========
 
@@ -10,11 +13,26 @@ if __name__ == "__main__":
         print("BŁĄD KRYTYCZNY: Brak hasła do bazy danych w pliku .env")
         print("Zatrzymałem działanie skryptu.")
     else:
+        if config.METRICS_PORT:
+            metrics.serve(config.METRICS_PORT)
+        profiler = profiling.install(cprofile=config.PROFILE_CPROFILE) if config.PROFILE else None
+        db = None
+        scraper = None
+
         try:
             print("Łączenie z bazą danych...")
-            db = Database(db_config=config.DB_CONFIG)
+            db = Database(
+                db_config=config.DB_CONFIG,
+                pool_min=config.DB_POOL_MIN,
+                pool_max=config.DB_POOL_MAX,
+                bulk_copy=config.DB_BULK_COPY,
+                copy_batch_size=config.DB_COPY_BATCH_SIZE
+            )
 
-            scraper = OLXGraphQLScraper(database=db)
+            scraper = OLXGraphQLScraper(
+                database=db,
+                plan_cache=PartitionPlanCache(config.PLAN_CACHE_PATH, config.PLAN_CACHE_TTL)
+            )
 
             CATEGORY_ELECTRIC_BIKES = 767
 
@@ -35,24 +53,35 @@ if __name__ == "__main__":
             # PRICE_TO_FILTER = None
             # ==========================================================
 
-            listings = scraper.scrape_recursive(
+            summary = scraper.scrape_recursive(
                 query='rowery elektryczne',
                 target_results=50000,
                 batch_size=40,
                 category_id=CATEGORY_ELECTRIC_BIKES,
                 state=STATE_FILTER,
                 initial_price_from=PRICE_FROM_FILTER,  # <-- Przekazanie dolnego zakresu
-                initial_price_to=PRICE_TO_FILTER  # <-- Przekazanie górnego zakresu
+                initial_price_to=PRICE_TO_FILTER,  # <-- Przekazanie górnego zakresu
+                concurrency=config.CRAWL_CONCURRENCY,
+                keep_listings=False  # Tylko podsumowanie i próbka - pełne ogłoszenia są już w bazie
             )
 
             db.get_stats()
 
             print("\n📋 Przykładowe pobrane ogłoszenia:")
-            for i, listing in enumerate(listings[:3], 1):
-                print(f"\n{i}. {listing['title']}")
-                print(f"   💰 Cena: {listing['price_label']}")
-                print(f"   📍 Lokalizacja: {listing['location_city']}")
-                print(f"   🔗 URL: {listing['url']}")
+            for i, listing in enumerate(summary['sample'], 1):
+                print(f"\n{i}. {listing.title}")
+                print(f"   💰 Cena: {listing.price_label}")
+                print(f"   📍 Lokalizacja: {listing.location_city}")
+                print(f"   🔗 URL: {listing.url}")
 
         except Exception as e:
-            print(f"\nNapotkano nieoczekiwany błąd główny: {e}")
\ No newline at end of file
+            print(f"\nNapotkano nieoczekiwany błąd główny: {e}")
+        finally:
+            # Sesja HTTP i procesy ParsePool scrapera, a potem pula połączeń z bazą
+            if scraper is not None:
+                scraper.close()
+            if db is not None:
+                db.close()
+            metrics.report(config.METRICS_DUMP_PATH)
+            if profiler:
+                profiler.report(config.PROFILE_DIR, 'main')
\ No newline at end of file
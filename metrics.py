@@ -0,0 +1,271 @@
+"""
+Metryki crawlera (liczniki, wskaźniki, histogramy) w formacie tekstowym Prometheus/OpenMetrics.
+
+Metryki są zbierane w procesie (bezpiecznie wątkowo) i mogą być udostępnione na lokalnym
+endpoincie HTTP (serve) albo zapisane do pliku na koniec przebiegu (dump). Implementacja
+nie wymaga dodatkowych bibliotek.
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metryka {self.name} wymaga etykiet {self.labelnames}, podano {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """Lista krotek (nazwa próbki, wartości etykiet, dodatkowe etykiety, wartość)."""
+        raise NotImplementedError
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for sample_name, label_values, extra, value in self.samples():
+            lines.append(f"{sample_name}{_format_labels(self.labelnames, label_values, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Licznik (tylko rośnie). Nazwa próbki ma przyrostek '_total'."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def total(self):
+        return sum(self._values.values())
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(f"{self.name}_total", key, None, value) for key, value in items]
+
+
+class Gauge(_Metric):
+    """Wskaźnik (bieżąca wartość, np. głębokość kolejki)."""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, key, None, value) for key, value in items]
+
+
+class Histogram(_Metric):
+    """Histogram (np. czasów zapytań) o stałych przedziałach."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def time(self, **labels):
+        """Dekorator mierzący czas wykonania funkcji."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, **labels)
+            return wrapper
+        return decorator
+
+    def count(self, **labels):
+        counts, _total = self._values.get(self._key(labels), ((), 0.0))
+        return sum(counts)
+
+    def sum(self, **labels):
+        return self._values.get(self._key(labels), ((), 0.0))[1]
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        samples = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key, [('le', _format_value(bound))], cumulative))
+            samples.append((f"{self.name}_sum", key, None, total))
+            samples.append((f"{self.name}_count", key, None, cumulative))
+        return samples
+
+
+class Registry:
+    """Zbiór metryk procesu."""
+
+    def __init__(self):
+        self._metrics = []
+        self.started_at = time.time()
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def expose(self):
+        """Wszystkie metryki w formacie tekstowym Prometheus/OpenMetrics."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'olx_request_duration_seconds', "Czas zapytania do API OLX według fazy.", ['phase']))
+RESPONSE_BYTES = REGISTRY.register(Counter(
+    'olx_response_bytes', "Bajty odebrane z API OLX (przed dekompresją) według fazy.", ['phase']))
+REQUEST_RETRIES = REGISTRY.register(Counter(
+    'olx_request_retries', "Ponowienia zapytań według przyczyny (kod HTTP albo 'connection').", ['reason']))
+REQUEST_ERRORS = REGISTRY.register(Counter(
+    'olx_request_errors', "Zapytania zakończone błędem według kodu (HTTP, 'json', 'api', 'exhausted').", ['code']))
+LISTINGS_PARSED = REGISTRY.register(Counter(
+    'olx_listings_parsed', "Sparsowane ogłoszenia."))
+PARSE_SECONDS = REGISTRY.register(Histogram(
+    'olx_parse_duration_seconds', "Czas dekodowania i parsowania strony odpowiedzi.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)))
+DB_WRITE_SECONDS = REGISTRY.register(Histogram(
+    'olx_db_write_duration_seconds', "Czas zapisu paczki ogłoszeń do bazy (save_to_database)."))
+DB_ROWS_WRITTEN = REGISTRY.register(Counter(
+    'olx_db_rows_written', "Ogłoszenia zapisane do bazy według wyniku (inserted/changed/unchanged).", ['result']))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'olx_queue_depth', "Głębokość kolejek: strony czekające na zapis (writer), zakresy do przetworzenia (ranges).",
+    ['queue']))
+PARTITION_SPLITS = REGISTRY.register(Counter(
+    'olx_partition_splits', "Podziały zakresów: po cenie (price) i po wymiarach wyszukiwania (state/region/sort).",
+    ['kind']))
+SCHEDULER_PASSES = REGISTRY.register(Counter(
+    'olx_scheduler_passes', "Przebiegi harmonogramu demona według poziomu i wyniku (ok/error).", ['tier', 'result']))
+SCHEDULER_PASS_SECONDS = REGISTRY.register(Histogram(
+    'olx_scheduler_pass_duration_seconds', "Czas przebiegu poziomu harmonogramu demona.", ['tier'],
+    buckets=(1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 7200.0, 14400.0)))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip('/') not in ('', '/metrics'):
+            self.send_error(404)
+            return
+        body = REGISTRY.expose().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Czy metryki są udostępniane przez serve() (wtedy report() wypisuje podsumowanie)
+_serving = False
+
+
+def serve(port, host='127.0.0.1'):
+    """Udostępnia metryki na http://host:port/metrics (wątek tła). Zwraca serwer."""
+    global _serving
+    httpd = ThreadingHTTPServer((host, port), _Handler)
+    _serving = True
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, name="MetricsServer", daemon=True).start()
+    print(f"📈 Metryki dostępne pod http://{host}:{httpd.server_address[1]}/metrics")
+    return httpd
+
+
+def dump(path):
+    """Zapisuje bieżące metryki do pliku (format tekstowy Prometheus/OpenMetrics)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(REGISTRY.expose())
+        print(f"📈 Zapisano metryki: {path}")
+    except OSError as e:
+        print(f"✗ Nie można zapisać metryk ({path}): {e}")
+
+
+def print_summary():
+    """Krótkie podsumowanie przebiegu: gdzie poszedł czas i ile danych przetworzono."""
+    elapsed = max(time.time() - REGISTRY.started_at, 1e-9)
+    parsed = LISTINGS_PARSED.total()
+    print(f"\n📈 Metryki przebiegu ({elapsed:.1f} s):")
+    for (phase,), (counts, total) in sorted(REQUEST_SECONDS._values.items()):
+        requests_count = sum(counts)
+        print(f"   Zapytania [{phase}]: {requests_count}, łącznie {total:.1f} s, "
+              f"śr. {total / requests_count * 1000:.0f} ms, {RESPONSE_BYTES.value(phase=phase) / 1e6:.1f} MB")
+    print(f"   Ponowienia: {REQUEST_RETRIES.total()}, błędy: {REQUEST_ERRORS.total()}")
+    print(f"   Sparsowano: {parsed} ogłoszeń ({parsed / elapsed:.1f}/s, parsowanie {PARSE_SECONDS.sum():.1f} s)")
+    print(f"   Zapis do bazy: {DB_WRITE_SECONDS.count()} paczek, {DB_WRITE_SECONDS.sum():.1f} s, "
+          f"{DB_ROWS_WRITTEN.total()} wierszy")
+    print(f"   Podziały zakresów: {PARTITION_SPLITS.total()}")
+
+
+def report(dump_path=None):
+    """
+    Na koniec przebiegu: podsumowanie metryk i (opcjonalnie) zapis do pliku.
+    Bez włączonych metryk (serve) i bez ścieżki zapisu nic nie wypisuje.
+    """
+    if not (_serving or dump_path):
+        return
+    print_summary()
+    if dump_path:
+        dump(dump_path)
@@ -0,0 +1,265 @@
+"""
+Lokalny serwer imitujący API GraphQL OLX (clientCompatibleListings) do testów i pomiarów bez sieci.
+
+Serwer generuje deterministyczny zbiór syntetycznych ogłoszeń o zadanej liczności, obsługuje
+filtry ceny, stanu, regionu i kategorii, sortowanie po dacie i cenie, limit offsetu OLX (1000)
+oraz sztuczne opóźnienie odpowiedzi.
+
+Uruchomienie:  python mock_server.py [--port 8808] [--total 20000] [--latency 0.05]
+"""
+import argparse
+import bisect
+import heapq
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CATEGORY_ID = 767
+REGION_IDS = list(range(1, 17))
+OFFSET_CAP = 1000
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _iso(moment):
+    return moment.isoformat().replace('+00:00', 'Z')
+
+
+def make_listing(i, price=None, created=None, state='used', region_id=None, sellers=200, description_chars=400,
+                 photos=8):
+    """Syntetyczne ogłoszenie w formacie odpowiedzi clientCompatibleListings."""
+    price = price if price is not None else 1000 + i % 9000
+    created = created if created is not None else EPOCH + timedelta(minutes=7 * i)
+    region_id = region_id if region_id is not None else REGION_IDS[i % len(REGION_IDS)]
+    seller = i % sellers
+    description = ("Sprzedam rower elektryczny w bardzo dobrym stanie. " * (description_chars // 50 + 1))
+    return {
+        'id': str(900000000 + i),
+        'title': f"Rower elektryczny {i}",
+        'url': f"https://www.olx.pl/d/oferta/rower-elektryczny-{i}.html",
+        'description': description[:description_chars],
+        'created_time': _iso(created),
+        'last_refresh_time': _iso(created + timedelta(days=1)),
+        'valid_to_time': _iso(created + timedelta(days=30)),
+        'status': 'active',
+        'offer_type': 'offer',
+        'business': seller % 5 == 0,
+        'protect_phone': False,
+        'location': {
+            'city': {'id': 1 + i % 50, 'name': f"Miasto {i % 50}"},
+            'district': None,
+            'region': {'id': region_id, 'name': f"Region {region_id}"}
+        },
+        'map': {'lat': 52.2 + (i % 100) / 1000, 'lon': 21.0, 'radius': 2, 'zoom': 13, 'show_detailed': False},
+        'category': {'id': CATEGORY_ID, 'type': 'goods'},
+        'contact': {'chat': True, 'name': 'Jan', 'negotiation': True, 'phone': True, 'courier': i % 3 == 0},
+        'photos': [{'link': f"https://ireland.apollo.olxcdn.com/v1/files/{i}-{n}/image;s={{width}}x{{height}}"}
+                   for n in range(photos)],
+        'promotion': {'highlighted': False, 'top_ad': i % 20 == 0, 'urgent': False, 'premium_ad_page': False,
+                      'b2c_ad_page': False, 'options': []},
+        'user': {'id': seller, 'uuid': f"user-{seller}", 'name': f"Sprzedawca {seller}", 'seller_type': None,
+                 'created': '2019-05-14T10:11:12Z', 'is_online': False, 'last_seen': '2025-06-01T08:00:00Z'},
+        'params': [
+            {'key': 'price', 'name': 'Cena', 'type': 'price',
+             'value': {'__typename': 'PriceParam', 'value': price, 'currency': 'PLN',
+                       'negotiable': True, 'label': f"{price} zł"}},
+            {'key': 'state', 'name': 'Stan', 'type': 'select',
+             'value': {'__typename': 'GenericParam', 'key': state,
+                       'label': 'Używane' if state == 'used' else 'Nowe'}},
+            {'key': 'wheelsize', 'name': 'Rozmiar koła', 'type': 'select',
+             'value': {'__typename': 'GenericParam', 'key': '28', 'label': '28"'}},
+            {'key': 'framesize', 'name': 'Rozmiar ramy', 'type': 'select',
+             'value': {'__typename': 'GenericParam', 'key': 'l', 'label': 'L (19-20")'}}
+        ]
+    }
+
+
+class MockGraphQLServer:
+    """
+    Serwer HTTP (w wątku tła) odpowiadający na zapytania GraphQL scrapera syntetycznymi stronami.
+
+    Ceny mają rozkład log-normalny (zaokrąglone do pełnych złotych, więc część cen się powtarza),
+    a liczba zapytań i wysłanych bajtów jest zliczana w 'requests_served' i 'bytes_sent'.
+    """
+
+    def __init__(self, total=20000, latency=0.0, host='127.0.0.1', port=0, seed=42, description_chars=400,
+                 photos=8, spikes=None):
+        """
+        Args:
+            total (int): Liczba ogłoszeń w zbiorze.
+            latency (float): Opóźnienie każdej odpowiedzi w sekundach.
+            host (str): Adres nasłuchiwania.
+            port (int): Port (0 = dowolny wolny).
+            seed (int): Ziarno generatora zbioru (ten sam seed = te same ogłoszenia).
+            description_chars (int): Długość opisu ogłoszenia (rozmiar odpowiedzi).
+            photos (int): Liczba zdjęć ogłoszenia.
+            spikes (dict): Dodatkowe ogłoszenia o jednakowej cenie, np. {2999.0: 4000} ("okrągłe" ceny).
+        """
+        self.latency = latency
+        self.description_chars = description_chars
+        self.photos = photos
+        self.requests_served = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+        rng = random.Random(seed)
+        items = []
+        for i in range(total):
+            price = int(min(60000, max(100, rng.lognormvariate(8.3, 0.7))))
+            created = EPOCH + timedelta(seconds=rng.randrange(365 * 24 * 3600))
+            state = 'new' if rng.random() < 0.3 else 'used'
+            items.append((price, i, created, state, rng.choice(REGION_IDS)))
+        for price, count in (spikes or {}).items():
+            for _ in range(count):
+                created = EPOCH + timedelta(seconds=rng.randrange(365 * 24 * 3600))
+                state = 'new' if rng.random() < 0.3 else 'used'
+                items.append((price, len(items), created, state, rng.choice(REGION_IDS)))
+        items.sort()
+        self._items = items
+        self._prices = [item[0] for item in items]
+
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/graphql"
+
+    def start(self):
+        """Uruchamia serwer w wątku tła."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, name="MockGraphQLServer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Zatrzymuje serwer."""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 - połączenia keep-alive jak w API OLX (każda odpowiedź ma Content-Length)
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    payload = json.loads(self.rfile.read(length))
+                    body = json.dumps(mock.respond(payload), ensure_ascii=False).encode('utf-8')
+                    status = 200
+                except (ValueError, KeyError, TypeError) as e:
+                    body = json.dumps({'errors': [{'message': str(e)}]}).encode('utf-8')
+                    status = 400
+
+                if mock.latency:
+                    time.sleep(mock.latency)
+                # Zliczane przed wysłaniem - klient, który dostał odpowiedź, widzi ją już w licznikach
+                with mock._lock:
+                    mock.requests_served += 1
+                    mock.bytes_sent += len(body)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def respond(self, payload):
+        """Buduje odpowiedź GraphQL dla zapytania scrapera (bez warstwy HTTP)."""
+        params = {param['key']: param['value'] for param in payload['variables']['searchParameters']}
+        offset = int(params.get('offset', 0))
+        limit = int(params.get('limit', 40))
+
+        if offset >= OFFSET_CAP:
+            return {'data': {'clientCompatibleListings': {
+                '__typename': 'ListingError',
+                'error': {'code': 400, 'detail': f"Offset {offset} exceeds the limit of {OFFSET_CAP}."}
+            }}}
+        limit = min(limit, OFFSET_CAP - offset)
+
+        matches = self._filter(params)
+        sort_by = params.get('sort_by', 'created_at:desc')
+        if sort_by.startswith('filter_float_price'):
+            key = lambda item: (item[0], item[1])
+        else:
+            key = lambda item: (item[2], item[1])
+        select = heapq.nlargest if sort_by.endswith(':desc') else heapq.nsmallest
+        page = select(offset + limit, matches, key=key)[offset:]
+
+        return {'data': {'clientCompatibleListings': {
+            '__typename': 'ListingSuccess',
+            'data': [
+                make_listing(i, price=price, created=created, state=state, region_id=region_id,
+                             description_chars=self.description_chars, photos=self.photos)
+                for price, i, created, state, region_id in page
+            ],
+            'metadata': {'total_elements': len(matches), 'visible_total_count': min(len(matches), OFFSET_CAP)},
+            'links': {'next': None}
+        }}}
+
+    def _filter(self, params):
+        """Ogłoszenia spełniające filtry kategorii, ceny (włącznie z granicami), stanu i regionu."""
+        if 'category_id' in params and int(params['category_id']) != CATEGORY_ID:
+            return []
+
+        lo = 0
+        hi = len(self._items)
+        if 'filter_float_price:from' in params:
+            lo = bisect.bisect_left(self._prices, float(params['filter_float_price:from']))
+        if 'filter_float_price:to' in params:
+            hi = bisect.bisect_right(self._prices, float(params['filter_float_price:to']))
+        items = self._items[lo:hi]
+
+        state = params.get('filter_enum_state[0]')
+        region_id = params.get('region_id')
+        if state is not None or region_id is not None:
+            items = [
+                item for item in items
+                if (state is None or item[3] == state) and (region_id is None or item[4] == int(region_id))
+            ]
+        return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokalny serwer imitujący API GraphQL OLX.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8808)
+    parser.add_argument('--total', type=int, default=20000, help="Liczba syntetycznych ogłoszeń.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Opóźnienie odpowiedzi w sekundach.")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    server = MockGraphQLServer(total=args.total, latency=args.latency, host=args.host, port=args.port,
+                               seed=args.seed)
+    print(f"Serwer testowy GraphQL: {server.url} ({args.total} ogłoszeń, opóźnienie {args.latency}s)")
+    print(f"Ustaw OLX_API_URL={server.url}, aby skierować do niego scraper.")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import listing_parser
+
+
+class ParsePool:
+    """
+    Parsowanie stron odpowiedzi w puli procesów.
+
+    Przy większej współbieżności parse_listing (czysty CPU) staje się wąskim gardłem, bo
+    wątki pobierające dzielą jeden GIL. Pula przyjmuje surowe odpowiedzi API (bytes), a procesy
+    robocze dekodują JSON, parsują ogłoszenia i serializują parametry, zwracając gotowe do zapisu
+    rekordy Listing. Małe odpowiedzi (< 'min_bytes') są parsowane w bieżącym procesie -
+    koszt przesłania ich do innego procesu byłby większy niż samo parsowanie.
+    Metoda parse() jest bezpieczna wątkowo (wątki czekają na wynik, a parsowanie trwa w procesach).
+    """
+
+    def __init__(self, workers, min_bytes=32768):
+        """
+        Args:
+            workers (int): Liczba procesów roboczych.
+            min_bytes (int): Minimalny rozmiar odpowiedzi parsowanej w puli.
+        """
+        self.workers = max(1, workers)
+        self.min_bytes = min_bytes
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self):
+        """
+        Tworzy pulę przy pierwszym użyciu ('spawn' - bez kopiowania wątków procesu głównego).
+        Pierwsze wywołania mogą przyjść jednocześnie z wielu wątków pobierających - pula powstaje tylko raz.
+        """
+        executor = self._executor
+        if executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                executor = self._executor
+        return executor
+
+    def parse(self, payload):
+        """
+        Parsuje surową odpowiedź API (w puli albo, dla małych odpowiedzi, w bieżącym procesie).
+
+        Returns:
+            tuple: (lista rekordów Listing, metadata) albo (None, None) - jak listing_parser.parse_page.
+        """
+        if len(payload) < self.min_bytes:
+            return listing_parser.parse_page(payload)
+        return self._get_executor().submit(listing_parser.parse_page, payload).result()
+
+    def close(self):
+        """Zamyka procesy robocze."""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
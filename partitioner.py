@@ -0,0 +1,250 @@
+import bisect
+import math
+
+
+class PricePartitioner:
+    """
+    Dobiera punkty podziału zakresu cenowego na podstawie zaobserwowanej gęstości ogłoszeń,
+    zamiast ślepego dzielenia na pół.
+
+    Źródła informacji o gęstości (od najdokładniejszego):
+    - ceny z już pobranych stron (observe_prices),
+    - liczności mniejszych zakresów z wcześniejszych sprawdzeń (observe_count),
+    - rozkład a priori ~1/cena (ceny rowerów są silnie skośne), gdy brak danych.
+
+    Zakres z 'count' ogłoszeniami dzielony jest od razu na tyle części, by każda
+    miała ok. 'fill_ratio * limit' ogłoszeń. Liczność części, które zmieszczą się w limicie,
+    sprawdza dopiero pierwsza strona każdej z nich, a części z szacunkiem (estimate) ponad limit -
+    tanie zapytanie o liczność. Sąsiednie małe liście zapisanego planu podziału są scalane (merge)
+    przed następnym crawlem.
+
+    Filtry ceny API są obustronnie domknięte, a ceny mają dokładność 0.01 PLN, więc sąsiednie
+    części nie dzielą granicy: po części kończącej się na 'cut' następna zaczyna się od 'cut + 0.01'.
+    Dzięki temu ogłoszenia z ceną równą punktowi podziału trafiają tylko do jednej części.
+    """
+
+    CELLS = 64
+    MIN_SAMPLES = 20
+    PRICE_STEP = 0.01
+    # Ceny z pobranych stron są zliczane w stałych kubełkach o szerokości 0.1% ceny (skala logarytmiczna,
+    # ok. 14 tys. kubełków dla cen do 1 mln PLN - pamięć nie rośnie z liczbą pobranych stron)
+    SAMPLE_BUCKET_RATIO = 1.001
+
+    def __init__(self, limit=999, fill_ratio=0.9, max_pieces=32):
+        """
+        Args:
+            limit (int): Maksymalna liczba ogłoszeń w liściu (limit OLX).
+            fill_ratio (float): Docelowe wypełnienie części względem limitu (margines błędu estymacji).
+            max_pieces (int): Maksymalna liczba części przy jednym podziale.
+        """
+        self.limit = limit
+        self.target = max(1, int(limit * fill_ratio))
+        self.max_pieces = max(2, max_pieces)
+        self._observations = []  # (price_from, price_to, count)
+        self._buckets = {}  # indeks kubełka ceny -> liczba ogłoszeń z pobranych stron
+        self._log_ratio = math.log(self.SAMPLE_BUCKET_RATIO)
+
+    @classmethod
+    def next_price(cls, price):
+        """Najniższa cena powyżej 'price' (początek następnej części)."""
+        return round(price + cls.PRICE_STEP, 2)
+
+    @classmethod
+    def can_split(cls, price_from, price_to):
+        """Czy zakres zawiera więcej niż jedną cenę (z dokładnością do 0.01 PLN)."""
+        return round(price_to - price_from, 2) >= cls.PRICE_STEP
+
+    @classmethod
+    def adjacent(cls, price_to, price_from):
+        """Czy zakres zaczynający się od 'price_from' bezpośrednio następuje po zakresie kończącym się na 'price_to'."""
+        return round(price_from - price_to, 2) <= cls.PRICE_STEP
+
+    def observe_count(self, price_from, price_to, count):
+        """Zapamiętuje liczność zakresu zwróconą przez sprawdzenie (_get_total_count)."""
+        if price_from is None or price_to is None or count is None or price_to <= price_from:
+            return
+        self._observations.append((price_from, price_to, count))
+
+    def _bucket(self, price):
+        return int(math.log(max(price, 1.0)) / self._log_ratio)
+
+    def observe_prices(self, prices):
+        """Zlicza ceny ogłoszeń z pobranych stron w kubełkach (stała pamięć, O(1) na ogłoszenie)."""
+        buckets = self._buckets
+        for price in prices:
+            if price is not None:
+                bucket = self._bucket(float(price))
+                buckets[bucket] = buckets.get(bucket, 0) + 1
+
+    def _sample_cdf(self, price_from, price_to):
+        """
+        Funkcja F(x) - liczba zaobserwowanych cen poniżej x w zakresie kubełków [price_from, price_to]
+        (wewnątrz kubełka ceny rozłożone równomiernie w skali logarytmicznej).
+        """
+        lo_bucket = self._bucket(price_from)
+        hi_bucket = self._bucket(price_to)
+        keys = sorted(bucket for bucket in self._buckets if lo_bucket <= bucket <= hi_bucket)
+        prefix = [0]
+        for bucket in keys:
+            prefix.append(prefix[-1] + self._buckets[bucket])
+
+        def cdf(x):
+            position = math.log(max(x, 1.0)) / self._log_ratio
+            bucket = int(position)
+            i = bisect.bisect_left(keys, bucket)
+            below = prefix[i]
+            if i < len(keys) and keys[i] == bucket:
+                below += self._buckets[bucket] * (position - bucket)
+            return below
+
+        return cdf
+
+    def _prior_mass(self, x0, x1, lo, hi):
+        """Udział przedziału [x0, x1] w masie zakresu [lo, hi] przy gęstości ~1/x."""
+        if lo > 0:
+            return math.log(x1 / x0) / math.log(hi / lo)
+        return (x1 - x0) / (hi - lo)
+
+    def _cell_masses(self, price_from, price_to, count):
+        """Szacuje liczbę ogłoszeń w równych komórkach zakresu [price_from, price_to]."""
+        width = (price_to - price_from) / self.CELLS
+        edges = [price_from + width * i for i in range(self.CELLS + 1)]
+        edges[-1] = price_to
+
+        if self._buckets:
+            cdf = self._sample_cdf(price_from, price_to)
+            if cdf(price_to) - cdf(price_from) >= self.MIN_SAMPLES:
+                # Empiryczny rozkład z pobranych stron (z wygładzeniem dla pustych komórek)
+                return [cdf(x1) - cdf(x0) + 0.5 for x0, x1 in zip(edges, edges[1:])]
+
+        # Mniejsze zaobserwowane zakresy wewnątrz [price_from, price_to]
+        finer = [
+            (lo, hi, c) for lo, hi, c in self._observations
+            if lo >= price_from and hi <= price_to and (hi - lo) < (price_to - price_from)
+        ]
+
+        masses = []
+        for x0, x1 in zip(edges, edges[1:]):
+            mid = (x0 + x1) / 2.0
+            lo, hi, c = price_from, price_to, count
+            for obs_lo, obs_hi, obs_count in finer:
+                if obs_lo <= mid <= obs_hi and (obs_hi - obs_lo) < (hi - lo):
+                    lo, hi, c = obs_lo, obs_hi, obs_count
+            masses.append(c * self._prior_mass(x0, x1, lo, hi))
+        return masses
+
+    def _mass_function(self, price_from, price_to):
+        """Funkcja mass(x0, x1) - względna liczba ogłoszeń w [x0, x1] wewnątrz zakresu [price_from, price_to]."""
+        if self._buckets:
+            cdf = self._sample_cdf(price_from, price_to)
+            if cdf(price_to) - cdf(price_from) >= self.MIN_SAMPLES:
+                return lambda x0, x1: cdf(x1) - cdf(x0)
+        return lambda x0, x1: self._prior_mass(x0, x1, price_from, price_to)
+
+    def estimate(self, price_from, price_to):
+        """
+        Szacuje liczność zakresu na podstawie najmniejszego sprawdzonego zakresu, który go zawiera.
+        Sprawdzone już części tego zakresu (np. wcześniejsze części tego samego podziału) wchodzą
+        do szacunku swoją licznością, a reszta liczności rozkłada się na niesprawdzoną część
+        według rozkładu cen.
+
+        Returns:
+            float: Szacowana liczba ogłoszeń albo None, gdy żaden sprawdzony zakres go nie zawiera.
+        """
+        containing = [(hi - lo, lo, hi, count) for lo, hi, count in self._observations
+                      if lo <= price_from and price_to <= hi]
+        if not containing:
+            return None
+        _width, lo, hi, count = min(containing)
+        if (lo, hi) == (price_from, price_to):
+            return count
+
+        # Rozłączne, mniejsze sprawdzone zakresy wewnątrz (od największych)
+        known = []
+        for obs_lo, obs_hi, obs_count in sorted(self._observations, key=lambda obs: obs[0] - obs[1]):
+            if (lo <= obs_lo and obs_hi <= hi and (obs_lo, obs_hi) != (lo, hi)
+                    and all(obs_hi < k_lo or obs_lo > k_hi for k_lo, k_hi, _k_count in known)):
+                known.append((obs_lo, obs_hi, obs_count))
+
+        mass = self._mass_function(lo, hi)
+
+        def overlap_mass(x0, x1):
+            a, b = max(x0, price_from), min(x1, price_to)
+            return mass(a, b) if b > a else 0.0
+
+        estimate = 0.0
+        rest_count = count
+        rest_mass = mass(lo, hi)
+        rest_target = overlap_mass(lo, hi)
+        for k_lo, k_hi, k_count in known:
+            k_mass = mass(k_lo, k_hi)
+            if k_mass > 0:
+                estimate += k_count * overlap_mass(k_lo, k_hi) / k_mass
+            rest_count -= k_count
+            rest_mass -= k_mass
+            rest_target -= overlap_mass(k_lo, k_hi)
+        if rest_mass > 0 and rest_count > 0:
+            estimate += rest_count * max(rest_target, 0.0) / rest_mass
+        return estimate
+
+    def split(self, price_from, price_to, count):
+        """
+        Wyznacza podział zakresu na części o szacowanej liczności tuż poniżej limitu.
+
+        Returns:
+            list: Lista krotek (price_from, price_to) pokrywających cały zakres bez wspólnych granic
+                (każda następna część zaczyna się 0.01 PLN po końcu poprzedniej).
+        """
+        prices_in_range = int(round((price_to - price_from) / self.PRICE_STEP)) + 1
+        pieces = min(self.max_pieces, max(2, math.ceil(count / self.target)), prices_in_range)
+
+        masses = self._cell_masses(price_from, price_to, count)
+        total_mass = sum(masses) or 1.0
+        width = (price_to - price_from) / self.CELLS
+
+        cuts = []
+        cumulative = 0.0
+        next_cut = 1
+        for i, mass in enumerate(masses):
+            while next_cut < pieces and cumulative + mass >= total_mass * next_cut / pieces:
+                # Interpolacja liniowa wewnątrz komórki
+                needed = total_mass * next_cut / pieces - cumulative
+                fraction = needed / mass if mass > 0 else 0.0
+                cut = round(price_from + width * (i + fraction), 2)
+                if price_from <= cut < price_to and (not cuts or cut >= self.next_price(cuts[-1])):
+                    cuts.append(cut)
+                next_cut += 1
+            cumulative += mass
+
+        if not cuts:
+            cuts = [min(max(round((price_from + price_to) / 2.0, 2), price_from), round(price_to - self.PRICE_STEP, 2))]
+
+        starts = [price_from] + [self.next_price(cut) for cut in cuts]
+        return list(zip(starts, cuts + [price_to]))
+
+    def merge(self, ranges_with_counts, limit=None):
+        """
+        Scala sąsiednie zakresy, dopóki suma ich liczności mieści się w limicie.
+        Zakresy ponad limit pozostają bez zmian (zostaną dalej podzielone).
+
+        Args:
+            ranges_with_counts (list): Lista krotek (price_from, price_to, count), w kolejności cen.
+            limit (int): Limit dla sumy liczności (domyślnie limit OLX).
+
+        Returns:
+            list: Lista krotek (price_from, price_to, count) po scaleniu.
+        """
+        limit = limit if limit is not None else self.limit
+        merged = []
+        for p_from, p_to, count in ranges_with_counts:
+            if count is None:
+                merged.append((p_from, p_to, count))
+                continue
+            if merged:
+                last_from, last_to, last_count = merged[-1]
+                if (last_count is not None and self.adjacent(last_to, p_from)
+                        and last_count + count <= limit):
+                    merged[-1] = (last_from, p_to, last_count + count)
+                    continue
+            merged.append((p_from, p_to, count))
+        return merged
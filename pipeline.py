@@ -0,0 +1,203 @@
+import queue
+import threading
+import time
+
+import metrics
+
+
+class BatchWriter:
+    """
+    Zapisuje ogłoszenia do bazy w tle, równolegle z pobieraniem kolejnych stron.
+
+    Pobierające wątki przekazują sparsowane strony przez put(), a wątek zapisujący
+    zbiera je w paczki i zapisuje przez Database.save_to_database, gdy paczka osiągnie
+    'batch_size' ogłoszeń albo najstarsze oczekujące ogłoszenie czeka dłużej niż 'flush_interval'.
+    Kolejka stron jest ograniczona ('max_pending_pages'), więc przy wolnej bazie put()
+    blokuje pobieranie (backpressure), a pamięć oczekujących ogłoszeń pozostaje stała.
+    """
+
+    _STOP = object()
+
+    def __init__(self, database, batch_size=500, flush_interval=2.0, max_pending_pages=50):
+        """
+        Args:
+            database (Database): Baza, do której trafiają ogłoszenia.
+            batch_size (int): Liczba ogłoszeń, po której paczka jest zapisywana.
+            flush_interval (float): Maksymalny czas (s) oczekiwania ogłoszenia na zapis.
+            max_pending_pages (int): Maksymalna liczba stron czekających w kolejce.
+        """
+        self.db = database
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.saved_count = 0
+        self.queued_count = 0
+
+        self._queue = queue.Queue(maxsize=max(1, max_pending_pages))
+        self._thread = None
+
+    def start(self):
+        """Uruchamia wątek zapisujący."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="BatchWriter", daemon=True)
+            self._thread.start()
+        return self
+
+    def put(self, listings):
+        """Przekazuje stronę ogłoszeń do zapisu (blokuje, gdy kolejka jest pełna)."""
+        if not listings:
+            return
+        self.queued_count += len(listings)
+        self._queue.put(listings)
+        metrics.QUEUE_DEPTH.set(self._queue.qsize(), queue='writer')
+
+    def flush(self):
+        """Blokuje do momentu zapisania wszystkich przekazanych wcześniej ogłoszeń."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        """
+        Zapisuje pozostałe ogłoszenia i zatrzymuje wątek zapisujący.
+
+        Returns:
+            int: Łączna liczba zapisanych ogłoszeń.
+        """
+        if self._thread is not None:
+            self._queue.put(self._STOP)
+            self._thread.join()
+            self._thread = None
+        return self.saved_count
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _flush(self, pending):
+        if not pending:
+            return
+        try:
+            saved = self.db.save_to_database(pending)
+        except Exception as e:
+            # Wątek musi działać dalej - inaczej put() zablokowałby pobieranie na zawsze
+            print(f"   ✗ Błąd zapisu paczki w tle: {e}")
+            self.db.run_save_failures += 1
+            return
+        self.saved_count += saved
+        print(f"   💾 Zapisano paczkę {len(pending)} ogłoszeń w tle (Zapisano/Zakt: {saved})")
+
+    def _run(self):
+        pending = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            metrics.QUEUE_DEPTH.set(self._queue.qsize(), queue='writer')
+
+            if item is self._STOP:
+                self._flush(pending)
+                return
+
+            if isinstance(item, threading.Event):
+                # flush(): zapis wszystkiego, co przyszło przed znacznikiem
+                self._flush(pending)
+                pending = []
+                deadline = None
+                item.set()
+                continue
+
+            if item:
+                if not pending:
+                    deadline = time.monotonic() + self.flush_interval
+                pending.extend(item)
+
+            if pending and (len(pending) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(pending)
+                pending = []
+                deadline = None
+
+
+class ListingCollector:
+    """
+    Deduplikuje ogłoszenia z całego crawla po olx_id.
+
+    Z 'keep_listings=True' przechowuje pełne ogłoszenia (do zwrócenia jako lista).
+    Z 'keep_listings=False' pamięta tylko identyfikatory (liczbowe olx_id jako int) i kilka
+    pierwszych ogłoszeń jako próbkę, więc zużycie pamięci nie rośnie z rozmiarem opisów i zdjęć.
+    Zbiór identyfikatorów jest dokładny (bez filtrów probabilistycznych) - fałszywe trafienie
+    oznaczałoby pominięcie ogłoszenia, a potem jego błędną deaktywację.
+    """
+
+    SAMPLE_SIZE = 3
+
+    def __init__(self, keep_listings=True):
+        self.keep_listings = keep_listings
+        self.sample = []
+        # Czy add_new z limitem pominął jakieś ogłoszenie (cel osiągnięty przed końcem partii)
+        self.truncated = False
+        self._listings = {}
+        self._seen_ids = set()
+
+    @staticmethod
+    def _compact_id(olx_id):
+        text = str(olx_id)
+        if text.isdigit() and (text == '0' or not text.startswith('0')):
+            return int(text)
+        return text
+
+    def add(self, listing):
+        """
+        Rejestruje ogłoszenie.
+
+        Returns:
+            bool: True, jeśli ogłoszenie jest nowe (nie było wcześniej widziane).
+        """
+        if self.keep_listings:
+            if listing.olx_id in self._listings:
+                return False
+            self._listings[listing.olx_id] = listing
+        else:
+            key = self._compact_id(listing.olx_id)
+            if key in self._seen_ids:
+                return False
+            self._seen_ids.add(key)
+
+        if len(self.sample) < self.SAMPLE_SIZE:
+            self.sample.append(listing)
+        return True
+
+    def add_new(self, listings, limit=None):
+        """
+        Rejestruje ogłoszenia i zwraca listę tylko tych, które są nowe.
+
+        Args:
+            limit (int): Maksymalny rozmiar zbioru - po jego osiągnięciu pozostałe ogłoszenia partii
+                są pomijane (i ustawiany jest 'truncated').
+        """
+        if limit is None:
+            return [listing for listing in listings if self.add(listing)]
+
+        new_listings = []
+        for listing in listings:
+            if len(self) >= limit:
+                self.truncated = True
+                break
+            if self.add(listing):
+                new_listings.append(listing)
+        return new_listings
+
+    def listings(self):
+        """Zwraca zebrane ogłoszenia (albo tylko próbkę, jeśli pełne ogłoszenia nie są przechowywane)."""
+        if self.keep_listings:
+            return list(self._listings.values())
+        return list(self.sample)
+
+    def __len__(self):
+        return len(self._listings) if self.keep_listings else len(self._seen_ids)
@@ -0,0 +1,77 @@
+import json
+import os
+import time
+
+
+class PartitionPlanCache:
+    """
+    Lokalny cache planów podziału cenowego (liście zakresów wraz z licznościami).
+
+    Plan z poprzedniego uruchomienia pozwala zacząć scrape_recursive od razu od liści,
+    zamiast ponownie odkrywać drzewo podziału dziesiątkami sprawdzeń liczności.
+    Wpisy są kluczowane zapytaniem, kategorią, stanem i zakresem cen, i wygasają po 'ttl_seconds'.
+    """
+
+    def __init__(self, path, ttl_seconds):
+        """
+        Args:
+            path (str): Ścieżka do pliku JSON z planami.
+            ttl_seconds (float): Czas ważności planu w sekundach.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def make_key(query, category_id, state, price_from, price_to):
+        """Buduje klucz planu z parametrów wyszukiwania."""
+        def fmt(price):
+            return f"{price:.2f}" if price is not None else "*"
+
+        return f"{query}|{category_id}|{state}|{fmt(price_from)}|{fmt(price_to)}"
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"   [CACHE] ⚠️  Nie można odczytać planów podziału ({self.path}): {e}")
+            return {}
+
+    def _is_fresh(self, entry, now):
+        return now - entry.get('created_at', 0) <= self.ttl_seconds
+
+    def load(self, key):
+        """
+        Zwraca zapisane liście planu lub None, jeśli brak ważnego wpisu.
+
+        Returns:
+            list: Lista krotek (price_from, price_to, count) posortowana po cenie.
+        """
+        entry = self._read().get(key)
+        if not entry or not self._is_fresh(entry, time.time()):
+            return None
+        return sorted((tuple(leaf) for leaf in entry.get('leaves', [])), key=lambda leaf: leaf[0])
+
+    def store(self, key, leaves):
+        """Zapisuje liście planu (nadpisuje poprzedni wpis i usuwa przeterminowane)."""
+        now = time.time()
+        plans = {k: v for k, v in self._read().items() if self._is_fresh(v, now)}
+        plans[key] = {
+            'created_at': now,
+            'leaves': sorted(([lo, hi, count] for lo, hi, count in leaves), key=lambda leaf: leaf[0])
+        }
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(plans, f)
+            os.replace(tmp_path, self.path)
+            print(f"   [CACHE] ✓ Zapisano plan podziału ({len(leaves)} zakresów).")
+        except OSError as e:
+            print(f"   [CACHE] ✗ Nie można zapisać planu podziału ({self.path}): {e}")
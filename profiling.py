@@ -0,0 +1,180 @@
+"""
+Profilowanie etapów crawla (tryb opcjonalny, config.PROFILE).
+
+install() podmienia gorące funkcje (zapytanie do API, dekodowanie JSON, parse_listing,
+parse_timestamp, zapis execute_values/COPY i commit) na wersje mierzące czas - bez install()
+kod działa bez żadnego narzutu. Na koniec przebiegu StageProfiler.report() wypisuje czas łączny
+i własny (bez zagnieżdżonych etapów) każdego etapu, zapisuje go do JSON, zapisuje stosy etapów
+w formacie "folded" (flamegraph.pl, speedscope) i opcjonalnie zrzut cProfile ze wszystkich wątków
+(pstats: snakeviz, flameprof, gprof2dot).
+
+Etapy wykonywane w procesach ParsePool (PARSE_POOL_WORKERS > 0) nie są mierzone - do profilowania
+parsowania należy wyłączyć pulę procesów.
+"""
+import cProfile
+import functools
+import importlib
+import json
+import os
+import pstats
+import threading
+import time
+
+# (moduł, klasa lub None dla funkcji modułu, atrybut, nazwa etapu)
+DEFAULT_HOOKS = (
+    ('scraper', 'OLXGraphQLScraper', 'search', 'search'),
+    ('listing_parser', None, 'loads', 'json_decode'),
+    ('listing_parser', None, 'parse_listing', 'parse_listing'),
+    ('listing_parser', None, 'parse_timestamp', 'parse_timestamp'),
+    ('database', 'Database', 'save_to_database', 'db_save'),
+    ('database', None, 'execute_values', 'db_execute_values'),
+    ('database', 'Database', '_copy_batch', 'db_copy_merge'),
+    ('database', 'Database', '_commit', 'db_commit'),
+)
+
+
+class StageProfiler:
+    """
+    Zbiera czasy etapów (wywołania, czas łączny i własny) oraz stosy zagnieżdżonych etapów.
+    Stos etapów jest prowadzony osobno dla każdego wątku, więc przy pobieraniu współbieżnym
+    suma czasów etapów może przekraczać czas przebiegu.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.stacks = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._patched = []
+        self._profiles = []
+        self._started_at = time.perf_counter()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, path, stage, elapsed, own):
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] += own
+            self.stacks[path] = self.stacks.get(path, 0.0) + own
+
+    def wrap(self, func, stage):
+        """Zwraca funkcję 'func' mierzącą czas jako etap 'stage'."""
+        profiler = self
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            stack = profiler._stack()
+            frame = [stage, 0.0]
+            stack.append(frame)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                path = ';'.join(name for name, _children in stack)
+                stack.pop()
+                if stack:
+                    stack[-1][1] += elapsed
+                profiler._record(path, stage, elapsed, elapsed - frame[1])
+
+        return wrapper
+
+    def hook(self, module_name, class_name, attribute, stage):
+        """Podmienia funkcję modułu (class_name=None) lub metodę klasy na wersję mierzącą czas."""
+        owner = importlib.import_module(module_name)
+        if class_name:
+            owner = getattr(owner, class_name)
+        original = owner.__dict__[attribute]
+        setattr(owner, attribute, self.wrap(original, stage))
+        self._patched.append((owner, attribute, original))
+
+    def install(self, hooks=DEFAULT_HOOKS, cprofile=False):
+        """Instaluje haki etapów i (opcjonalnie) cProfile dla bieżącego i nowych wątków."""
+        for hook in hooks:
+            self.hook(*hook)
+        if cprofile:
+            threading.setprofile(self._start_thread_profile)
+            self._start_thread_profile()
+        self._started_at = time.perf_counter()
+        print(f"⏱️  Profilowanie etapów włączone ({len(hooks)} haków{', cProfile' if cprofile else ''}).")
+        return self
+
+    def _start_thread_profile(self, *_args):
+        # Wywoływane jako pierwsze zdarzenie profilowania nowego wątku (threading.setprofile);
+        # profile.enable() zastępuje ten hak profilerem cProfile dla tego wątku
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    def uninstall(self):
+        """Przywraca oryginalne funkcje i zatrzymuje cProfile."""
+        threading.setprofile(None)
+        for profile in self._profiles:
+            profile.disable()
+        for owner, attribute, original in reversed(self._patched):
+            setattr(owner, attribute, original)
+        self._patched.clear()
+
+    def summary(self):
+        """Etapy posortowane malejąco po czasie własnym."""
+        wall = time.perf_counter() - self._started_at
+        with self._lock:
+            items = sorted(self.stages.items(), key=lambda item: item[1][2], reverse=True)
+        return {
+            'wall_seconds': wall,
+            'stages': [
+                {'stage': stage, 'calls': calls, 'total_seconds': total, 'self_seconds': own,
+                 'avg_ms': total / calls * 1000 if calls else 0.0}
+                for stage, (calls, total, own) in items
+            ]
+        }
+
+    def print_report(self, summary=None):
+        summary = summary or self.summary()
+        wall = max(summary['wall_seconds'], 1e-9)
+        print(f"\n⏱️  Profil etapów (czas przebiegu {wall:.1f} s):")
+        print(f"   {'Etap':<20}{'Wywołania':>11}{'Łącznie [s]':>13}{'Własny [s]':>12}{'Śr. [ms]':>10}{'% czasu':>9}")
+        for row in summary['stages']:
+            print(f"   {row['stage']:<20}{row['calls']:>11}{row['total_seconds']:>13.3f}{row['self_seconds']:>12.3f}"
+                  f"{row['avg_ms']:>10.3f}{row['self_seconds'] / wall * 100:>8.1f}%")
+
+    def report(self, directory, name='run'):
+        """
+        Kończy profilowanie, wypisuje tabelę etapów i zapisuje wyniki do katalogu 'directory':
+        '<name>-stages.json', '<name>-stages.folded' oraz '<name>.prof' (gdy cProfile był włączony).
+        """
+        self.uninstall()
+        summary = self.summary()
+        self.print_report(summary)
+
+        try:
+            os.makedirs(directory, exist_ok=True)
+            base = os.path.join(directory, name)
+            with open(f"{base}-stages.json", 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2)
+            with open(f"{base}-stages.folded", 'w', encoding='utf-8') as f:
+                for path, own in sorted(self.stacks.items()):
+                    f.write(f"{path} {int(own * 1e6)}\n")
+            written = [f"{base}-stages.json", f"{base}-stages.folded"]
+
+            if self._profiles:
+                stats = pstats.Stats(self._profiles[0])
+                for profile in self._profiles[1:]:
+                    stats.add(profile)
+                stats.dump_stats(f"{base}.prof")
+                written.append(f"{base}.prof")
+            print(f"⏱️  Zapisano profil: {', '.join(written)}")
+        except OSError as e:
+            print(f"✗ Nie można zapisać profilu ({directory}): {e}")
+
+
+def install(cprofile=False, hooks=DEFAULT_HOOKS):
+    """Tworzy StageProfiler i instaluje jego haki (skrót dla punktów uruchomienia)."""
+    return StageProfiler().install(hooks, cprofile=cprofile)
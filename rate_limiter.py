@@ -0,0 +1,112 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class RateLimiter:
+    """
+    Adaptacyjny limiter typu token bucket, współdzielony przez wszystkie zapytania scrapera.
+
+    - acquire() blokuje do momentu, gdy dostępny jest token (budżet: 'rate' zapytań/s, zapas: 'burst').
+    - on_throttle() (429/5xx/błąd połączenia) połowi tempo i wstrzymuje zapytania na czas
+      backoffu z jitterem lub na czas wskazany w nagłówku Retry-After.
+    - on_success() stopniowo przywraca tempo aż do skonfigurowanego maksimum.
+
+    Klasa jest bezpieczna wątkowo (używana także przez AsyncCrawlEngine z wątków roboczych).
+    """
+
+    def __init__(self, rate, burst, min_rate=0.2, backoff_base=1.0, backoff_max=60.0, recovery_step=None):
+        """
+        Args:
+            rate (float): Maksymalna liczba zapytań na sekundę.
+            burst (int): Maksymalna liczba zapytań, które można wysłać od razu.
+            min_rate (float): Dolna granica tempa po kolejnych spowolnieniach.
+            backoff_base (float): Bazowe opóźnienie (s) wykładniczego backoffu.
+            backoff_max (float): Maksymalne opóźnienie (s) pojedynczego backoffu.
+            recovery_step (float): O ile zwiększać tempo po każdej poprawnej odpowiedzi
+                (domyślnie 5% maksymalnego tempa).
+        """
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.recovery_step = recovery_step if recovery_step is not None else self.max_rate * 0.05
+
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Czeka, aż można wysłać kolejne zapytanie, i zużywa jeden token."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        """Rejestruje poprawną odpowiedź i przyspiesza w stronę maksymalnego tempa."""
+        with self._lock:
+            self._failures = 0
+            self.rate = min(self.max_rate, self.rate + self.recovery_step)
+
+    def on_throttle(self, retry_after=None):
+        """
+        Rejestruje odpowiedź 429/5xx lub błąd połączenia.
+
+        Args:
+            retry_after (float): Czas (s) z nagłówka Retry-After, jeśli serwer go podał.
+
+        Returns:
+            float: Czas wstrzymania zapytań w sekundach.
+        """
+        with self._lock:
+            self._failures += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+
+            if retry_after is not None:
+                delay = retry_after + random.uniform(0, self.backoff_base)
+            else:
+                backoff = min(self.backoff_max, self.backoff_base * 2 ** (self._failures - 1))
+                delay = random.uniform(backoff / 2, backoff)
+
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + delay)
+            self._tokens = 0.0
+            self._updated = now
+            return delay
+
+    @staticmethod
+    def parse_retry_after(value):
+        """Zamienia wartość nagłówka Retry-After (sekundy lub data HTTP) na liczbę sekund."""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
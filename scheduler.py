@@ -0,0 +1,106 @@
+import threading
+import time
+
+import metrics
+
+
+class Tier:
+    """Poziom harmonogramu: zadanie uruchamiane co 'interval_seconds'."""
+
+    def __init__(self, name, interval_seconds, job, priority=0, first_run_in=0.0, covers=()):
+        """
+        Args:
+            name (str): Nazwa poziomu (w logach i metrykach).
+            interval_seconds (float): Odstęp między kolejnymi uruchomieniami (liczony od startu przebiegu).
+            job (callable): Zadanie bez argumentów.
+            priority (int): Przy kilku zaległych poziomach najpierw uruchamiany jest ten o wyższym priorytecie.
+            first_run_in (float): Za ile sekund uruchomić poziom pierwszy raz.
+            covers (tuple): Nazwy poziomów, których udany przebieg tego poziomu zastępuje
+                (ich następne uruchomienie jest przesuwane o pełny odstęp).
+        """
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.job = job
+        self.priority = priority
+        self.covers = tuple(covers)
+        self.next_run = time.monotonic() + max(first_run_in, 0.0)
+        self.runs = 0
+        self.failures = 0
+
+
+class Scheduler:
+    """
+    Prosty harmonogram jednego wątku dla poziomów odświeżania (Tier) o różnej częstotliwości.
+
+    Przebiegi nigdy nie nakładają się - zaległe poziomy są uruchamiane po kolei, od najwyższego
+    priorytetu. Przebieg zakończony wyjątkiem jest ponawiany po 'retry_seconds' (nie później
+    niż po pełnym odstępie poziomu); błąd nie zatrzymuje pozostałych poziomów.
+    """
+
+    def __init__(self, tiers, retry_seconds=600.0):
+        """
+        Args:
+            tiers (list): Poziomy harmonogramu (Tier).
+            retry_seconds (float): Odstęp ponowienia po nieudanym przebiegu.
+        """
+        self.tiers = {tier.name: tier for tier in tiers}
+        self.retry_seconds = retry_seconds
+        self.running = None
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Kończy pętlę po bieżącym przebiegu (bezpieczne z obsługi sygnału)."""
+        self._stop.set()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def next_tier(self):
+        """Poziom do uruchomienia jako następny (najwcześniej zaległy, przy remisie - wyższy priorytet)."""
+        now = time.monotonic()
+        return min(self.tiers.values(), key=lambda tier: (max(tier.next_run, now), -tier.priority))
+
+    def run_tier(self, tier):
+        """Uruchamia jeden przebieg poziomu i planuje następny."""
+        started = time.monotonic()
+        self.running = tier.name
+        print(f"\n[{time.strftime('%Y-%m-%d %H:%M:%S')}] ⏰ Harmonogram: uruchamiam poziom '{tier.name}'...")
+        try:
+            tier.job()
+        except Exception as e:
+            tier.failures += 1
+            tier.next_run = started + min(self.retry_seconds, tier.interval_seconds)
+            metrics.SCHEDULER_PASSES.inc(tier=tier.name, result='error')
+            print(f"✗ Poziom '{tier.name}' zakończył się błędem: {e}. "
+                  f"Ponowienie za {tier.next_run - time.monotonic():.0f} s.")
+            return False
+        finally:
+            self.running = None
+            metrics.SCHEDULER_PASS_SECONDS.observe(time.monotonic() - started, tier=tier.name)
+
+        tier.runs += 1
+        tier.next_run = started + tier.interval_seconds
+        for name in tier.covers:
+            covered = self.tiers.get(name)
+            if covered is not None:
+                covered.next_run = max(covered.next_run, time.monotonic() + covered.interval_seconds)
+        metrics.SCHEDULER_PASSES.inc(tier=tier.name, result='ok')
+        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] ✓ Poziom '{tier.name}' zakończony "
+              f"w {time.monotonic() - started:.1f} s.")
+        return True
+
+    def run_forever(self):
+        """Pętla główna: czeka na najbliższy zaległy poziom i go uruchamia, aż do stop()."""
+        for tier in sorted(self.tiers.values(), key=lambda tier: tier.next_run):
+            print(f"   [HARMONOGRAM] Poziom '{tier.name}': co {tier.interval_seconds / 60:.0f} min, "
+                  f"pierwszy przebieg za {max(tier.next_run - time.monotonic(), 0) / 60:.0f} min.")
+
+        while not self._stop.is_set():
+            tier = self.next_tier()
+            delay = tier.next_run - time.monotonic()
+            if delay > 0:
+                # Czekanie przerywane przez stop()
+                self._stop.wait(delay)
+                continue
+            self.run_tier(tier)
@@ -1,25 +1,165 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+import threading
 import time
-import json
-from datetime import datetime
+from datetime import datetime, timezone
 from collections import deque
 
 # Importujemy stałe i konfigurację z pliku config.py
 import config
+import metrics
+from async_engine import AsyncCrawlEngine
+from rate_limiter import RateLimiter
+from partitioner import PricePartitioner
+from plan_cache import PartitionPlanCache
+from pipeline import BatchWriter, ListingCollector
+from parse_pool import ParsePool
+from transport import create_transport
+import listing_parser
 
 
 class OLXGraphQLScraper:
     OLX_LIMIT = 999
-
-    def __init__(self, database):
+    # Dodatkowe wymiary wyszukiwania dla zakresów, których nie da się podzielić po cenie
+    UNSPLITTABLE_DIMENSIONS = ('state', 'region')
+    # Zakres z szacowaną licznością ponad tyle limitów OLX jest sprawdzany zapytaniem o liczność zamiast
+    # pierwszą stroną (zob. _probe_task) - przy mniejszym szacunku część zakresów mieści się jednak w limicie,
+    # a wtedy pierwsza strona oszczędza zapytanie
+    COUNT_PROBE_FACTOR = 2
+    # Faza crawla (etykieta metryk) dla wariantu zapytania
+    METRIC_PHASES = {'full': 'page', 'count': 'count_probe', 'price': 'bound_price', 'region': 'region_probe'}
+
+    def __init__(self, database, pool_size=None, connect_timeout=None, read_timeout=None, rate_limiter=None,
+                 max_retries=None, plan_cache=None, parse_pool=None, transport=None, checkpoint=None):
+        """
+        Args:
+            database (Database): Obiekt bazy danych używany do zapisu ogłoszeń.
+            pool_size (int): Maksymalna liczba utrzymywanych połączeń keep-alive (domyślnie z config).
+            connect_timeout (float): Timeout nawiązania połączenia w sekundach (domyślnie z config).
+            read_timeout (float): Timeout odczytu odpowiedzi w sekundach (domyślnie z config).
+            rate_limiter (RateLimiter): Współdzielony limiter zapytań (domyślnie tworzony z config).
+            max_retries (int): Liczba ponowień po 429/5xx/błędzie połączenia (domyślnie z config).
+            plan_cache (PartitionPlanCache): Cache planów podziału cenowego między uruchomieniami (opcjonalny).
+            parse_pool (ParsePool): Pula procesów parsujących strony (domyślnie z config; None przy
+                config.PARSE_POOL_WORKERS = 0 - parsowanie w bieżącym procesie).
+            transport: Obiekt z metodą post(url, json, timeout), przez który wysyłane są zapytania
+                (domyślnie według config.HTTP_TRANSPORT - sesja HTTP, nagrywanie, odtwarzanie lub serwer testowy).
+            checkpoint (CrawlCheckpoint): Punkt kontrolny scrape_recursive do wznowienia po awarii (opcjonalny).
+        """
         self.api_url = config.API_URL
         self.headers = config.HEADERS
         self.graphql_query = config.GRAPHQL_QUERY
+        # Warianty zapytania (projekcje) dla poszczególnych faz - zob. search(projection=...)
+        self.graphql_queries = {
+            'full': config.GRAPHQL_QUERY,
+            'count': config.GRAPHQL_COUNT_QUERY,
+            'price': config.GRAPHQL_PRICE_QUERY,
+            'region': config.GRAPHQL_REGION_QUERY
+        }
         self.db = database
 
+        self.pool_size = pool_size if pool_size is not None else config.HTTP_POOL_SIZE
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else config.HTTP_CONNECT_TIMEOUT,
+            read_timeout if read_timeout is not None else config.HTTP_READ_TIMEOUT
+        )
+        self.session = self._create_session()
+        self.transport = transport or create_transport(
+            self.session,
+            mode=config.HTTP_TRANSPORT,
+            directory=config.HTTP_RECORD_DIR,
+            mock_options={'total': config.MOCK_SERVER_TOTAL, 'latency': config.MOCK_SERVER_LATENCY}
+        )
+
+        self.rate_limiter = rate_limiter or RateLimiter(
+            rate=config.RATE_LIMIT_RPS,
+            burst=config.RATE_LIMIT_BURST,
+            min_rate=config.RATE_LIMIT_MIN_RPS,
+            backoff_base=config.RATE_LIMIT_BACKOFF_BASE,
+            backoff_max=config.RATE_LIMIT_BACKOFF_MAX
+        )
+        self.max_retries = max_retries if max_retries is not None else config.HTTP_MAX_RETRIES
+        self.plan_cache = plan_cache
+        self.checkpoint = checkpoint
+        if parse_pool is None and config.PARSE_POOL_WORKERS > 0:
+            parse_pool = ParsePool(config.PARSE_POOL_WORKERS, min_bytes=config.PARSE_POOL_MIN_BYTES)
+        self.parse_pool = parse_pool
+
+        # Liczba zapytań zakończonych błędem (po wyczerpaniu ponowień) oraz informacja,
+        # czy ostatni scrape_recursive przeszedł cały zakres bez błędów
+        self.failed_requests = 0
+        self._failures_lock = threading.Lock()
+        self.last_crawl_complete = False
+        # Stan licznika błędów na początku crawla i błędy sprzed wznowienia z punktu kontrolnego
+        self._failures_before = 0
+        self._resumed_failures = 0
+        # Zakresy bieżącego crawla, których nie dało się pobrać w całości (zob. _scrape_unsplittable)
+        self.coverage_shortfalls = 0
+
+    def _create_session(self):
+        """
+        Tworzy sesję HTTP z pulą połączeń keep-alive do API OLX.
+        Kompresja (gzip/deflate/br) jest negocjowana tylko w zakresie dekoderów dostępnych lokalnie.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            pool_block=True
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update(self.headers)
+        session.headers.update(make_headers(accept_encoding=True, keep_alive=True))
+        return session
+
+    def close(self):
+        """Zamyka transport, sesję HTTP i wszystkie połączenia z puli oraz procesy parsujące."""
+        if self.transport is not self.session:
+            self.transport.close()
+        self.session.close()
+        if self.parse_pool is not None:
+            self.parse_pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _count_failure(self):
+        """Zlicza nieudane zapytanie (wywoływane także z wątków AsyncCrawlEngine)."""
+        with self._failures_lock:
+            self.failed_requests += 1
+
+    @staticmethod
+    def _wire_bytes(response):
+        """
+        Liczba bajtów odpowiedzi odebranych z sieci (przed dekompresją gzip): licznik urllib3,
+        a bez niego (nagrania, serwer testowy) - nagłówek Content-Length albo długość treści.
+        Dla odpowiedzi chunked urllib3 nie liczy bajtów - wtedy jest to długość po dekompresji.
+        """
+        # Treść jest czytana przed pomiarem, aby licznik urllib3 objął całą odpowiedź
+        content = response.content
+        received = getattr(response.raw, 'tell', lambda: None)()
+        if isinstance(received, int) and received > 0:
+            return received
+        content_length = response.headers.get('Content-Length', '')
+        if content_length.isdigit():
+            return int(content_length)
+        return len(content)
+
     def search(self, query, offset=0, limit=40, sort_by="created_at:desc", price_from=None, price_to=None,
-               category_id=None, state=None):
-        """Wysyła zapytanie GraphQL do API OLX."""
+               category_id=None, state=None, region_id=None, raw=False, projection='full'):
+        """
+        Wysyła zapytanie GraphQL do API OLX.
+
+        Args:
+            raw (bool): True - zwraca surową treść odpowiedzi (bytes) bez dekodowania JSON.
+            projection (str): Wariant zapytania z self.graphql_queries: 'full' (pełne ogłoszenia),
+                'count' (tylko metadata), 'price' (cena i promowanie) lub 'region' (region ogłoszenia).
+        """
         search_params = [
             {"key": "offset", "value": str(offset)},
             {"key": "limit", "value": str(limit)},
@@ -37,28 +177,65 @@ class OLXGraphQLScraper:
 
         if state is not None and state in ["new", "used"]:
             search_params.append({"key": "filter_enum_state[0]", "value": str(state)})
+        if region_id is not None:
+            search_params.append({"key": "region_id", "value": str(region_id)})
 
         payload = {
-            "query": self.graphql_query,
+            "query": self.graphql_queries[projection],
             "variables": {"searchParameters": search_params}
         }
 
-        try:
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                headers=self.headers,
-                timeout=20
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.HTTPError as e:
-            print(f"✗ Błąd HTTP: {e.response.status_code} {e.response.reason}")
-        except requests.exceptions.RequestException as e:
-            print(f"✗ Błąd połączenia z API: {e}")
+        phase = self.METRIC_PHASES.get(projection, projection)
+        attempts = self.max_retries + 1
+        for attempt in range(1, attempts + 1):
+            self.rate_limiter.acquire()
+
+            start = time.perf_counter()
+            try:
+                response = self.transport.post(
+                    self.api_url,
+                    json=payload,
+                    timeout=self.timeout
+                )
+            except requests.exceptions.RequestException as e:
+                metrics.REQUEST_RETRIES.inc(reason='connection')
+                delay = self.rate_limiter.on_throttle()
+                print(f"✗ Błąd połączenia z API: {e} (próba {attempt}/{attempts}, wstrzymanie {delay:.1f}s)")
+                continue
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, phase=phase)
+            metrics.RESPONSE_BYTES.inc(self._wire_bytes(response), phase=phase)
+
+            if response.status_code == 429 or response.status_code >= 500:
+                metrics.REQUEST_RETRIES.inc(reason=response.status_code)
+                retry_after = RateLimiter.parse_retry_after(response.headers.get('Retry-After'))
+                delay = self.rate_limiter.on_throttle(retry_after)
+                print(f"✗ Błąd HTTP: {response.status_code} {response.reason} "
+                      f"(próba {attempt}/{attempts}, wstrzymanie {delay:.1f}s)")
+                continue
+
+            try:
+                response.raise_for_status()
+                data = response.content if raw else listing_parser.loads(response.content)
+            except requests.exceptions.HTTPError as e:
+                print(f"✗ Błąd HTTP: {e.response.status_code} {e.response.reason}")
+                metrics.REQUEST_ERRORS.inc(code=e.response.status_code)
+                self._count_failure()
+                return None
+            except ValueError as e:
+                print(f"✗ Niepoprawna odpowiedź JSON z API: {e}")
+                metrics.REQUEST_ERRORS.inc(code='json')
+                self._count_failure()
+                return None
+
+            self.rate_limiter.on_success()
+            return data
+
+        print(f"✗ Nie udało się pobrać danych po {attempts} próbach.")
+        metrics.REQUEST_ERRORS.inc(code='exhausted')
+        self._count_failure()
         return None
 
-    def _get_total_count(self, query, category_id, price_from, price_to, state=None):
+    def _get_total_count(self, query, category_id, price_from, price_to, state=None, region_id=None):
         """Pobiera łączną liczbę wyników dla danego zapytania (limit=1)."""
         if price_from is not None and price_to is not None:
             print(f"   [SPRAWDZAM] Zakres cen: {price_from:.2f} - {price_to:.2f}...")
@@ -73,7 +250,9 @@ class OLXGraphQLScraper:
             price_from=price_from,
             price_to=price_to,
             category_id=category_id,
-            state=state
+            state=state,
+            region_id=region_id,
+            projection='count'
         )
 
         if not response:
@@ -84,6 +263,8 @@ class OLXGraphQLScraper:
         if listings_data.get('__typename') == 'ListingError':
             error = listings_data.get('error', {})
             print(f"   ✗ Błąd API przy sprawdzaniu: {error.get('detail')}")
+            metrics.REQUEST_ERRORS.inc(code='api')
+            self._count_failure()
             return None
 
         if listings_data.get('__typename') == 'ListingSuccess':
@@ -110,7 +291,8 @@ class OLXGraphQLScraper:
             limit=40,
             sort_by=sort_by,
             category_id=category_id,
-            state=state
+            state=state,
+            projection='price'
         )
 
         if not response:
@@ -125,9 +307,10 @@ class OLXGraphQLScraper:
             first_price_any = None
 
             for listing in batch:
-                parsed = self.parse_listing(listing)
-                price = parsed.get('price_value')
-                is_promoted = parsed.get('promoted', False)
+                # Odpowiedź zawiera tylko cenę i promowanie - bez pełnego parse_listing
+                price_info = self.extract_price(listing.get('params') or ())
+                price = price_info['value'] if price_info else None
+                is_promoted = (listing.get('promotion') or {}).get('top_ad', False)
 
                 if price is not None:
                     price_float = float(price)
@@ -153,122 +336,143 @@ class OLXGraphQLScraper:
         print(f"   ✗ Nie udało się pobrać ceny granicznej dla {sort_by} (błąd API lub brak 'ListingSuccess')")
         return None
 
-    # ... (funkcje extract_price, parse_timestamp, parse_listing pozostają bez zmian) ...
-
     def extract_price(self, params):
         """Wyciąga dane o cenie z listy parametrów."""
-        for param in params:
-            if param.get('key') == 'price':
-                value = param.get('value', {})
-                if value.get('__typename') == 'PriceParam':
-                    return {
-                        'value': value.get('value'),
-                        'currency': value.get('currency'),
-                        'label': value.get('label'),
-                        'negotiable': value.get('negotiable', False)
-                    }
-        return None
+        return listing_parser.extract_price(params)
 
     def parse_timestamp(self, timestamp_str):
         """Konwertuje timestamp ISO z OLX na obiekt datetime."""
-        if not timestamp_str:
-            return None
-        try:
-            return datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-        except ValueError:
-            print(f"Nie udało się sparsować daty: {timestamp_str}")
-            return None
+        return listing_parser.parse_timestamp(timestamp_str)
 
     def parse_listing(self, listing):
-        """Przetwarza surowy słownik JSON ogłoszenia na format do bazy danych."""
-        location = listing.get('location') or {}
-        map_data = listing.get('map') or {}
-        user = listing.get('user') or {}
-        contact = listing.get('contact') or {}
-        promotion = listing.get('promotion') or {}
-        price_info = self.extract_price(listing.get('params', []))
-
-        # Zbieranie parametrów do JSONB
-        params_list = []
-        for param in listing.get('params', []):
-            param_value = param.get('value') or {}
-            if param_value.get('__typename') == 'GenericParam':
-                params_list.append({
-                    'name': param.get('name'),
-                    'key': param.get('key'),
-                    'value': param_value.get('label')
-                })
-
-        photos = listing.get('photos', [])
-        photo_urls = [photo.get('link', '').replace('{width}', '1200').replace('{height}', '900') for photo in photos]
-
-        city = location.get('city') or {}
-        region = location.get('region') or {}
-        district = location.get('district') or {}
-        category = listing.get('category') or {}
+        """Przetwarza surowy słownik JSON ogłoszenia na rekord Listing (format do bazy danych)."""
+        return listing_parser.parse_listing(listing)
 
-        return {
-            'olx_id': listing.get('id'),
-            'title': listing.get('title'),
-            'url': listing.get('url'),
-            'description': listing.get('description', ''),
-            'created_time': self.parse_timestamp(listing.get('created_time')),
-            'refreshed_time': self.parse_timestamp(listing.get('last_refresh_time')),
-            'valid_to_time': self.parse_timestamp(listing.get('valid_to_time')),
-            'offer_type': listing.get('offer_type'),
-            'business': listing.get('business', False),
-            'price_value': price_info.get('value') if price_info else None,
-            'price_label': price_info.get('label') if price_info else 'Brak ceny',
-            'currency': price_info.get('currency') if price_info else None,
-            'negotiable': price_info.get('negotiable') if price_info else False,
-            'location_city': city.get('name'),
-            'location_region': region.get('name'),
-            'location_district': district.get('name') if district else None,
-            'latitude': map_data.get('lat'),
-            'longitude': map_data.get('lon'),
-            'map_radius': map_data.get('radius'),
-            'map_zoom': map_data.get('zoom'),
-            'user_id': user.get('uuid'),
-            'user_name': user.get('name'),
-            'user_type': user.get('seller_type'),
-            'user_created': self.parse_timestamp(user.get('created')),
-            'user_last_seen': self.parse_timestamp(user.get('last_seen')),
-            'user_is_online': user.get('is_online', False),
-            'category_id': category.get('id'),
-            'promoted': promotion.get('top_ad', False),  # <-- To jest flaga ogłoszenia 'TOP'
-            'highlighted': promotion.get('highlighted', False),
-            'urgent': promotion.get('urgent', False),
-            'premium_ad': promotion.get('premium_ad_page', False),
-            'promotion_options': promotion.get('options', []),
-            'photos_count': len(photos),
-            'photos_urls': photo_urls,
-            'phone_protected': listing.get('protect_phone', False),
-            'chat_available': contact.get('chat', False),
-            'courier_available': contact.get('courier', False),
-            'params': json.dumps(params_list, ensure_ascii=False) if params_list else None,
-            'scraped_at': datetime.now()
-        }
+    def _fetch_page(self, query, offset, limit, sort_by="created_at:desc", price_from=None, price_to=None,
+                    category_id=None, state=None, region_id=None, projection='full'):
+        """
+        Pobiera jedną stronę wyników (surowe ogłoszenia w podanej projekcji zapytania).
+
+        Returns:
+            tuple: (lista surowych ogłoszeń, metadata) lub (None, None) w przypadku błędu.
+        """
+        response = self.search(
+            query,
+            offset=offset,
+            limit=limit,
+            sort_by=sort_by,
+            price_from=price_from,
+            price_to=price_to,
+            category_id=category_id,
+            state=state,
+            region_id=region_id,
+            projection=projection
+        )
+
+        if not response:
+            return None, None
+
+        listings_data = response.get('data', {}).get('clientCompatibleListings', {})
+
+        if listings_data.get('__typename') != 'ListingSuccess':
+            print("   ✗ Błąd API lub brak wyników (ListingSuccess != true).")
+            metrics.REQUEST_ERRORS.inc(code='api')
+            self._count_failure()
+            return None, None
+
+        return listings_data.get('data', []), listings_data.get('metadata', {})
+
+    def _fetch_parsed_page(self, query, offset, limit, sort_by="created_at:desc", price_from=None, price_to=None,
+                           category_id=None, state=None, region_id=None):
+        """
+        Pobiera i parsuje jedną stronę wyników. Z pulą procesów (parse_pool) surowa odpowiedź
+        jest dekodowana i parsowana w procesie roboczym.
+
+        Returns:
+            tuple: (lista rekordów Listing, metadata) lub (None, None) w przypadku błędu.
+        """
+        if self.parse_pool is None:
+            batch, metadata = self._fetch_page(query, offset, limit, sort_by, price_from, price_to, category_id,
+                                               state, region_id)
+            if batch is None:
+                return None, None
+            start = time.perf_counter()
+            listings = [self.parse_listing(listing) for listing in batch]
+            metrics.PARSE_SECONDS.observe(time.perf_counter() - start)
+            metrics.LISTINGS_PARSED.inc(len(listings))
+            return listings, metadata
+
+        payload = self.search(
+            query,
+            offset=offset,
+            limit=limit,
+            sort_by=sort_by,
+            price_from=price_from,
+            price_to=price_to,
+            category_id=category_id,
+            state=state,
+            region_id=region_id,
+            raw=True
+        )
+        if payload is None:
+            return None, None
+
+        start = time.perf_counter()
+        try:
+            listings, metadata = self.parse_pool.parse(payload)
+        except ValueError as e:
+            print(f"✗ Niepoprawna odpowiedź JSON z API: {e}")
+            metrics.REQUEST_ERRORS.inc(code='json')
+            self._count_failure()
+            return None, None
+
+        if listings is None:
+            print("   ✗ Błąd API lub brak wyników (ListingSuccess != true).")
+            metrics.REQUEST_ERRORS.inc(code='api')
+            self._count_failure()
+            return None, None
+
+        metrics.PARSE_SECONDS.observe(time.perf_counter() - start)
+        metrics.LISTINGS_PARSED.inc(len(listings))
+        return listings, metadata
 
     def _scrape_batch(self, query, sort_by="created_at:desc", max_results=1000, batch_size=40, price_from=None,
-                      price_to=None, category_id=None, state=None):
+                      price_to=None, category_id=None, state=None, region_id=None, newer_than=None):
         """
         Pobiera jedną partię ogłoszeń (do 1000) dla określonych filtrów.
+
+        Przy podanym 'newer_than' (sortowanie od najnowszych) pobieranie kończy się na pierwszym
+        niepromowanym ogłoszeniu starszym niż ten znacznik czasu.
         """
-        effective_max = min(max_results, self.OLX_LIMIT)
         listings = []
-        offset = 0
+        for page in self._iter_pages(query, sort_by, max_results, batch_size, price_from, price_to, category_id,
+                                     state, region_id, newer_than):
+            listings.extend(page)
+
+        print(f"   ✅ Zebrano {len(listings)} ogłoszeń z tego zakresu.")
+        return listings
+
+    def _iter_pages(self, query, sort_by="created_at:desc", max_results=1000, batch_size=40, price_from=None,
+                    price_to=None, category_id=None, state=None, region_id=None, newer_than=None, start_offset=0):
+        """
+        Generator sparsowanych stron partii (do 1000 ogłoszeń) - każda strona jest zwracana
+        od razu po pobraniu, więc można ją zapisywać, zanim pobierze się następną.
+        Warunki zakończenia są takie same jak w _scrape_batch.
+        'start_offset' pozwala wznowić partię od strony zapisanej w punkcie kontrolnym.
+        """
+        effective_max = min(max_results, self.OLX_LIMIT)
+        fetched = 0
+        offset = start_offset
         total_available_in_range = 0
 
-        while len(listings) < effective_max:
+        while fetched < effective_max:
             if offset >= 1000:
                 print(f"   ⚠️  Osiągnięto limit offsetu (1000). Zatrzymuję pobieranie tej partii.")
                 break
 
             print(f"   📥 Pobieranie: Offset={offset}, Limit={batch_size}")
 
-            time.sleep(0.5)
-
-            response = self.search(
+            parsed, metadata = self._fetch_parsed_page(
                 query,
                 offset=offset,
                 limit=batch_size,
@@ -276,46 +480,316 @@ class OLXGraphQLScraper:
                 price_from=price_from,
                 price_to=price_to,
                 category_id=category_id,
-                state=state
+                state=state,
+                region_id=region_id
             )
 
-            if not response:
-                break
-
-            listings_data = response.get('data', {}).get('clientCompatibleListings', {})
-
-            if listings_data.get('__typename') != 'ListingSuccess':
-                print("   ✗ Błąd API lub brak wyników (ListingSuccess != true).")
+            if parsed is None:
+                print(f"   ⚠️  Nie udało się pobrać strony (offset {offset}). Zakres może być niekompletny.")
                 break
 
-            batch = listings_data.get('data', [])
-            if not batch:
+            if not parsed:
                 print(f"   ✓ Koniec wyników w tym zakresie.")
                 break
 
-            if offset == 0:
-                metadata = listings_data.get('metadata', {})
+            if offset == start_offset:
                 total_available_in_range = metadata.get('total_elements', 0)
                 print(f"      (Info: Dostępnych w tym zakresie: {total_available_in_range})")
 
-            parsed = [self.parse_listing(listing) for listing in batch]
-            listings.extend(parsed)
+            page_size = len(parsed)
+
+            if newer_than is not None:
+                # Promowane ogłoszenia są wyświetlane poza kolejnością - nie kończą pobierania
+                reached_watermark = any(
+                    not listing.promoted and self._listing_time(listing) <= newer_than for listing in parsed
+                )
+                parsed = [listing for listing in parsed if self._listing_time(listing) > newer_than]
 
-            if len(batch) < batch_size or len(listings) >= effective_max:
+            # Ostatnia strona może przekraczać limit partii - jak w _iter_range_pages przycinamy ją
+            parsed = parsed[:effective_max - fetched]
+
+            if newer_than is not None and reached_watermark:
+                yield parsed
+                print(f"   ✓ Osiągnięto ogłoszenia z poprzedniego przebiegu. Kończę pobieranie.")
+                break
+
+            fetched += len(parsed)
+            yield parsed
+
+            if page_size < batch_size or fetched >= effective_max:
                 break
 
             offset += batch_size
 
-        print(f"   ✅ Zebrano {len(listings)} ogłoszeń z tego zakresu.")
-        return listings
+    def _probe_range(self, partitioner, query, category_id, price_from, price_to, state=None):
+        """Sprawdza liczność zakresu i przekazuje ją do partitionera."""
+        count = self._get_total_count(query, category_id, price_from, price_to, state)
+        partitioner.observe_count(price_from, price_to, count)
+        return count
+
+    def _probe_first_page(self, partitioner, query, category_id, price_from, price_to, batch_size=40, state=None):
+        """
+        Pobiera pierwszą stronę zakresu - jej metadane zastępują osobne sprawdzenie liczności,
+        a ogłoszenia są albo początkiem pobierania zakresu (gdy mieści się w limicie), albo próbką cen
+        do wyznaczenia punktów podziału (gdy jest za duży).
+
+        Returns:
+            tuple: (lista rekordów Listing, liczność zakresu) lub (None, None) w przypadku błędu.
+        """
+        print(f"   [SPRAWDZAM] Zakres cen: {price_from:.2f} - {price_to:.2f} (pierwsza strona)...")
+        listings, metadata = self._fetch_parsed_page(query, offset=0, limit=batch_size, price_from=price_from,
+                                                     price_to=price_to, category_id=category_id, state=state)
+        if listings is None:
+            return None, None
+
+        count = max(metadata.get('total_elements', 0), metadata.get('visible_total_count', 0))
+        print(f"   [INFO] Znaleziono {count} ogłoszeń w tym zakresie.")
+        partitioner.observe_count(price_from, price_to, count)
+        return listings, count
+
+    def _probe_task(self, partitioner, query, category_id, price_from, price_to, batch_size=40, state=None):
+        """
+        Sprawdza zakres z kolejki. Zakres, który według szacunku partitionera wyraźnie przekracza limit
+        (i tak zostanie podzielony), sprawdza tylko zapytaniem o liczność - jego pierwszą stronę
+        pobrałyby ponownie części.
+        Pozostałe sprawdza pierwszą stroną wyników (_probe_first_page), od której zaczyna się ich pobieranie.
+
+        Returns:
+            tuple: (lista rekordów Listing albo None, liczność zakresu albo None w przypadku błędu).
+        """
+        expected = partitioner.estimate(price_from, price_to)
+        if expected is not None and expected > self.OLX_LIMIT * self.COUNT_PROBE_FACTOR:
+            return None, self._probe_range(partitioner, query, category_id, price_from, price_to, state)
+        return self._probe_first_page(partitioner, query, category_id, price_from, price_to, batch_size, state)
+
+    def _iter_range_pages(self, first_page, query, max_results, batch_size, price_from, price_to, category_id,
+                          state=None, start_offset=0):
+        """
+        Jak _iter_pages, ale zaczyna od strony pobranej już przy sprawdzaniu zakresu (_probe_first_page),
+        zamiast pobierać ją ponownie.
+        """
+        if first_page is None:
+            yield from self._iter_pages(query, max_results=max_results, batch_size=batch_size, price_from=price_from,
+                                        price_to=price_to, category_id=category_id, state=state,
+                                        start_offset=start_offset)
+            return
+
+        first_page = first_page[:max_results]
+        yield first_page
+        if len(first_page) < batch_size or len(first_page) >= max_results:
+            return
+        yield from self._iter_pages(query, max_results=max_results - len(first_page), batch_size=batch_size,
+                                    price_from=price_from, price_to=price_to, category_id=category_id, state=state,
+                                    start_offset=batch_size)
+
+    def _split_range(self, partitioner, p_from, p_to, current_total):
+        """
+        Dzieli za duży zakres w punktach wyznaczonych przez partitioner. Liczność części sprawdza
+        dopiero ich przetwarzanie (_probe_task).
+
+        Returns:
+            list: Lista krotek (price_from, price_to, None).
+        """
+        pieces = partitioner.split(p_from, p_to, current_total)
+        metrics.PARTITION_SPLITS.inc(kind='price')
+        print(f"   [SPLIT] Zakres {p_from:.2f}-{p_to:.2f} jest za duży ({current_total}).")
+        print(f"   Dzielę na {len(pieces)} części: " + ", ".join(f"{lo:.2f}-{hi:.2f}" for lo, hi in pieces))
+        return [(lo, hi, None) for lo, hi in pieces]
+
+    def _discover_region_ids(self, query, category_id, price_from, price_to, batch_size=40, state=None):
+        """
+        Zwraca identyfikatory regionów do podziału zakresu: z config.OLX_REGION_IDS, a jeśli brak -
+        widoczne na pierwszych stronach zakresu (posortowane wg. częstości).
+        """
+        if config.OLX_REGION_IDS:
+            return list(config.OLX_REGION_IDS)
+
+        region_counts = {}
+        for sort_by in ("created_at:desc", "created_at:asc"):
+            batch, _metadata = self._fetch_page(query, offset=0, limit=batch_size, sort_by=sort_by,
+                                                price_from=price_from, price_to=price_to,
+                                                category_id=category_id, state=state, projection='region')
+            for listing in batch or []:
+                region = (listing.get('location') or {}).get('region') or {}
+                if region.get('id') is not None:
+                    region_counts[region['id']] = region_counts.get(region['id'], 0) + 1
+        return sorted(region_counts, key=region_counts.get, reverse=True)
+
+    def _scrape_sort_orders(self, query, category_id, price_from, price_to, total, max_results, batch_size=40,
+                            state=None, region_id=None):
+        """
+        Ostatnia deska ratunku: pobiera pierwsze OLX_LIMIT ogłoszeń od najnowszych i od najstarszych,
+        co pokrywa do 2 * OLX_LIMIT ogłoszeń z zakresu (duplikaty usuwa wywołujący).
 
-    def _print_summary(self, total_fetched, total_saved):
+        Returns:
+            tuple: (ogłoszenia, czy pokrywają cały zakres) - z więcej niż 2 * OLX_LIMIT ogłoszeniami
+                środek zakresu (w kolejności dat) pozostaje niepobrany.
+        """
+        listings = []
+        for sort_by in ("created_at:desc", "created_at:asc"):
+            if len(listings) >= max_results:
+                break
+            print(f"   [WYMIAR] Pobieram zakres {price_from:.2f}-{price_to:.2f} z sortowaniem {sort_by}.")
+            listings.extend(self._scrape_batch(
+                query,
+                sort_by=sort_by,
+                max_results=min(max_results - len(listings), self.OLX_LIMIT),
+                batch_size=batch_size,
+                price_from=price_from,
+                price_to=price_to,
+                category_id=category_id,
+                state=state,
+                region_id=region_id
+            ))
+        # Ucięcie na max_results to osiągnięcie celu - sprawdza je wywołujący
+        covered = len({listing.olx_id for listing in listings}) >= total or len(listings) >= max_results
+        return listings, covered
+
+    def _scrape_unsplittable(self, query, category_id, price_from, price_to, total, max_results, batch_size=40,
+                             state=None, region_id=None, dimensions=UNSPLITTABLE_DIMENSIONS):
+        """
+        Pobiera zakres z jedną ceną (np. 2999.00-2999.00), który wciąż przekracza limit OLX, dzieląc go
+        po kolejnych wymiarach wyszukiwania (stan, region), a na końcu po kolejności sortowania.
+        Wywoływane tylko w tym rzadkim przypadku, więc nie dodaje zapytań do zwykłego podziału.
+        Części podziału cenowego nie dzielą granic, więc każda cena trafia tu najwyżej raz.
+
+        Returns:
+            tuple: (ogłoszenia z zakresu - mogą zawierać duplikaty, czy pobrano cały zakres).
+                False oznacza, że podzbiór większy niż 2 * OLX_LIMIT ogłoszeń nie dał się pobrać w całości.
+        """
+        if total <= self.OLX_LIMIT:
+            return self._scrape_batch(
+                query,
+                max_results=min(max_results, total),
+                batch_size=batch_size,
+                price_from=price_from,
+                price_to=price_to,
+                category_id=category_id,
+                state=state,
+                region_id=region_id
+            ), True
+
+        if not dimensions:
+            metrics.PARTITION_SPLITS.inc(kind='sort')
+            return self._scrape_sort_orders(query, category_id, price_from, price_to, total, max_results,
+                                            batch_size, state, region_id)
+
+        dimension, remaining_dimensions = dimensions[0], dimensions[1:]
+        if dimension == 'state' and state is None:
+            subsets = [('new', region_id), ('used', region_id)]
+        elif dimension == 'region' and region_id is None:
+            subsets = [(state, region) for region in
+                       self._discover_region_ids(query, category_id, price_from, price_to, batch_size, state)]
+        else:
+            subsets = []
+
+        if not subsets:
+            return self._scrape_unsplittable(query, category_id, price_from, price_to, total, max_results,
+                                             batch_size, state, region_id, remaining_dimensions)
+
+        metrics.PARTITION_SPLITS.inc(kind=dimension)
+        print(f"   [WYMIAR] Dzielę zakres {price_from:.2f}-{price_to:.2f} ({total}) według: {dimension} "
+              f"({len(subsets)} podzbiorów).")
+
+        listings = []
+        covered = 0
+        complete = True
+        for sub_state, sub_region in subsets:
+            if len(listings) >= max_results:
+                break
+            sub_total = self._get_total_count(query, category_id, price_from, price_to, sub_state, sub_region)
+            if not sub_total:
+                continue
+            covered += sub_total
+            sub_listings, sub_complete = self._scrape_unsplittable(query, category_id, price_from, price_to,
+                                                                   sub_total, max_results - len(listings),
+                                                                   batch_size, sub_state, sub_region,
+                                                                   remaining_dimensions)
+            listings.extend(sub_listings)
+            complete = complete and sub_complete
+
+        if covered < total and len(listings) < max_results:
+            # Ogłoszenia spoza podzbiorów (np. bez parametru stanu lub z nieznanego regionu)
+            print(f"   [WYMIAR] Podzbiory pokrywają {covered}/{total} ogłoszeń. Dobieram resztę sortowaniem.")
+            rest, rest_complete = self._scrape_sort_orders(query, category_id, price_from, price_to, total,
+                                                           max_results - len(listings), batch_size, state,
+                                                           region_id)
+            listings.extend(rest)
+            complete = complete and rest_complete
+        return listings, complete
+
+    def _count_shortfall(self, price_from, price_to, total):
+        """
+        Zlicza zakres, którego nie udało się pobrać w całości (także z wątków AsyncCrawlEngine).
+        Liczy się jak błąd crawla, więc trafia do punktu kontrolnego i blokuje deaktywację (sweep).
+        """
+        print(f"   ⚠️  Nie udało się pobrać wszystkich {total} ogłoszeń z zakresu "
+              f"{price_from:.2f}-{price_to:.2f} (ponad 2 * {self.OLX_LIMIT} w jednym podzbiorze). "
+              f"Crawl nie będzie kompletny.")
+        with self._failures_lock:
+            self.coverage_shortfalls += 1
+
+    def _plan_tasks(self, partitioner, cached_leaves, min_price, max_price):
+        """
+        Buduje początkowe zadania z liści zapisanego planu podziału.
+        Każdy liść zostanie ponownie sprawdzony jednym zapytaniem o liczność; luki między
+        liśćmi a bieżącym zakresem [min_price, max_price] są dodawane jako osobne zadania.
+
+        Returns:
+            list: Lista krotek (price_from, price_to, None).
+        """
+        for lo, hi, count in cached_leaves:
+            partitioner.observe_count(lo, hi, count)
+
+        # Scalamy liście, które wczoraj razem mieściły się z zapasem w limicie
+        leaves = partitioner.merge(
+            [(max(lo, min_price), min(hi, max_price), count) for lo, hi, count in cached_leaves
+             if hi > min_price and lo < max_price],
+            limit=partitioner.target
+        )
+
+        # 'next_from' to najniższa cena jeszcze nie pokryta zadaniami (zakresy nie dzielą granic)
+        tasks = []
+        next_from = min_price
+        for lo, hi, _count in leaves:
+            if hi < next_from:
+                continue
+            if lo > next_from:
+                tasks.append((next_from, round(lo - PricePartitioner.PRICE_STEP, 2), None))
+            tasks.append((max(lo, next_from), hi, None))
+            next_from = PricePartitioner.next_price(hi)
+        if next_from <= max_price or not tasks:
+            tasks.append((min(next_from, max_price), max_price, None))
+
+        print(f"   [CACHE] Używam zapisanego planu podziału: {len(tasks)} zakresów do weryfikacji.")
+        return tasks
+
+    @staticmethod
+    def _listing_time(listing):
+        """Czas ostatniej aktywności ogłoszenia (utworzenie lub odświeżenie)."""
+        times = [t for t in (listing.created_time, listing.refreshed_time) if t is not None]
+        return max(times) if times else datetime.min.replace(tzinfo=timezone.utc)
+
+    @staticmethod
+    def _query_key(query, category_id=None, state=None, price_from=None, price_to=None):
+        """Klucz zapytania używany dla znaczników czasu trybu przyrostowego."""
+        return f"{query}|{category_id}|{state}|{price_from}|{price_to}"
+
+    def _print_summary(self, total_fetched, total_saved, changes=None):
         """Wyświetla podsumowanie całego procesu."""
         print(f"\n{'=' * 60}")
         print("🎉 ZAKOŃCZONO SCRAPING")
         print(f"{'=' * 60}")
         print(f"📦 Łącznie pobrano: {total_fetched} unikalnych ogłoszeń")
         print(f"💾 Zapisano/Zaktualizowano w bazie: {total_saved} ogłoszeń")
+        if changes:
+            print(f"🆕 Nowe: {changes['inserted']}, zmienione: {changes['changed']}, "
+                  f"bez zmian: {changes['unchanged']}")
+
+    def _save_changes(self, totals_before):
+        """Liczby nowych/zmienionych/niezmienionych ogłoszeń zapisanych od stanu 'totals_before' (db.save_totals)."""
+        totals = getattr(self.db, 'save_totals', {})
+        return {key: value - totals_before.get(key, 0) for key, value in totals.items()}
 
     def scrape_latest(self, query, max_results=1000, batch_size=40, category_id=None, state=None,
                       price_from=None, price_to=None):
@@ -355,10 +829,141 @@ class OLXGraphQLScraper:
         self._print_summary(len(listings), saved_count)
         return saved_count
 
+    def scrape_incremental(self, query, max_results=1000, batch_size=40, category_id=None, state=None,
+                           price_from=None, price_to=None):
+        """
+        Pobiera tylko ogłoszenia nowsze niż w poprzednim przebiegu ("od ostatniego uruchomienia").
+
+        Dla każdego zapytania w bazie przechowywany jest znacznik czasu (high-water mark) najnowszego
+        zapisanego ogłoszenia (created_time/refreshed_time). Stronicowanie od najnowszych kończy się
+        po dojściu do starszych ogłoszeń, więc częste odświeżanie kosztuje kilka zapytań.
+        Przy pierwszym uruchomieniu działa jak scrape_latest.
+        """
+        query_key = self._query_key(query, category_id, state, price_from, price_to)
+        watermark = self.db.get_watermark(query_key)
+        totals_before = dict(getattr(self.db, 'save_totals', {}))
+        effective_max = min(max_results, self.OLX_LIMIT)
+        failures_before = self.failed_requests
+
+        print(f"\n🚀 Rozpoczynam przyrostowy scraping dla: '{query}'")
+        if watermark:
+            print(f"⏱️  Ostatni znacznik czasu: {watermark.isoformat()}")
+        else:
+            print(f"⏱️  Brak znacznika czasu - pobieram najnowsze {max_results} ogłoszeń.")
+
+        listings = self._scrape_batch(
+            query,
+            sort_by="created_at:desc",
+            max_results=effective_max,
+            batch_size=batch_size,
+            price_from=price_from,
+            price_to=price_to,
+            category_id=category_id,
+            state=state,
+            newer_than=watermark
+        )
+        # Stronicowanie doszło do poprzedniego znacznika (albo do końca wyników) - bez błędów i bez ucięcia limitem
+        caught_up = self.failed_requests == failures_before and len(listings) < effective_max
+
+        if not listings:
+            print("   ✓ Brak nowych ogłoszeń od ostatniego przebiegu.")
+            self._print_summary(0, 0)
+            return 0
+
+        print(f"\n   💾 Zapisywanie {len(listings)} pobranych ogłoszeń do bazy danych...")
+        saved_count = self.db.save_to_database(listings)
+
+        # Znacznik przesuwamy tylko, gdy zapis się powiódł. Do najnowszego ogłoszenia - tylko gdy pobrano
+        # wszystko od poprzedniego znacznika; przebieg ucięty (limit, błąd strony) zostawia poprzedni znacznik,
+        # bo ogłoszenia między nim a najstarszym pobranym nie zostały jeszcze pobrane
+        if saved_count:
+            if caught_up:
+                self.db.set_watermark(query_key, max(self._listing_time(listing) for listing in listings))
+            elif watermark is None:
+                # Pierwszy przebieg: wszystko nowsze niż najstarsze pobrane (w kolejności) ogłoszenie jest w bazie
+                in_order = [self._listing_time(listing) for listing in listings if not listing.promoted]
+                if in_order:
+                    self.db.set_watermark(query_key, min(in_order))
+            else:
+                print(f"   ⚠️  Pobieranie przerwane przed poprzednim znacznikiem czasu - pozostawiam go bez zmian.")
+
+        self._print_summary(len(listings), saved_count, self._save_changes(totals_before))
+        return saved_count
+
+    def scrape_price_ranges(self, query, price_ranges, batch_size=40, category_id=None, state=None,
+                            max_results=5000):
+        """
+        Ponownie pobiera ogłoszenia z podanych zakresów cenowych (np. "gorących" liści planu podziału),
+        odświeżając ceny i treść bez pełnego skanowania. Zakresy nie są dzielone - każdy jest pobierany
+        jedną partią (do limitu OLX). Nie używa punktu kontrolnego i nie kończy przebiegu (bez deaktywacji).
+
+        Args:
+            price_ranges (list): Krotki (price_from, price_to, count).
+            max_results (int): Budżet ogłoszeń na całe wywołanie.
+
+        Returns:
+            dict: Klucze 'fetched', 'saved', 'changes' (nowe/zmienione/niezmienione)
+                i 'ranges' (liczba przetworzonych zakresów).
+        """
+        print(f"\n🚀 Rozpoczynam odświeżanie {len(price_ranges)} zakresów cenowych dla: '{query}'")
+        print(f"🎯 Budżet: {max_results} ogłoszeń")
+
+        collector = ListingCollector(keep_listings=False)
+        totals_before = dict(getattr(self.db, 'save_totals', {}))
+        writer = BatchWriter(
+            self.db,
+            batch_size=config.PIPELINE_WRITE_BATCH,
+            flush_interval=config.PIPELINE_FLUSH_SECONDS,
+            max_pending_pages=config.PIPELINE_MAX_PENDING_PAGES
+        ).start()
+        processed = 0
+        try:
+            for p_from, p_to, _count in price_ranges:
+                remaining_needed = max_results - len(collector)
+                if remaining_needed <= 0:
+                    print("   [INFO] Wyczerpano budżet ogłoszeń. Pomijam pozostałe zakresy.")
+                    break
+
+                print(f"\nProcessing range: {p_from:.2f} - {p_to:.2f}")
+                for page in self._iter_pages(
+                    query,
+                    max_results=min(remaining_needed, self.OLX_LIMIT),
+                    batch_size=batch_size,
+                    price_from=p_from,
+                    price_to=p_to,
+                    category_id=category_id,
+                    state=state
+                ):
+                    self._collect_new(collector, page, writer)
+                processed += 1
+        finally:
+            total_saved_count = writer.close()
+
+        changes = self._save_changes(totals_before)
+        self._print_summary(len(collector), total_saved_count, changes)
+        return {'fetched': len(collector), 'saved': total_saved_count, 'changes': changes, 'ranges': processed}
+
     def scrape_recursive(self, query, target_results=5000, batch_size=40, category_id=None, state=None,
-                         initial_price_from=1.0, initial_price_to=None):  # <-- NOWE PARAMETRY
+                         initial_price_from=1.0, initial_price_to=None, concurrency=1,
+                         keep_listings=True):  # <-- NOWE PARAMETRY
         """
         Główna funkcja scrapująca, używająca rekurencyjnego podziału cenowego.
+
+        Przy concurrency > 1 podział i pobieranie zakresów wykonuje AsyncCrawlEngine
+        (równoległe zapytania, ten sam zdeduplikowany zbiór wyników).
+        Pobrane strony trafiają od razu do zapisu w tle (BatchWriter), więc zapis do bazy
+        odbywa się równolegle z pobieraniem kolejnych stron i zakresów.
+        Z punktem kontrolnym (self.checkpoint) przerwany crawl jest wznawiany od zapisanego frontu.
+
+        Args:
+            keep_listings (bool): True - zwraca listę wszystkich pobranych ogłoszeń.
+                False - deduplikacja pamięta tylko identyfikatory, a wynikiem jest podsumowanie
+                (stała pamięć niezależnie od liczby ogłoszeń).
+
+        Returns:
+            list | dict: Lista unikalnych ogłoszeń albo (keep_listings=False) słownik
+                z kluczami 'fetched', 'saved', 'changes' (nowe/zmienione/niezmienione w bazie),
+                'complete' i 'sample' (kilka pierwszych ogłoszeń).
         """
         print(f"\n🚀 Rozpoczynam scraping dla: '{query}'")
         if category_id:
@@ -370,26 +975,137 @@ class OLXGraphQLScraper:
         print(f"🎯 Cel: {target_results} ogłoszeń")
         print(f"💡 Strategia: Rekurencyjny podział cenowy (limit OLX: {self.OLX_LIMIT})\n")
 
-        all_listings = {}
-        total_saved_count = 0
+        self._failures_before = self.failed_requests
+        self._resumed_failures = 0
+        self.coverage_shortfalls = 0
+        self.last_crawl_complete = False
+        collector = ListingCollector(keep_listings=keep_listings)
+        totals_before = dict(getattr(self.db, 'save_totals', {}))
+
+        writer = BatchWriter(
+            self.db,
+            batch_size=config.PIPELINE_WRITE_BATCH,
+            flush_interval=config.PIPELINE_FLUSH_SECONDS,
+            max_pending_pages=config.PIPELINE_MAX_PENDING_PAGES
+        ).start()
+        try:
+            crawl_complete = self._crawl_recursive(collector, writer, query, target_results, batch_size, category_id,
+                                                   state, initial_price_from, initial_price_to, concurrency)
+        finally:
+            total_saved_count = writer.close()
 
-        task_queue = deque()
+        # Crawl doszedł do końca (także przy błędach stron) - wznowienie nie ma już czego dokończyć
+        if crawl_complete is not None and self.checkpoint is not None:
+            self.checkpoint.clear()
+
+        if crawl_complete is None:
+            return [] if keep_listings else {'fetched': 0, 'saved': 0, 'changes': self._save_changes(totals_before),
+                                             'complete': False, 'sample': []}
+
+        # 4. Koniec
+        # Przebieg jest kompletny tylko bez nieudanych zapytań i zapisów (także sprzed wznowienia
+        # z punktu kontrolnego) - od tego zależy deaktywacja (sweep)
+        self.last_crawl_complete = crawl_complete and self._crawl_failures() == 0
+        changes = self._save_changes(totals_before)
+        self._print_summary(len(collector), total_saved_count, changes)
+        if keep_listings:
+            return collector.listings()
+        return {
+            'fetched': len(collector),
+            'saved': total_saved_count,
+            'changes': changes,
+            'complete': self.last_crawl_complete,
+            'sample': collector.sample
+        }
+
+    @staticmethod
+    def _collect_new(collector, listings, writer, target_results=None):
+        """
+        Deduplikuje ogłoszenia względem już zebranych i przekazuje nowe do zapisu w tle.
+        Z 'target_results' przyjmuje tylko tyle nowych ogłoszeń, ile brakuje do celu.
+        """
+        new_listings_in_batch = collector.add_new(listings, limit=target_results)
+        writer.put(new_listings_in_batch)
+        return len(new_listings_in_batch)
+
+    def _checkpoint_due(self):
+        return self.checkpoint is not None and self.checkpoint.due()
+
+    def _crawl_failures(self):
+        """
+        Nieudane zapytania i zapisy oraz niepełne zakresy bieżącego crawla,
+        łącznie z błędami sprzed wznowienia.
+        """
+        return (self._resumed_failures + self.failed_requests - self._failures_before + self.coverage_shortfalls
+                + getattr(self.db, 'run_save_failures', 0))
+
+    def _save_checkpoint(self, writer, key, pending, leaves, offsets=None):
+        """
+        Zapisuje punkt kontrolny - dopiero gdy wszystkie przekazane wcześniej ogłoszenia są w bazie.
+        Liczba błędów crawla trafia do punktu kontrolnego i do przebiegu bazy (crawl_runs).
+        """
+        if writer is not None:
+            writer.flush()
+        run_id = getattr(self.db, 'current_run_id', None)
+        failures = self._crawl_failures()
+        self.checkpoint.save(key, run_id, pending, leaves, offsets, failures)
+        if failures and run_id is not None:
+            self.db.record_run_failures(run_id, failures)
+
+    def _crawl_recursive(self, collector, writer, query, target_results, batch_size, category_id, state,
+                         initial_price_from, initial_price_to, concurrency):
+        """
+        Przechodzi zakresy cenowe dla scrape_recursive.
+        Jeśli istnieje punkt kontrolny tego crawla (i przebiegu bazy), wznawia go od zapisanego frontu.
+
+        Returns:
+            bool: Czy przeszedł cały zakres (None, gdy nie udało się zacząć).
+        """
+        crawl_complete = False
+
+        partitioner = PricePartitioner(limit=self.OLX_LIMIT)
+        crawl_key = PartitionPlanCache.make_key(query, category_id, state, initial_price_from, initial_price_to)
+        plan_key = crawl_key if self.plan_cache is not None else None
+
+        if self.checkpoint is not None:
+            resumed = self.checkpoint.load(crawl_key, getattr(self.db, 'current_run_id', None))
+            if resumed is not None:
+                print(f"   [CHECKPOINT] Wznawiam przerwany crawl: {len(resumed['pending'])} zakresów do przetworzenia, "
+                      f"{len(resumed['leaves'])} ukończonych.")
+                if resumed['failures']:
+                    print(f"   [CHECKPOINT] ⚠️  Przed przerwaniem wystąpiło {resumed['failures']} błędów - "
+                          f"przebieg nie będzie kompletny.")
+                self._resumed_failures = resumed['failures']
+                for lo, hi, count in resumed['leaves']:
+                    partitioner.observe_count(lo, hi, count)
+                return self._crawl_tasks(collector, writer, partitioner, query, target_results, batch_size,
+                                         category_id, state, concurrency, resumed['pending'], crawl_key, plan_key,
+                                         plan_leaves=resumed['leaves'], offsets=resumed['offsets'])
 
         # ==================================================================
         # *** POPRAWKA: Używamy przekazanych zakresów cenowych ***
         # Sprawdzamy liczbę ogłoszeń w TYM KONKRETNYM ZAKRESIE CENOWYM
         # ==================================================================
         print(f"   [INFO] Używam początkowego zakresu cen: {initial_price_from} - {initial_price_to}")
-        initial_total = self._get_total_count(query, category_id, initial_price_from, initial_price_to, state)
+        initial_page = None
+        if initial_price_from is not None and initial_price_to is not None:
+            # Pierwsza strona zastępuje sprawdzenie liczności: przy małym zbiorze jest początkiem pobierania,
+            # przy dużym - próbką cen dla pierwszego podziału
+            initial_page, initial_total = self._probe_first_page(partitioner, query, category_id, initial_price_from,
+                                                                 initial_price_to, batch_size, state)
+        else:
+            initial_total = self._probe_range(partitioner, query, category_id, initial_price_from, initial_price_to,
+                                              state)
 
         if initial_total is None:
             print("✗ Nie udało się pobrać wstępnych danych. Przerywam.")
-            return []
+            return None
 
         if 0 < initial_total <= self.OLX_LIMIT:
             print(f"✓ Łączna liczba ogłoszeń ({initial_total}) jest mniejsza lub równa limitowi.")
             print("Pobieram wszystko w jednej partii...")
-            listings_batch = self._scrape_batch(
+            for page in self._iter_range_pages(
+                initial_page,
                 query,
                 max_results=min(initial_total, target_results),
                 batch_size=batch_size,
@@ -397,17 +1113,18 @@ class OLXGraphQLScraper:
                 state=state,
                 price_from=initial_price_from,  # <-- Filtrujemy tylko w tym zakresie
                 price_to=initial_price_to
-            )
-            for listing in listings_batch:
-                all_listings[listing['olx_id']] = listing
+            ):
+                self._collect_new(collector, page, writer, target_results)
 
-            saved = self.db.save_to_database(listings_batch)
-            total_saved_count += saved
-            print(f"   💾 Zapisano/Zaktualizowano: {saved} ogłoszeń")
+            print(f"   ✅ Zebrano {len(collector)} ogłoszeń.")
+            crawl_complete = initial_total <= target_results
 
         elif initial_total > self.OLX_LIMIT:
             print(f"⚠️ Łączna liczba ogłoszeń ({initial_total}) przekracza limit {self.OLX_LIMIT}.")
             print("Rozpoczynam dzielenie na zakresy cenowe...")
+            if initial_page:
+                partitioner.observe_prices(listing.price_value for listing in initial_page)
+                self._collect_new(collector, initial_page, writer, target_results)
 
             # ==================================================================
             # *** POPRAWKA: Ustawienie zakresu cenowego (min/max) ***
@@ -421,7 +1138,7 @@ class OLXGraphQLScraper:
                 max_price = self._get_bound_price(query, category_id, "filter_float_price:desc", state)
                 if max_price is None:
                     print("✗ Nie udało się ustalić ceny maksymalnej. Przerywam.")
-                    return []
+                    return None
             else:
                 # Używamy górnego zakresu podanego przez użytkownika
                 max_price = initial_price_to
@@ -433,102 +1150,169 @@ class OLXGraphQLScraper:
                     f"   [OSTRZEŻENIE] Znaleziona/ustawiona cena maksymalna ({max_price:.2f}) jest mniejsza niż startowa ({min_price:.2f}). Używam {min_price:.2f} - {min_price:.2f}.")
                 max_price = min_price
 
-            # Dodajemy do kolejki PIERWSZE zadanie z pełnym zakresem
-            task_queue.append((min_price, max_price))
             print(f"   [INFO] Ustalono pełny zakres do podziału: {min_price:.2f} - {max_price:.2f} PLN")
 
-            # 3. Pętla przetwarzania kolejki zadań
-            while task_queue and len(all_listings) < target_results:
-                p_from, p_to = task_queue.popleft()
+            # Zadania startowe: pełny zakres (z licznością już sprawdzoną, jeśli to ten sam zakres)
+            # albo liście planu z poprzedniego uruchomienia
+            known_total = initial_total if (min_price, max_price) == (initial_price_from, initial_price_to) else None
+            initial_tasks = [(min_price, max_price, known_total)]
+            if plan_key is not None:
+                cached_leaves = self.plan_cache.load(plan_key)
+                if cached_leaves:
+                    initial_tasks = self._plan_tasks(partitioner, cached_leaves, min_price, max_price)
 
-                if p_from is not None and p_to is not None and p_from > p_to:
-                    print(f"   [OSTRZEŻENIE] Pominąłem nieprawidłowy zakres: {p_from:.2f} > {p_to:.2f}")
-                    continue
+            crawl_complete = self._crawl_tasks(collector, writer, partitioner, query, target_results, batch_size,
+                                               category_id, state, concurrency, initial_tasks, crawl_key, plan_key)
 
-                print(f"\nProcessing range: {p_from:.2f} - {p_to:.2f}")
+        return crawl_complete
 
-                # Sprawdzamy, ile jest ogłoszeń w *tym konkretnym pod-zakresie*
-                current_total = self._get_total_count(query, category_id, p_from, p_to, state)
+    def _crawl_tasks(self, collector, writer, partitioner, query, target_results, batch_size, category_id, state,
+                     concurrency, initial_tasks, crawl_key, plan_key=None, plan_leaves=None, offsets=None):
+        """
+        Przetwarza kolejkę zakresów cenowych (podział, pobieranie, zapis planu podziału).
 
-                if current_total is None or current_total == 0:
-                    print("   [INFO] Brak wyników w tym zakresie. Pomijam.")
-                    continue
+        Args:
+            initial_tasks (list): Zakresy startowe jako krotki (price_from, price_to, count).
+            crawl_key (str): Klucz crawla w punkcie kontrolnym.
+            plan_key (str): Klucz planu podziału w plan_cache (None - bez zapisu planu).
+            plan_leaves (list): Liście ukończone przed wznowieniem z punktu kontrolnego.
+            offsets (dict): (price_from, price_to) -> offset, od którego wznowić pobieranie zakresu.
 
-                if 0 < current_total <= self.OLX_LIMIT:
-                    # Ten zakres jest wystarczająco mały, aby go pobrać!
-                    print(f"   [OK] Zakres {p_from:.2f}-{p_to:.2f} ma {current_total} ogłoszeń. Pobieram...")
+        Returns:
+            bool: Czy przeszedł cały zakres.
+        """
+        task_queue = deque()
+        plan_leaves = list(plan_leaves or [])
+        offsets = dict(offsets or {})
+        # Czy pobieranie któregoś zakresu ucięto, bo osiągnięto target_results (crawl wtedy nie jest pełny)
+        stopped_at_target = False
+
+        if concurrency > 1:
+            print(f"   [INFO] Tryb współbieżny: do {concurrency} jednoczesnych zapytań.")
+            engine = AsyncCrawlEngine(self, concurrency=concurrency, partitioner=partitioner, writer=writer,
+                                      collector=collector, checkpoint_key=crawl_key)
+            engine.run(query, target_results, batch_size, category_id, state, initial_tasks, leaves=plan_leaves,
+                       offsets=offsets)
+            plan_leaves = engine.leaves
+            stopped_at_target = engine.stopped_at_target or bool(engine.pending)
+        else:
+            task_queue.extend(initial_tasks)
+
+        # 3. Pętla przetwarzania kolejki zadań
+        while task_queue and len(collector) < target_results:
+            p_from, p_to, current_total = task_queue.popleft()
+            metrics.QUEUE_DEPTH.set(len(task_queue), queue='ranges')
+
+            if p_from is not None and p_to is not None and p_from > p_to:
+                print(f"   [OSTRZEŻENIE] Pominąłem nieprawidłowy zakres: {p_from:.2f} > {p_to:.2f}")
+                continue
+
+            if self._checkpoint_due():
+                self._save_checkpoint(writer, crawl_key, [(p_from, p_to, current_total)] + list(task_queue),
+                                      plan_leaves, offsets)
+
+            print(f"\nProcessing range: {p_from:.2f} - {p_to:.2f}")
+
+            # Sprawdzamy, ile jest ogłoszeń w *tym konkretnym pod-zakresie* - pierwszą stroną wyników
+            # (chyba że liczność jest już znana z punktu kontrolnego)
+            first_page = None
+            if current_total is None:
+                first_page, current_total = self._probe_task(partitioner, query, category_id, p_from, p_to,
+                                                             batch_size, state)
+
+            if current_total is None:
+                print("   [INFO] Nie udało się sprawdzić zakresu. Pomijam.")
+                continue
+
+            if current_total == 0:
+                print("   [INFO] Brak wyników w tym zakresie. Pomijam.")
+                plan_leaves.append((p_from, p_to, 0))
+                continue
+
+            if 0 < current_total <= self.OLX_LIMIT:
+                # Ten zakres jest wystarczająco mały, aby go pobrać!
+                print(f"   [OK] Zakres {p_from:.2f}-{p_to:.2f} ma {current_total} ogłoszeń. Pobieram...")
+
+                start_offset = offsets.pop((p_from, p_to), 0)
+                if start_offset:
+                    print(f"   [CHECKPOINT] Wznawiam zakres od offsetu {start_offset}.")
+                # Budżet target_results dotyczy nowych ogłoszeń, nie pobranych wierszy (część mogła
+                # już trafić do zbioru z pierwszej strony zakresu nadrzędnego)
+                range_max = min(self.OLX_LIMIT, current_total) - start_offset
+
+                # Każda strona od razu trafia do zapisu w tle - bez czekania na cały zakres
+                fetched = 0
+                new_count = 0
+                next_offset = start_offset
+                for page in self._iter_range_pages(
+                    first_page,
+                    query,
+                    max_results=range_max,
+                    batch_size=batch_size,
+                    price_from=p_from,
+                    price_to=p_to,
+                    category_id=category_id,
+                    state=state,
+                    start_offset=start_offset
+                ):
+                    partitioner.observe_prices(listing.price_value for listing in page)
+                    fetched += len(page)
+                    new_count += self._collect_new(collector, page, writer, target_results)
+                    next_offset += batch_size
+
+                    if len(collector) >= target_results:
+                        # Cel osiągnięty - pełna strona przed końcem zakresu oznacza niepobraną resztę
+                        if len(page) == batch_size and fetched < range_max:
+                            stopped_at_target = True
+                        break
+
+                    if self._checkpoint_due():
+                        self._save_checkpoint(writer, crawl_key, [(p_from, p_to, current_total)] + list(task_queue),
+                                              plan_leaves, {(p_from, p_to): next_offset})
+
+                plan_leaves.append((p_from, p_to, current_total))
+                print(f"   ✅ Zebrano {fetched} ogłoszeń z tego zakresu, w tym {new_count} nowych.")
+
+            elif current_total > self.OLX_LIMIT:
+                # Ten zakres jest nadal za duży. Podziel go.
+                # Pierwsza strona to losowa względem ceny próbka zakresu - wskazuje punkty podziału
+                if first_page:
+                    partitioner.observe_prices(listing.price_value for listing in first_page)
+                    self._collect_new(collector, first_page, writer, target_results)
+
+                if p_from is None or p_to is None or PricePartitioner.can_split(p_from, p_to):
+                    pieces = self._split_range(partitioner, p_from, p_to, current_total)
+                    for piece in reversed(pieces):
+                        task_queue.appendleft(piece)
 
-                    remaining_needed = target_results - len(all_listings)
+                else:
+                    print(
+                        f"   [OSTRZEŻENIE] Nie można dalej podzielić zakresu {p_from:.2f}-{p_to:.2f} (total: {current_total}).")
+                    print(f"   Dzielę go według dodatkowych wymiarów wyszukiwania (stan, region, sortowanie).")
 
-                    listings_batch = self._scrape_batch(
+                    remaining_needed = target_results - len(collector)
+                    if remaining_needed < current_total:
+                        stopped_at_target = True
+                    listings_batch, covered = self._scrape_unsplittable(
                         query,
-                        max_results=min(remaining_needed, self.OLX_LIMIT, current_total),
+                        category_id,
+                        p_from,
+                        p_to,
+                        current_total,
+                        max_results=remaining_needed,
                         batch_size=batch_size,
-                        price_from=p_from,
-                        price_to=p_to,
-                        category_id=category_id,
                         state=state
                     )
+                    if not covered:
+                        self._count_shortfall(p_from, p_to, current_total)
 
-                    new_listings_in_batch = []
-                    for listing in listings_batch:
-                        if listing['olx_id'] not in all_listings:
-                            all_listings[listing['olx_id']] = listing
-                            new_listings_in_batch.append(listing)
-
-                    if new_listings_in_batch:
-                        saved = self.db.save_to_database(new_listings_in_batch)
-                        total_saved_count += saved
-                        print(f"   💾 Dodano {len(new_listings_in_batch)} nowych ogłoszeń (Zapisano/Zakt: {saved})")
-                    else:
-                        print("   ✓ Brak nowych ogłoszeń w tej partii.")
-
-                elif current_total > self.OLX_LIMIT:
-                    # Ten zakres jest nadal za duży. Podziel go.
-
-                    can_split = True
-                    if p_from is not None and p_to is not None:
-                        if (p_to - p_from) < 0.01:
-                            can_split = False
-
-                    if can_split:
-                        p_mid = (p_from + p_to) / 2.0
-                        print(f"   [SPLIT] Zakres {p_from:.2f}-{p_to:.2f} jest za duży ({current_total}).")
-                        print(f"   Dzielę na: {p_from:.2f}-{p_mid:.2f} i {p_mid:.2f}-{p_to:.2f}")
-
-                        task_queue.appendleft((p_mid, p_to))
-                        task_queue.appendleft((p_from, p_mid))
-
-                    else:
-                        print(
-                            f"   [OSTRZEŻENIE] Nie można dalej podzielić zakresu {p_from:.2f}-{p_to:.2f} (total: {current_total}).")
-                        print(f"   Pobieram pierwsze {self.OLX_LIMIT} ogłoszeń z tego zakresu (limit OLX).")
-
-                        remaining_needed = target_results - len(all_listings)
-                        listings_batch = self._scrape_batch(
-                            query,
-                            max_results=min(remaining_needed, self.OLX_LIMIT),
-                            batch_size=batch_size,
-                            price_from=p_from,
-                            price_to=p_to,
-                            category_id=category_id,
-                            state=state
-                        )
-
-                        new_listings_in_batch = []
-                        for listing in listings_batch:
-                            if listing['olx_id'] not in all_listings:
-                                all_listings[listing['olx_id']] = listing
-                                new_listings_in_batch.append(listing)
-
-                        if new_listings_in_batch:
-                            saved = self.db.save_to_database(new_listings_in_batch)
-                            total_saved_count += saved
-                            print(f"   💾 Dodano {len(new_listings_in_batch)} nowych ogłoszeń (Zapisano/Zakt: {saved})")
-                        else:
-                            print("   ✓ Brak nowych ogłoszeń w tej partii.")
+                    new_count = self._collect_new(collector, listings_batch, writer, target_results)
+                    plan_leaves.append((p_from, p_to, current_total))
+                    print(f"   ✓ Nowych ogłoszeń w tej partii: {new_count}")
 
-        # 4. Koniec
-        final_listings_list = list(all_listings.values())
-        self._print_summary(len(final_listings_list), total_saved_count)
-        return final_listings_list
\ No newline at end of file
+        # Plan zapisujemy tylko po pełnym przejściu zakresu (nie przy przerwaniu na target_results)
+        crawl_complete = not task_queue and not stopped_at_target and not collector.truncated
+        if plan_key is not None and crawl_complete:
+            self.plan_cache.store(plan_key, plan_leaves)
+
+        return crawl_complete
@@ -0,0 +1,112 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# config ostrzega przy braku hasła bazy - testy nie łączą się z PostgreSQL
+os.environ.setdefault('DB_PASSWORD', 'test')
+
+from mock_server import MockGraphQLServer  # noqa: E402
+from rate_limiter import RateLimiter  # noqa: E402
+from scraper import OLXGraphQLScraper  # noqa: E402
+from transport import make_response  # noqa: E402
+
+
+class FakeDatabase:
+    """Baza w pamięci: zapamiętuje zapisane ogłoszenia i przebieg (bez PostgreSQL)."""
+
+    def __init__(self):
+        self.current_run_id = None
+        self.saved = []
+        self.save_totals = {'inserted': 0, 'changed': 0, 'unchanged': 0}
+        self.run_save_failures = 0
+        self.run_failures = 0
+        self.watermarks = {}
+
+    def save_to_database(self, listings_data):
+        known = {listing.olx_id for listing in self.saved}
+        inserted = sum(1 for listing in listings_data if listing.olx_id not in known)
+        self.save_totals['inserted'] += inserted
+        self.save_totals['unchanged'] += len(listings_data) - inserted
+        self.saved.extend(listings_data)
+        return len(listings_data)
+
+    def record_run_failures(self, run_id, failures):
+        self.run_failures = max(self.run_failures, failures)
+
+    def get_watermark(self, query_key):
+        return self.watermarks.get(query_key)
+
+    def set_watermark(self, query_key, watermark):
+        self.watermarks[query_key] = max(watermark, self.watermarks.get(query_key, watermark))
+
+    def close(self):
+        pass
+
+
+class InProcessTransport:
+    """Transport wywołujący MockGraphQLServer.respond() bez HTTP; zapamiętuje parametry zapytań."""
+
+    def __init__(self, server, fail_when=None):
+        """
+        Args:
+            server (MockGraphQLServer): Serwer testowy (nie musi być uruchomiony).
+            fail_when (callable): Dla parametrów zapytania (dict) zwraca True, jeśli odpowiedzieć błędem 404.
+        """
+        self.server = server
+        self.fail_when = fail_when
+        self.requests = []
+
+    def post(self, url, json=None, timeout=None):
+        params = {param['key']: param['value'] for param in json['variables']['searchParameters']}
+        self.requests.append(params)
+        if self.fail_when is not None and self.fail_when(params):
+            return make_response(404, b'', reason='Not Found', url=url)
+        return make_response(200, _dumps(self.server.respond(json)), url=url)
+
+    def close(self):
+        pass
+
+
+def _dumps(obj):
+    return json.dumps(obj).encode('utf-8')
+
+
+@pytest.fixture
+def make_scraper():
+    """Fabryka scraperów na serwerze testowym w procesie (bez limitu tempa i ponowień)."""
+    created = []
+
+    def factory(server, database=None, fail_when=None, **kwargs):
+        scraper = OLXGraphQLScraper(
+            database=database if database is not None else FakeDatabase(),
+            rate_limiter=RateLimiter(rate=100000, burst=100000),
+            max_retries=0,
+            transport=InProcessTransport(server, fail_when),
+            **kwargs
+        )
+        created.append(scraper)
+        return scraper
+
+    yield factory
+    for scraper in created:
+        scraper.close()
+
+
+@pytest.fixture
+def mock_server():
+    """Fabryka serwerów testowych (gniazdo jest zamykane na końcu testu)."""
+    servers = []
+
+    def factory(**kwargs):
+        kwargs.setdefault('description_chars', 20)
+        kwargs.setdefault('photos', 1)
+        server = MockGraphQLServer(**kwargs)
+        servers.append(server)
+        return server
+
+    yield factory
+    for server in servers:
+        server._httpd.server_close()
@@ -0,0 +1,96 @@
+import json
+import sys
+
+import pytest
+
+from benchmarks import suite
+from transport import make_response
+
+
+def test_percentile_is_nearest_rank():
+    values = [5, 1, 4, 2, 3]
+
+    assert suite.percentile(values, 0.5) == 3
+    assert suite.percentile(values, 0.95) == 5
+    assert suite.percentile(values, 0.0) == 1
+    assert suite.percentile([], 0.5) is None
+
+
+def baseline(results):
+    return {'timestamp': '2025-01-01T00:00:00', 'git_commit': 'abc1234', 'results': results}
+
+
+def test_compare_flags_regressions_in_the_direction_of_each_metric():
+    previous = {
+        'scrape_recursive': {'requests_per_sec': 100.0, 'page_latency_p95_ms': 20.0, 'probe_count': 50,
+                             'requests': 1000},
+        'save_to_database': {'insert': {'rows_per_sec': 5000.0}},
+    }
+    current = {
+        'scrape_recursive': {'requests_per_sec': 85.0, 'page_latency_p95_ms': 21.0, 'probe_count': 60,
+                             'requests': 5000},
+        'save_to_database': {'insert': {'rows_per_sec': 7000.0}},
+    }
+
+    regressions = suite.compare(current, baseline(previous), threshold=0.10)
+
+    # Spadek przepustowości i wzrost liczby sprawdzeń ponad próg; 'requests' nie jest porównywane
+    assert [line.split(':')[0] for line in regressions] == [
+        'scrape_recursive.requests_per_sec', 'scrape_recursive.probe_count']
+
+
+def test_compare_skips_metrics_missing_from_baseline():
+    current = {'parse_listing': {'listings_per_sec': 10.0, 'decoder': 'json', 'complete': True}}
+
+    assert suite.compare(current, baseline({}), threshold=0.10) == []
+    assert suite.compare(current, baseline({'parse_listing': {'listings_per_sec': 0}}), threshold=0.10) == []
+
+
+class Session:
+    def post(self, url, json=None, timeout=None):
+        return make_response(200, b'x' * 100)
+
+    def close(self):
+        pass
+
+
+def test_timing_transport_reports_requests_by_projection():
+    timing = suite.TimingTransport({'full': 'Q_FULL', 'count': 'Q_COUNT'}, inner=Session())
+    for query in ['Q_FULL', 'Q_FULL', 'Q_COUNT', 'Q_INNE']:
+        timing.post('http://localhost/graphql', json={'query': query})
+
+    report = timing.report(elapsed=2.0)
+
+    assert report['requests'] == 4 and report['requests_per_sec'] == 2.0
+    assert report['probe_count'] == 2
+    assert report['requests_by_projection'] == {'count': 1, 'full': 2, 'other': 1}
+    assert report['bytes_received'] == 400
+    assert report['page_latency_p50_ms'] is not None
+
+
+def run_suite(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['suite', '--source', 'mock', '--no-db', '--total', '300', '--latency', '0',
+                                      '--rps', '100000', '--concurrency', '2', '--parse-listings', '200', *args])
+    suite.main()
+
+
+def test_suite_writes_results_and_compares_with_baseline(monkeypatch, tmp_path, capsys):
+    first = tmp_path / 'first.json'
+    run_suite(monkeypatch, '--output', str(first))
+
+    report = json.loads(first.read_text(encoding='utf-8'))
+    recursive = report['results']['scrape_recursive']
+    assert set(report['results']) == {'parse_listing', 'scrape_latest', 'scrape_recursive'}
+    assert recursive['listings'] == 300 and recursive['complete']
+    assert recursive['requests'] == sum(recursive['requests_by_projection'].values())
+
+    run_suite(monkeypatch, '--output', str(tmp_path / 'second.json'), '--baseline', str(first), '--threshold', '100')
+    assert 'Brak regresji' in capsys.readouterr().out
+
+    # Wynik gorszy od poprzedniego ponad próg kończy benchmark kodem 1
+    report['results']['scrape_recursive']['requests_per_sec'] = 1e12
+    first.write_text(json.dumps(report), encoding='utf-8')
+    with pytest.raises(SystemExit) as exit_info:
+        run_suite(monkeypatch, '--stages', 'recursive', '--output', str(tmp_path / 'third.json'),
+                  '--baseline', str(first))
+    assert exit_info.value.code == 1
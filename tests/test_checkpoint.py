@@ -0,0 +1,84 @@
+import pytest
+
+from checkpoint import CrawlCheckpoint
+from conftest import FakeDatabase
+from partitioner import PricePartitioner
+from pipeline import BatchWriter, ListingCollector
+from plan_cache import PartitionPlanCache
+
+CRAWL_KEY = PartitionPlanCache.make_key('rower', 767, None, 1.0, 100000.0)
+
+
+def crawl_tasks(scraper, tasks, target_results, offsets=None):
+    """Uruchamia kolejkę zakresów scrape_recursive (tryb sekwencyjny) z zapisem do bazy testowej."""
+    collector = ListingCollector(keep_listings=False)
+    writer = BatchWriter(scraper.db, batch_size=100, flush_interval=0.1).start()
+    try:
+        complete = scraper._crawl_tasks(collector, writer, PricePartitioner(), 'rower', target_results, 40, 767, None,
+                                        1, tasks, 'rower|767', offsets=offsets)
+    finally:
+        writer.close()
+    return collector, complete
+
+
+def test_resumed_offset_is_subtracted_from_range_cap_not_from_budget(make_scraper, mock_server):
+    server = mock_server(total=800)
+    scraper = make_scraper(server)
+    collector, _complete = crawl_tasks(scraper, [(1.0, 100000.0, 800)], target_results=100,
+                                       offsets={(1.0, 100000.0): 400})
+
+    # Budżet 100 ogłoszeń, wznowienie od offsetu 400: pobieramy strony od 400 do osiągnięcia budżetu
+    assert len(collector) >= 100
+    offsets = [int(params['offset']) for params in scraper.transport.requests]
+    assert offsets[0] == 400
+
+
+def make_checkpoint(tmp_path):
+    return CrawlCheckpoint(str(tmp_path / 'checkpoint.json'), interval_seconds=0.0)
+
+
+def resume_crawl(scraper, concurrency=1):
+    return scraper.scrape_recursive('rower', target_results=10000, category_id=767, initial_price_from=1.0,
+                                    initial_price_to=100000.0, concurrency=concurrency, keep_listings=False)
+
+
+@pytest.mark.parametrize('concurrency', [1, 3])
+def test_resume_continues_range_from_saved_offset(make_scraper, mock_server, tmp_path, concurrency):
+    checkpoint = make_checkpoint(tmp_path)
+    checkpoint.save(CRAWL_KEY, None, [(1.0, 100000.0, 800)], [], {(1.0, 100000.0): 400})
+    scraper = make_scraper(mock_server(total=800), checkpoint=checkpoint)
+
+    summary = resume_crawl(scraper, concurrency)
+
+    offsets = sorted(int(params['offset']) for params in scraper.transport.requests)
+    assert offsets == list(range(400, 800, 40))
+    assert summary['fetched'] == 400
+    assert summary['complete']
+
+
+@pytest.mark.parametrize('concurrency', [1, 3])
+def test_failures_before_resume_block_the_sweep(make_scraper, mock_server, tmp_path, concurrency):
+    checkpoint = make_checkpoint(tmp_path)
+    checkpoint.save(CRAWL_KEY, None, [(1.0, 100000.0, 800)], [], failures=1)
+    scraper = make_scraper(mock_server(total=800), checkpoint=checkpoint)
+
+    summary = resume_crawl(scraper, concurrency)
+
+    assert summary['fetched'] == 800
+    assert not summary['complete']
+    assert not scraper.last_crawl_complete
+
+
+def test_failures_are_stored_in_checkpoint_and_run(make_scraper, mock_server, tmp_path):
+    database = FakeDatabase()
+    database.current_run_id = 7
+    checkpoint = make_checkpoint(tmp_path)
+    # Druga strona pierwszego zakresu kończy się błędem; następny zakres wymusza zapis punktu kontrolnego
+    scraper = make_scraper(mock_server(total=800), database=database, checkpoint=checkpoint,
+                           fail_when=lambda params: params['offset'] == '40'
+                           and params['filter_float_price:to'] == '5000.00')
+    tasks = [(1.0, 5000.0, None), (5000.01, 100000.0, None)]
+    crawl_tasks(scraper, tasks, target_results=10000)
+
+    assert checkpoint.load('rower|767', run_id=7)['failures'] == 1
+    assert database.run_failures == 1
@@ -0,0 +1,66 @@
+import pytest
+
+from plan_cache import PartitionPlanCache
+
+PLAN_KEY = PartitionPlanCache.make_key('rower', 767, None, 1.0, 60000.0)
+
+
+def crawl(make_scraper, mock_server, tmp_path, target_results, concurrency):
+    plan_cache = PartitionPlanCache(str(tmp_path / 'plans.json'), ttl_seconds=3600)
+    scraper = make_scraper(mock_server(total=3000), plan_cache=plan_cache)
+    summary = scraper.scrape_recursive('rower', target_results=target_results, category_id=767,
+                                       initial_price_from=1.0, initial_price_to=60000.0, concurrency=concurrency,
+                                       keep_listings=False)
+    return scraper, summary, plan_cache.load(PLAN_KEY)
+
+
+@pytest.mark.parametrize('concurrency', [1, 3])
+def test_crawl_collecting_exactly_target_is_complete(make_scraper, mock_server, tmp_path, concurrency):
+    scraper, summary, plan = crawl(make_scraper, mock_server, tmp_path, 3000, concurrency)
+
+    assert summary['fetched'] == 3000
+    assert summary['complete'] and scraper.last_crawl_complete
+    assert sum(count for _lo, _hi, count in plan) == 3000
+
+
+@pytest.mark.parametrize('concurrency', [1, 3])
+def test_crawl_stopped_at_target_is_incomplete(make_scraper, mock_server, tmp_path, concurrency):
+    scraper, summary, plan = crawl(make_scraper, mock_server, tmp_path, 300, concurrency)
+
+    assert 300 <= summary['fetched'] < 3000
+    assert not summary['complete'] and not scraper.last_crawl_complete
+    assert plan is None
+
+
+@pytest.mark.parametrize('concurrency', [1, 3])
+def test_crawl_with_failed_page_is_incomplete(make_scraper, mock_server, tmp_path, concurrency):
+    plan_cache = PartitionPlanCache(str(tmp_path / 'plans.json'), ttl_seconds=3600)
+    scraper = make_scraper(mock_server(total=3000), plan_cache=plan_cache,
+                           fail_when=lambda params: params['offset'] == '80')
+    summary = scraper.scrape_recursive('rower', target_results=10000, category_id=767, initial_price_from=1.0,
+                                       initial_price_to=60000.0, concurrency=concurrency, keep_listings=False)
+
+    assert summary['fetched'] < 3000
+    assert not summary['complete'] and not scraper.last_crawl_complete
+
+
+def test_summary_reports_changes_of_this_crawl_only(make_scraper, mock_server):
+    scraper = make_scraper(mock_server(total=500))
+    scraper.db.save_totals['inserted'] = 1000
+
+    summary = scraper.scrape_recursive('rower', target_results=10000, category_id=767, initial_price_from=1.0,
+                                       initial_price_to=60000.0, keep_listings=False)
+
+    assert summary['changes'] == {'inserted': 500, 'changed': 0, 'unchanged': 0}
+
+
+@pytest.mark.parametrize('concurrency', [1, 3])
+@pytest.mark.parametrize('total', [500, 3000])
+def test_target_smaller_than_a_page_is_not_exceeded(make_scraper, mock_server, concurrency, total):
+    scraper = make_scraper(mock_server(total=total))
+    summary = scraper.scrape_recursive('rower', target_results=10, category_id=767, initial_price_from=1.0,
+                                       initial_price_to=60000.0, concurrency=concurrency, keep_listings=False)
+
+    assert summary['fetched'] == 10
+    assert len(scraper.db.saved) == 10
+    assert not summary['complete']
@@ -0,0 +1,125 @@
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from database import CopyRowsReader, _copy_text
+
+_COPY_ESCAPES = {'\\': '\\', 't': '\t', 'n': '\n', 'r': '\r'}
+
+
+def decode_copy_field(text):
+    """Dekoduje pole w formacie tekstowym COPY tak jak PostgreSQL (\\N to NULL)."""
+    if text == '\\N':
+        return None
+    return re.sub(r'\\(.)', lambda match: _COPY_ESCAPES.get(match.group(1), match.group(1)), text)
+
+
+def decode_text_array(text):
+    """Dekoduje literał tablicy TEXT[] (elementy w cudzysłowach albo NULL)."""
+    assert text[0] == '{' and text[-1] == '}'
+    items = []
+    position = 1
+    while position < len(text) - 1:
+        if text.startswith('NULL', position):
+            items.append(None)
+            position += 4
+        else:
+            assert text[position] == '"'
+            position += 1
+            item = []
+            while text[position] != '"':
+                if text[position] == '\\':
+                    position += 1
+                item.append(text[position])
+                position += 1
+            items.append(''.join(item))
+            position += 1
+        if text[position] == ',':
+            position += 1
+    return items
+
+
+def decode_rows(data):
+    """Dzieli strumień COPY na wiersze i pola (znaki nowej linii i tabulacji w wartościach są zakodowane)."""
+    assert data.endswith('\n')
+    return [[decode_copy_field(field) for field in line.split('\t')] for line in data[:-1].split('\n')]
+
+
+TRICKY_TEXTS = [
+    'zwykły tekst',
+    'ukośnik \\ w środku i na końcu \\',
+    'cudzysłów " i apostrof \'',
+    'tabulacja\tw środku',
+    'wiele\nlinii\r\nopisu',
+    '\\N',
+    '\\.',
+    'NULL',
+    '{nawiasy,i,przecinki}',
+    '',
+]
+
+
+@pytest.mark.parametrize('text', TRICKY_TEXTS)
+def test_text_round_trips(text):
+    encoded = _copy_text(text)
+    assert '\t' not in encoded and '\n' not in encoded and '\r' not in encoded
+    assert decode_copy_field(encoded) == text
+
+
+def test_none_and_booleans():
+    assert decode_copy_field(_copy_text(None)) is None
+    assert _copy_text(True) == 't' and _copy_text(False) == 'f'
+
+
+def test_text_array_round_trips_with_null_elements():
+    urls = TRICKY_TEXTS + [None]
+    decoded = decode_text_array(decode_copy_field(_copy_text(urls)))
+    assert decoded == urls
+    assert decode_text_array(decode_copy_field(_copy_text([]))) == []
+
+
+def test_json_params_round_trip():
+    params = json.dumps({'rozmiar': '28"', 'opis': 'a\\b\tc\nd', 'lista': [1, None, 'x']}, ensure_ascii=False)
+    assert json.loads(decode_copy_field(_copy_text(params))) == json.loads(params)
+
+
+def test_datetime_keeps_time_zone():
+    moment = datetime(2025, 6, 1, 12, 30, 15, 123456, tzinfo=timezone(timedelta(hours=2)))
+    assert datetime.fromisoformat(decode_copy_field(_copy_text(moment))) == moment
+
+
+ROWS = [
+    ('1', 'tytuł\tz tabulacją', None, ['a"b', None, 'c\\d'], True),
+    ('2', 'opis\nw dwóch liniach', 1999.5, [], False),
+    ('3', '', 0, None, True),
+]
+
+
+def test_rows_round_trip():
+    decoded = decode_rows(CopyRowsReader(ROWS).read())
+    assert [row[:3] for row in decoded] == [
+        ['1', 'tytuł\tz tabulacją', None],
+        ['2', 'opis\nw dwóch liniach', '1999.5'],
+        ['3', '', '0']
+    ]
+    assert decode_text_array(decoded[0][3]) == ['a"b', None, 'c\\d']
+    assert decode_text_array(decoded[1][3]) == [] and decoded[2][3] is None
+    assert [row[4] for row in decoded] == ['t', 'f', 't']
+
+
+@pytest.mark.parametrize('size', [1, 5, 17, 64, 10000])
+def test_read_in_chunks_matches_full_read(size):
+    expected = CopyRowsReader(ROWS).read()
+    reader = CopyRowsReader(ROWS)
+    chunks = []
+    while True:
+        chunk = reader.read(size)
+        if not chunk:
+            break
+        assert len(chunk) <= size
+        chunks.append(chunk)
+
+    assert ''.join(chunks) == expected
+    assert reader.read() == ''
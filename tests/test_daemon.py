@@ -0,0 +1,82 @@
+import pytest
+
+from daemon import full_pass, select_hot_ranges
+
+LEAVES = [(1.0, 500.0, 900), (500.01, 1000.0, 800), (1000.01, 2000.0, 950), (2000.01, 5000.0, 300)]
+
+
+def test_hot_ranges_ranked_by_activity_and_sorted_by_price():
+    selected = select_hot_ranges(LEAVES, [5, 40, 0, 12], max_ranges=2, max_results=10000)
+
+    assert selected == [(500.01, 1000.0, 800), (2000.01, 5000.0, 300)]
+
+
+def test_hot_ranges_respect_result_budget():
+    # Drugi najaktywniejszy zakres (950) nie mieści się w pozostałym budżecie - wybierany jest następny
+    selected = select_hot_ranges(LEAVES, [50, 2, 30, 20], max_ranges=4, max_results=1300)
+
+    assert selected == [(1.0, 500.0, 900), (2000.01, 5000.0, 300)]
+
+
+def test_hot_ranges_without_activity_prefer_largest_leaves():
+    selected = select_hot_ranges(LEAVES, None, max_ranges=2, max_results=10000)
+
+    assert selected == [(1.0, 500.0, 900), (1000.01, 2000.0, 950)]
+
+
+def test_hot_ranges_skip_empty_leaves():
+    assert select_hot_ranges([(1.0, 10.0, 0)], [100], max_ranges=5, max_results=1000) == []
+
+
+class RunDatabase:
+    """Rejestruje otwieranie i zamykanie przebiegów (crawl_runs)."""
+
+    def __init__(self):
+        self.finished = []
+
+    def resume_run(self, run_id):
+        return None
+
+    def start_run(self):
+        return 7
+
+    def finish_run(self, run_id, success=True):
+        self.finished.append((run_id, success))
+
+
+class Checkpoint:
+    run_id = None
+
+
+class InterruptedScraper:
+    """Scraper przerwany w trakcie crawla (np. KeyboardInterrupt z obsługi SIGTERM)."""
+
+    def __init__(self, checkpoint=None, error=KeyboardInterrupt):
+        self.checkpoint = checkpoint
+        self.error = error
+
+    def scrape_recursive(self, **kwargs):
+        if self.checkpoint is not None:
+            self.checkpoint.run_id = 7
+        raise self.error
+
+
+@pytest.mark.parametrize('error', [KeyboardInterrupt, RuntimeError])
+def test_interrupted_full_pass_marks_run_failed(error):
+    db = RunDatabase()
+
+    with pytest.raises(error):
+        full_pass(InterruptedScraper(error=error), db, Checkpoint())
+
+    assert db.finished == [(7, False)]
+
+
+def test_interrupted_full_pass_with_checkpoint_keeps_run_open():
+    db = RunDatabase()
+    checkpoint = Checkpoint()
+
+    with pytest.raises(KeyboardInterrupt):
+        full_pass(InterruptedScraper(checkpoint), db, checkpoint)
+
+    # Przebieg zostanie wznowiony z punktu kontrolnego
+    assert db.finished == []
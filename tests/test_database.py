@@ -0,0 +1,421 @@
+import collections
+import hashlib
+import json
+import re
+import threading
+from datetime import datetime
+from decimal import Decimal
+
+import psycopg2
+from psycopg2 import extensions
+
+import database
+from database import Database
+from listing_parser import dumps, parse_listing
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def execute(self, query, params=None):
+        self.conn.queries.append(query)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.queries = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def get_transaction_status(self):
+        return extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class FakePool:
+    """Zastępuje ThreadedConnectionPool (bez PostgreSQL)."""
+
+    def __init__(self, minconn, maxconn, **kwargs):
+        self.returned = []
+        self.idle = []
+
+    def getconn(self):
+        try:
+            return self.idle.pop()
+        except IndexError:
+            return FakeConnection()
+
+    def putconn(self, conn, close=False):
+        self.returned.append(conn)
+        if not close:
+            self.idle.append(conn)
+
+    def closeall(self):
+        pass
+
+
+def make_database(monkeypatch):
+    monkeypatch.setattr(database, 'ThreadedConnectionPool', FakePool)
+    monkeypatch.setattr(Database, 'setup_database', lambda self: None)
+    return Database(db_config={}, pool_min=1, pool_max=4)
+
+
+def test_connection_released_after_close_is_closed(monkeypatch):
+    db = make_database(monkeypatch)
+    conn = db.get_connection()
+    db.close()
+
+    db.release_connection(conn)
+
+    assert conn.closed
+    assert not db._last_used
+    # Slot puli został zwolniony - można pobrać tyle połączeń, ile wynosi pool_max
+    assert all(db.get_connection() is not None for _ in range(db.pool_max))
+
+
+def test_connections_are_returned_from_many_threads(monkeypatch):
+    db = make_database(monkeypatch)
+
+    def borrow():
+        for _ in range(200):
+            db.release_connection(db.get_connection())
+
+    threads = [threading.Thread(target=borrow) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(db._pool.returned) == 8 * 200
+
+
+def test_new_connection_is_not_health_checked(monkeypatch):
+    db = make_database(monkeypatch)
+    conn = db.get_connection()
+
+    assert conn.queries == []
+    db.release_connection(conn)
+    assert db.get_connection() is conn and conn.queries == []
+
+
+def test_idle_connection_is_health_checked(monkeypatch):
+    db = make_database(monkeypatch)
+    conn = db.get_connection()
+    db.release_connection(conn)
+    db._last_used[conn] -= Database.HEALTHCHECK_IDLE_SECONDS + 1
+
+    assert db.get_connection() is conn
+    assert conn.queries == ['SELECT 1']
+
+
+def test_idle_times_are_dropped_with_connections(monkeypatch):
+    db = make_database(monkeypatch)
+    conn = db.get_connection()
+    db.release_connection(conn)
+    assert len(db._last_used) == 1
+
+    db._pool.idle.clear()
+    db._pool.returned.clear()
+    del conn
+    assert len(db._last_used) == 0
+
+
+def hashed_listing(params):
+    listing = parse_listing({'id': 1, 'title': 'Rower', 'params': [{'key': 'price', 'value': {'value': 1999.0}}]})
+    return listing._replace(params=params)
+
+
+def test_content_hash_does_not_depend_on_json_encoding():
+    params = [{'key': 'frame', 'value': 'L "28"'}, {'key': 'weight', 'value': 1e16}]
+    encodings = [
+        json.dumps(params, ensure_ascii=False),
+        json.dumps(params, ensure_ascii=False, separators=(',', ':')),
+        '[{"key":"frame","value":"L \\"28\\""},{"key":"weight","value":1e16}]',  # zapis liczby jak w orjson
+    ]
+    hashes = {Database._content_hash(hashed_listing(encoded)) for encoded in encodings}
+    assert len(hashes) == 1
+
+
+def test_content_hash_matches_hashes_stored_before_orjson():
+    listing = hashed_listing(json.dumps([{'key': 'state', 'value': 'Używane'}], ensure_ascii=False))
+    stored = hashlib.md5(json.dumps(database._hashed_values(listing), default=str, ensure_ascii=False)
+                         .encode('utf-8')).hexdigest()
+
+    assert Database._content_hash(listing._replace(params=dumps([{'key': 'state', 'value': 'Używane'}]))) == stored
+    assert Database._content_hash(listing._replace(params=None)) != stored
+
+
+def make_listing(olx_id, **fields):
+    listing = parse_listing({'id': olx_id, 'title': 'Rower', 'description': 'Opis'})
+    fields.setdefault('price_value', 1999.0)
+    fields.setdefault('params', json.dumps([{'key': 'state', 'value': 'Używane'}], ensure_ascii=False))
+    return listing._replace(**fields)
+
+
+def test_content_hash_covers_only_mutable_fields():
+    listing = make_listing('1')
+    stored = Database._content_hash(listing)
+
+    assert Database._content_hash(listing._replace(scraped_at=None, user_is_online=True)) == stored
+    for column, value in [('price_value', 1899.0), ('title', 'Rower MTB'), ('description', 'Nowy opis'),
+                          ('photos_urls', ['https://img/1']), ('promoted', True), ('params', None)]:
+        assert column in database.HASHED_COLUMNS
+        assert Database._content_hash(listing._replace(**{column: value})) != stored
+
+
+def test_upsert_rewrites_mutable_columns_only_when_hash_changes():
+    clause = database.UPSERT_CONFLICT_CLAUSE
+    for column in database.HASHED_COLUMNS:
+        assert (f"{column} = CASE WHEN {database._CONTENT_CHANGED} THEN EXCLUDED.{column} ELSE listings.{column} END"
+                in clause)
+    # Kolumny spoza skrótu nie są aktualizowane, a niezmieniony wiersz tego przebiegu jest pomijany
+    assert 'user_name =' not in clause
+    assert f"WHERE {database._CONTENT_CHANGED}" in clause
+    assert 'RETURNING (xmax = 0) AS inserted' in clause
+
+
+class SaveCursor(FakeCursor):
+    """Kursor trybu masowego: zapamiętuje dane COPY, a scalenie zwraca wiersze RETURNING."""
+
+    def copy_expert(self, sql, file):
+        self.conn.copied.append(file.read())
+
+    def fetchall(self):
+        return self.conn.returning.pop(0)
+
+
+class SaveConnection(FakeConnection):
+    def __init__(self):
+        super().__init__()
+        self.copied = []
+        self.returning = []
+
+    def cursor(self):
+        return SaveCursor(self)
+
+    def commit(self):
+        pass
+
+
+def make_saving_database(monkeypatch, conn):
+    db = make_database(monkeypatch)
+    monkeypatch.setattr(db, 'get_connection', lambda: conn)
+    monkeypatch.setattr(db, 'release_connection', lambda released: None)
+    return db
+
+
+def test_save_counts_rows_returned_by_upsert(monkeypatch):
+    db = make_saving_database(monkeypatch, SaveConnection())
+    db.current_run_id = 5
+    listings = [make_listing(str(i)) for i in range(4)]
+    calls = []
+
+    def execute_values(cursor, query, values, fetch=False):
+        calls.append((query, values))
+        # Nowy, zmieniony, a dwa niezmienione pominięte przez WHERE (brak w RETURNING)
+        return [(True, True), (False, True)]
+
+    monkeypatch.setattr(database, 'execute_values', execute_values)
+
+    assert db.save_to_database(listings + listings[:1]) == 4
+    assert db.save_totals == {'inserted': 1, 'changed': 1, 'unchanged': 2}
+
+    query, values = calls[0]
+    assert database.UPSERT_CONFLICT_CLAUSE in query
+    hash_index = database.LISTING_COLUMNS.index('content_hash')
+    run_index = database.LISTING_COLUMNS.index('last_seen_run_id')
+    assert [row[hash_index] for row in values] == [Database._content_hash(listing) for listing in listings]
+    assert {row[run_index] for row in values} == {5}
+
+
+def test_bulk_copy_counts_rows_returned_by_each_batch(monkeypatch):
+    conn = SaveConnection()
+    conn.returning = [[(True, True), (True, True)], [(False, True)]]
+    db = make_saving_database(monkeypatch, conn)
+    db.bulk_copy = True
+    db.copy_batch_size = 2
+
+    assert db.save_to_database([make_listing(str(i)) for i in range(3)]) == 3
+    assert db.save_totals == {'inserted': 2, 'changed': 1, 'unchanged': 0}
+    assert len(conn.copied) == 2 and conn.copied[1].count('\n') == 1
+
+
+Column = collections.namedtuple('Column', 'name')
+
+
+class QueryCursor(FakeCursor):
+    """Kursor odczytu: zapamiętuje zapytania z parametrami i zwraca przygotowane wiersze."""
+
+    def execute(self, query, params=None):
+        self.conn.queries.append(query)
+        self.conn.params.append(params)
+        if self.conn.error is not None:
+            raise self.conn.error
+
+    @property
+    def description(self):
+        return [Column(name) for name in self.conn.columns]
+
+    def fetchall(self):
+        return self.conn.rows
+
+
+class QueryConnection(FakeConnection):
+    def __init__(self, columns=(), rows=(), error=None):
+        super().__init__()
+        self.columns = columns
+        self.rows = list(rows)
+        self.error = error
+        self.params = []
+        self.rolled_back = False
+
+    def cursor(self):
+        return QueryCursor(self)
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+def test_price_history_returns_price_changes_as_dicts(monkeypatch):
+    changed_at = datetime(2025, 6, 1, 12, 0)
+    conn = QueryConnection(['changed_at', 'price_value', 'previous_price', 'promoted', 'is_active'],
+                           [(changed_at, 2000, None, False, True), (changed_at, 1800, 2000, False, True)])
+    db = make_saving_database(monkeypatch, conn)
+
+    history = db.get_price_history(12345)
+
+    assert history == [
+        {'changed_at': changed_at, 'price_value': 2000, 'previous_price': None, 'promoted': False, 'is_active': True},
+        {'changed_at': changed_at, 'price_value': 1800, 'previous_price': 2000, 'promoted': False, 'is_active': True},
+    ]
+    assert conn.params == [('12345',)]
+    # Pierwsza obserwacja i zmiany ceny - bez wpisów o zmianie samego promowania lub aktywności
+    assert 'h.previous_price IS NULL OR h.price_value IS DISTINCT FROM h.previous_price' in conn.queries[0]
+
+
+def test_price_drops_use_partial_index_predicate(monkeypatch):
+    conn = QueryConnection(['olx_id', 'drop_pct'], [('1', 10.0)])
+    db = make_saving_database(monkeypatch, conn)
+
+    assert db.get_price_drops(days=2) == [{'olx_id': '1', 'drop_pct': 10.0}]
+    # Ten sam warunek co w indeksie częściowym idx_history_price_drops; LIMIT NULL oznacza brak limitu
+    assert 'WHERE h.price_value < h.previous_price' in conn.queries[0]
+    assert conn.params == [(2 * 86400, None)]
+
+
+def test_history_queries_return_empty_list_on_error(monkeypatch):
+    conn = QueryConnection(error=psycopg2.OperationalError('połączenie zerwane'))
+    db = make_saving_database(monkeypatch, conn)
+
+    assert db.get_price_history('1') == [] and db.get_price_drops() == []
+    assert conn.rolled_back
+
+
+def test_range_activity_keeps_range_order(monkeypatch):
+    conn = QueryConnection(['idx', 'changes'], [(1, 4), (2, 0), (3, 7)])
+    db = make_saving_database(monkeypatch, conn)
+
+    leaves = [(1.0, 500.0, 900), (500.01, 1000.0, 800), (1000.01, 2000.0, 950)]
+
+    assert db.get_range_activity(leaves, hours=6) == [4, 0, 7]
+    assert conn.params == [([1.0, 500.01, 1000.01], [500.0, 1000.0, 2000.0], 6 * 3600)]
+    assert db.get_range_activity([]) == []
+
+
+class SetupCursor(FakeCursor):
+    def fetchall(self):
+        return [(name,) for name in self.conn.triggers]
+
+
+class SetupConnection(FakeConnection):
+    def __init__(self, triggers):
+        super().__init__()
+        self.triggers = triggers
+
+    def cursor(self):
+        return SetupCursor(self)
+
+
+def created_triggers(triggers):
+    conn = SetupConnection(triggers)
+    Database._setup_history(None, conn.cursor())
+    return [query.split()[2] for query in conn.queries if query.split()[:2] == ['CREATE', 'TRIGGER']]
+
+
+def test_history_triggers_are_created_only_when_missing():
+    assert created_triggers([]) == ['trg_listing_history_insert', 'trg_listing_history_update']
+    assert created_triggers(['trg_listing_history_insert']) == ['trg_listing_history_update']
+    assert created_triggers(['trg_listing_history_insert', 'trg_listing_history_update']) == []
+
+
+def test_update_trigger_fires_for_the_columns_it_compares():
+    conn = SetupConnection([])
+    Database._setup_history(None, conn.cursor())
+    trigger = next(query for query in conn.queries if 'CREATE TRIGGER trg_listing_history_update' in query)
+
+    columns = re.search(r'AFTER UPDATE OF ([\w, ]+) ON listings', trigger).group(1).split(', ')
+    compared = re.findall(r'OLD\.(\w+) IS DISTINCT FROM NEW\.\1', trigger)
+    assert sorted(columns) == sorted(compared) == ['is_active', 'price_value', 'promoted', 'title']
+
+
+STATS_COLUMNS = ['by_region', 'by_bucket', 'location_region', 'bucket', 'total', 'active', 'inactive', 'avg_price',
+                 'promoted', 'min_created', 'max_created']
+
+
+def test_stats_map_grouping_sets(monkeypatch, capsys):
+    first, last = datetime(2025, 1, 1), datetime(2025, 6, 1)
+    rows = [
+        # Zbiór pusty (cała tabela), potem regiony i przedziały cen (GROUPING = 0 dla kolumny zbioru)
+        (False, False, None, None, 120, 100, 20, Decimal('2500.50'), 7, first, last),
+        (True, False, 'Mazowieckie', None, 30, 25, 5, Decimal('3000'), 2, first, last),
+        (True, False, 'Śląskie', None, 60, 50, 10, Decimal('2000'), 3, first, last),
+        (True, False, 'Opolskie', None, 4, 0, 4, None, 0, None, None),
+        (False, True, None, 3, 70, 60, 10, Decimal('4000'), 4, first, last),
+        (False, True, None, 1, 40, 30, 10, Decimal('1500'), 2, first, last),
+        (False, True, None, 0, 5, 5, 0, Decimal('0'), 0, first, last),
+        (False, True, None, None, 5, 5, 0, None, 1, first, last),
+    ]
+    conn = QueryConnection(STATS_COLUMNS, rows)
+    db = make_saving_database(monkeypatch, conn)
+
+    stats = db.get_stats(price_buckets=[5000, 1000, 3000])
+
+    assert conn.params == [([1000, 3000, 5000],)]
+    assert 'GROUPING SETS ((), (location_region), (bucket))' in conn.queries[0]
+    assert stats['total'] == 120 and stats['active'] == 100 and stats['inactive'] == 20
+    assert stats['avg_price'] == 2500.5 and stats['promoted'] == 7
+    assert (stats['min_created'], stats['max_created']) == (first, last)
+    # Regiony bez aktywnych ogłoszeń są pomijane; kolejność od największej liczby aktywnych
+    assert stats['by_region'] == [
+        {'region': 'Śląskie', 'active': 50, 'avg_price': 2000.0},
+        {'region': 'Mazowieckie', 'active': 25, 'avg_price': 3000.0},
+    ]
+    # Ceny poniżej pierwszego progu (bucket 0) i powyżej ostatniego są przedziałami otwartymi
+    assert stats['by_price_bucket'] == [
+        {'price_from': None, 'price_to': 1000, 'active': 5, 'avg_price': 0.0},
+        {'price_from': 1000, 'price_to': 3000, 'active': 30, 'avg_price': 1500.0},
+        {'price_from': 5000, 'price_to': None, 'active': 60, 'avg_price': 4000.0},
+    ]
+    assert 'Śląskie' in capsys.readouterr().out
+
+
+def test_stats_return_none_on_error(monkeypatch):
+    db = make_saving_database(monkeypatch, QueryConnection(error=psycopg2.OperationalError('brak tabeli')))
+
+    assert db.get_stats() is None
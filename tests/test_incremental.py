@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from conftest import FakeDatabase
+from mock_server import EPOCH
+from scraper import OLXGraphQLScraper
+
+QUERY_KEY = 'rower|767|None|None|None'
+
+
+def incremental(scraper, max_results):
+    return scraper.scrape_incremental('rower', max_results=max_results, category_id=767)
+
+
+def listing_times(listings, promoted=None):
+    return [OLXGraphQLScraper._listing_time(listing) for listing in listings
+            if promoted is None or listing.promoted == promoted]
+
+
+def test_watermark_moves_to_newest_listing_after_catching_up(make_scraper, mock_server):
+    database = FakeDatabase()
+    database.watermarks[QUERY_KEY] = EPOCH + timedelta(days=360)
+    scraper = make_scraper(mock_server(total=800), database=database)
+
+    saved = incremental(scraper, max_results=500)
+
+    assert 0 < saved < 500
+    assert database.watermarks[QUERY_KEY] == max(listing_times(database.saved))
+
+
+def test_watermark_is_kept_when_capped_before_reaching_it(make_scraper, mock_server):
+    database = FakeDatabase()
+    database.watermarks[QUERY_KEY] = EPOCH
+    scraper = make_scraper(mock_server(total=800), database=database)
+
+    assert incremental(scraper, max_results=100) == 100
+    assert database.watermarks[QUERY_KEY] == EPOCH
+
+
+def test_watermark_is_kept_when_a_page_fails(make_scraper, mock_server):
+    database = FakeDatabase()
+    database.watermarks[QUERY_KEY] = EPOCH
+    scraper = make_scraper(mock_server(total=800), database=database,
+                           fail_when=lambda params: params['offset'] == '80')
+
+    assert incremental(scraper, max_results=500) == 80
+    assert database.watermarks[QUERY_KEY] == EPOCH
+
+
+def test_first_capped_pass_marks_oldest_listing_fetched_in_order(make_scraper, mock_server):
+    database = FakeDatabase()
+    scraper = make_scraper(mock_server(total=800), database=database)
+
+    incremental(scraper, max_results=100)
+
+    assert database.watermarks[QUERY_KEY] == min(listing_times(database.saved, promoted=False))
@@ -0,0 +1,92 @@
+import re
+import sys
+
+import database
+from database import LISTING_COLUMNS, TIMESTAMP_COLUMNS, Database
+from listing import Listing
+from listing_parser import parse_listing
+
+RAW_LISTING = {
+    'id': 123, 'title': 'Rower', 'url': 'https://www.olx.pl/d/oferta/rower', 'description': 'Opis',
+    'created_time': '2025-06-01T12:00:00+02:00', 'business': True,
+    'params': [
+        {'key': 'price', 'value': {'__typename': 'PriceParam', 'value': 1999, 'label': '1 999 zł', 'currency': 'PLN'}},
+        {'key': 'state', 'name': 'Stan', 'value': {'__typename': 'GenericParam', 'label': 'Używane'}},
+    ],
+    'photos': [{'link': 'https://img/{width}x{height}'}],
+    'location': {'city': {'name': 'Kraków'}, 'region': {'name': 'Małopolskie'}},
+    'promotion': {'top_ad': True, 'options': ['bundle']},
+}
+
+
+def test_listing_fields_are_the_insert_columns_in_order():
+    assert LISTING_COLUMNS[:len(Listing._fields)] == list(Listing._fields)
+    assert LISTING_COLUMNS[len(Listing._fields):] == ['content_hash', 'is_active', 'last_seen_run_id']
+    assert TIMESTAMP_COLUMNS <= set(Listing._fields)
+
+
+def test_listing_values_need_no_field_mapping():
+    db = Database.__new__(Database)
+    db.current_run_id = 9
+    listing = parse_listing(RAW_LISTING)
+
+    values = db._listing_values(listing)
+
+    assert dict(zip(LISTING_COLUMNS, values)) == {
+        **listing._asdict(), 'content_hash': Database._content_hash(listing), 'is_active': True, 'last_seen_run_id': 9
+    }
+
+
+def test_parsed_listing_is_a_compact_record():
+    listing = parse_listing(RAW_LISTING)
+
+    assert isinstance(listing, Listing) and not hasattr(listing, '__dict__')
+    assert (listing.olx_id, listing.price_value, listing.location_city) == (123, 1999, 'Kraków')
+    assert listing.promoted and listing.promotion_options == ['bundle']
+    assert listing.photos_urls == ['https://img/1200x900']
+    assert listing.params == '[{"name":"Stan","key":"state","value":"Używane"}]'
+    assert sys.getsizeof(listing) < sys.getsizeof(listing._asdict())
+
+
+class SchemaCursor:
+    def __init__(self, queries):
+        self.queries = queries
+
+    def execute(self, query, params=None):
+        self.queries.append(query)
+
+    def fetchone(self):
+        return (False,)
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class SchemaConnection:
+    def __init__(self):
+        self.queries = []
+
+    def cursor(self):
+        return SchemaCursor(self.queries)
+
+    def commit(self):
+        pass
+
+
+def test_new_schema_has_a_column_for_every_listing_field(monkeypatch):
+    conn = SchemaConnection()
+    db = Database.__new__(Database)
+    monkeypatch.setattr(db, 'get_connection', lambda: conn, raising=False)
+    monkeypatch.setattr(db, 'release_connection', lambda released: None, raising=False)
+
+    db.setup_database()
+
+    create = next(query for query in conn.queries if 'CREATE TABLE listings' in query)
+    columns = set(re.findall(r'^\s*(\w+) [A-Z]', create.split('(', 1)[1], re.MULTILINE))
+    columns |= {match for query in conn.queries
+                for match in re.findall(r'ALTER TABLE listings ADD COLUMN IF NOT EXISTS (\w+)', query)}
+    assert set(LISTING_COLUMNS) <= columns
+    assert database.HASHED_COLUMNS and set(database.HASHED_COLUMNS) <= set(Listing._fields)
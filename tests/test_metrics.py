@@ -0,0 +1,70 @@
+import threading
+
+import metrics
+from transport import make_response
+
+
+def test_wire_bytes_prefer_encoded_length(make_scraper, mock_server):
+    scraper = make_scraper(mock_server(total=0))
+    response = make_response(200, b'x' * 5000, headers={'Content-Length': '120', 'Content-Encoding': 'gzip'})
+    assert scraper._wire_bytes(response) == 120
+    assert scraper._wire_bytes(make_response(200, b'x' * 5000)) == 5000
+
+
+def test_failed_requests_are_counted_from_many_threads(make_scraper, mock_server):
+    scraper = make_scraper(mock_server(total=0))
+
+    def fail_many():
+        for _ in range(10000):
+            scraper._count_failure()
+
+    threads = [threading.Thread(target=fail_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert scraper.failed_requests == 80000
+
+
+def test_registry_exposes_prometheus_text():
+    registry = metrics.Registry()
+    counter = registry.register(metrics.Counter('test_bytes', "Bajty.", ['phase']))
+    histogram = registry.register(metrics.Histogram('test_seconds', "Czas.", buckets=(0.1, 1.0)))
+    counter.inc(120, phase='page')
+    counter.inc(5, phase='say "hi"')
+    histogram.observe(0.5)
+    histogram.observe(2.0)
+
+    lines = registry.expose().splitlines()
+
+    assert '# TYPE test_bytes counter' in lines
+    assert 'test_bytes_total{phase="page"} 120.0' in lines
+    assert 'test_bytes_total{phase="say \\"hi\\""} 5.0' in lines
+    assert 'test_seconds_bucket{le="0.1"} 0.0' in lines
+    assert 'test_seconds_bucket{le="1.0"} 1.0' in lines
+    assert 'test_seconds_bucket{le="+Inf"} 2.0' in lines
+    assert 'test_seconds_sum 2.5' in lines
+    assert lines[-1] == '# EOF'
+
+
+def test_report_is_silent_without_metrics(capsys, monkeypatch):
+    monkeypatch.setattr(metrics, '_serving', False)
+    metrics.report('')
+
+    assert capsys.readouterr().out == ''
+
+
+def test_report_prints_summary_when_dumping(capsys, monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, '_serving', False)
+    path = tmp_path / 'metrics.prom'
+    metrics.report(str(path))
+
+    assert capsys.readouterr().out
+    assert '# TYPE' in path.read_text(encoding='utf-8')
+
+
+def test_report_prints_summary_when_serving(capsys, monkeypatch):
+    monkeypatch.setattr(metrics, '_serving', True)
+    metrics.report()
+
+    assert capsys.readouterr().out
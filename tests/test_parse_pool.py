@@ -0,0 +1,59 @@
+import json
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import listing_parser
+import parse_pool
+from mock_server import MockGraphQLServer
+from parse_pool import ParsePool
+
+
+def page_payload():
+    server = MockGraphQLServer(total=100, description_chars=20, photos=1)
+    server._httpd.server_close()
+    payload = {'query': '', 'variables': {'searchParameters': [{'key': 'offset', 'value': '0'},
+                                                               {'key': 'limit', 'value': '40'}]}}
+    return json.dumps(server.respond(payload)).encode('utf-8')
+
+
+def test_concurrent_first_calls_create_a_single_executor(monkeypatch):
+    created = []
+
+    class CountingExecutor(ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            created.append(self)
+            # Szersze okno wyścigu między sprawdzeniem a przypisaniem puli
+            threading.Event().wait(0.05)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(parse_pool, 'ProcessPoolExecutor', CountingExecutor)
+    payload = page_payload()
+    barrier = threading.Barrier(8)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(pool.parse(payload))
+
+    with ParsePool(2, min_bytes=0) as pool:
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(created) == 1
+    assert pool._executor is None
+    expected, _metadata = listing_parser.parse_page(payload)
+    assert len(results) == 8
+    # scraped_at to chwila parsowania - pozostałe pola muszą być identyczne
+    assert all([listing._replace(scraped_at=None) for listing in listings] ==
+               [listing._replace(scraped_at=None) for listing in expected] for listings, _metadata in results)
+
+
+def test_small_payloads_are_parsed_in_process(monkeypatch):
+    monkeypatch.setattr(parse_pool, 'ProcessPoolExecutor', None)
+    payload = page_payload()
+    with ParsePool(2, min_bytes=len(payload) + 1) as pool:
+        listings, metadata = pool.parse(payload)
+    assert len(listings) == 40 and metadata['total_elements'] == 100
@@ -0,0 +1,137 @@
+import math
+
+import pytest
+
+from partitioner import PricePartitioner
+
+
+def assert_disjoint_cover(pieces, price_from, price_to):
+    """Części pokrywają cały zakres co do grosza i nie mają wspólnych cen."""
+    assert pieces[0][0] == price_from
+    assert pieces[-1][1] == price_to
+    for (_lo, hi), (next_lo, _next_hi) in zip(pieces, pieces[1:]):
+        assert next_lo == PricePartitioner.next_price(hi)
+    for lo, hi in pieces:
+        assert lo <= hi
+
+
+def test_split_pieces_do_not_share_boundaries():
+    partitioner = PricePartitioner()
+    pieces = partitioner.split(1.0, 60000.0, 50000)
+    assert len(pieces) > 2
+    assert_disjoint_cover(pieces, 1.0, 60000.0)
+
+
+def test_split_of_two_price_range_puts_each_price_in_one_piece():
+    partitioner = PricePartitioner()
+    pieces = partitioner.split(2999.0, 2999.01, 4000)
+    assert pieces == [(2999.0, 2999.0), (2999.01, 2999.01)]
+
+
+def test_split_with_observed_spike_counts_spike_once():
+    partitioner = PricePartitioner()
+    partitioner.observe_prices([2999.0] * 4000 + [2500.0 + i * 0.5 for i in range(2000)])
+    pieces = partitioner.split(2500.0, 3500.0, 6000)
+    assert_disjoint_cover(pieces, 2500.0, 3500.0)
+    assert sum(1 for lo, hi in pieces if lo <= 2999.0 <= hi) == 1
+
+
+def test_merge_joins_only_adjacent_pieces_within_limit():
+    partitioner = PricePartitioner(limit=999)
+    merged = partitioner.merge([(1.0, 10.0, 300), (10.01, 20.0, 400), (20.01, 30.0, 400), (30.5, 40.0, 10)])
+    assert merged == [(1.0, 20.0, 700), (20.01, 30.0, 400), (30.5, 40.0, 10)]
+
+
+def test_observed_prices_use_bounded_memory():
+    partitioner = PricePartitioner()
+    for page in range(500):
+        partitioner.observe_prices(1000 + (page * 40 + i) % 9000 for i in range(40))
+    buckets = len(partitioner._buckets)
+    # Liczba kubełków zależy od rozpiętości cen, nie od liczby pobranych stron
+    assert buckets <= math.log(10000 / 1000) / math.log(PricePartitioner.SAMPLE_BUCKET_RATIO) + 1
+    partitioner.observe_prices([1500.0] * 10000)
+    assert len(partitioner._buckets) == buckets
+
+
+def test_can_split_is_exact_on_the_price_grid():
+    assert PricePartitioner.can_split(2999.0, 2999.01)
+    assert not PricePartitioner.can_split(2999.0, 2999.0)
+
+
+def test_plan_tasks_fill_gaps_without_overlap(make_scraper, mock_server):
+    scraper = make_scraper(mock_server(total=10))
+    cached = [(1.0, 500.0, 900), (500.01, 800.0, 900), (900.0, 1000.0, 10)]
+    tasks = scraper._plan_tasks(PricePartitioner(), cached, 1.0, 2000.0)
+    assert_disjoint_cover([(lo, hi) for lo, hi, _count in tasks], 1.0, 2000.0)
+
+
+def test_recursive_crawl_fetches_price_spike_once(make_scraper, mock_server):
+    server = mock_server(total=3000, spikes={2999.0: 1500})
+    scraper = make_scraper(server)
+    summary = scraper.scrape_recursive('rower', target_results=10000, category_id=767, initial_price_from=1.0,
+                                       initial_price_to=60000.0, keep_listings=False)
+
+    assert summary['fetched'] == 4500
+    assert summary['complete']
+    # Podział po stanie i regionie wykonuje się dla jednego zakresu zawierającego 2999.00
+    dimension_ranges = {
+        (params.get('filter_float_price:from'), params.get('filter_float_price:to'))
+        for params in scraper.transport.requests
+        if 'filter_enum_state[0]' in params or 'region_id' in params
+    }
+    assert dimension_ranges == {('2999.00', '2999.00')}
+
+
+@pytest.mark.parametrize('concurrency', [1, 3])
+def test_first_page_replaces_count_probes_for_ranges_that_fit(make_scraper, mock_server, concurrency):
+    server = mock_server(total=6000)
+    scraper = make_scraper(server)
+    summary = scraper.scrape_recursive('rower', target_results=10000, category_id=767, initial_price_from=1.0,
+                                       initial_price_to=60000.0, concurrency=concurrency, keep_listings=False)
+
+    assert summary['fetched'] == 6000
+    assert summary['complete']
+    # Zakres początkowy i części podziału (szacowane poniżej 2 limitów) sprawdza pierwsza strona (bez limit=1)
+    assert sum(1 for params in scraper.transport.requests if params['limit'] == '1') == 0
+    # Żadna strona nie jest pobierana dwa razy
+    pages = [(params['filter_float_price:from'], params['filter_float_price:to'], params['offset'])
+             for params in scraper.transport.requests if params['limit'] != '1']
+    assert len(pages) == len(set(pages))
+
+
+def test_estimate_uses_smallest_observed_range():
+    partitioner = PricePartitioner()
+    assert partitioner.estimate(1000.0, 2000.0) is None
+
+    partitioner.observe_count(1000.0, 2000.0, 5000)
+    partitioner.observe_count(1000.0, 1100.0, 300)
+    assert partitioner.estimate(1000.0, 2000.0) == pytest.approx(5000)
+    assert partitioner.estimate(1000.0, 1100.0) == pytest.approx(300)
+    # Sprawdzona część wchodzi swoją licznością, reszta (4700) według rozkładu a priori ~1/cena
+    assert partitioner.estimate(1000.0, 1500.0) == pytest.approx(300 + 4700 * math.log(1500 / 1100) /
+                                                                 math.log(2000 / 1100))
+    assert partitioner.estimate(1100.01, 2000.0) == pytest.approx(4700, rel=0.01)
+
+
+def probe_requests(make_scraper, mock_server, parent_count):
+    scraper = make_scraper(mock_server(total=2000))
+    partitioner = PricePartitioner()
+    if parent_count is not None:
+        partitioner.observe_count(1.0, 60000.0, parent_count)
+    first_page, count = scraper._probe_task(partitioner, 'rower', 767, 1.0, 30000.0)
+    return first_page, count, scraper.transport.requests
+
+
+def test_probe_task_counts_range_expected_to_split_again(make_scraper, mock_server):
+    first_page, count, requests = probe_requests(make_scraper, mock_server, parent_count=50000)
+
+    assert first_page is None and count > 999
+    assert [params['limit'] for params in requests] == ['1']
+
+
+@pytest.mark.parametrize('parent_count', [None, 2000])
+def test_probe_task_fetches_first_page_when_range_may_fit(make_scraper, mock_server, parent_count):
+    first_page, count, requests = probe_requests(make_scraper, mock_server, parent_count)
+
+    assert len(first_page) == 40 and count > 999
+    assert [params['limit'] for params in requests] == ['40']
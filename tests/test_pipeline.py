@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+
+from async_engine import AsyncCrawlEngine
+from pipeline import ListingCollector
+
+
+def listings(*olx_ids):
+    return [SimpleNamespace(olx_id=olx_id) for olx_id in olx_ids]
+
+
+@pytest.mark.parametrize('keep_listings', [True, False])
+def test_collector_returns_only_unseen_listings(keep_listings):
+    collector = ListingCollector(keep_listings=keep_listings)
+
+    assert [l.olx_id for l in collector.add_new(listings('900000001', '900000002', '900000001'))] == \
+        ['900000001', '900000002']
+    assert [l.olx_id for l in collector.add_new(listings('900000002', '900000003'))] == ['900000003']
+    assert len(collector) == 3
+
+
+def test_id_only_mode_keeps_sample_and_distinguishes_leading_zeros():
+    collector = ListingCollector(keep_listings=False)
+    collector.add_new(listings('123', '0123', 'abc', '123', '456'))
+
+    assert len(collector) == 4
+    assert [l.olx_id for l in collector.listings()] == ['123', '0123', 'abc']
+
+
+class RecordingWriter:
+    """Zamiast zapisu zapamiętuje rozmiar każdej przekazanej porcji ogłoszeń."""
+
+    def __init__(self):
+        self.puts = []
+
+    def put(self, listings):
+        self.puts.append(len(listings))
+
+
+def test_async_engine_hands_off_each_page_as_it_arrives(make_scraper, mock_server):
+    scraper = make_scraper(mock_server(total=500))
+    writer = RecordingWriter()
+    engine = AsyncCrawlEngine(scraper, concurrency=3, writer=writer, collector=ListingCollector(keep_listings=False))
+
+    engine.run('rower', 10000, 40, 767, None, [(1.0, 60000.0, None)])
+
+    assert len(engine.collector) == 500
+    assert sum(writer.puts) == 500
+    assert max(writer.puts) <= 40
+
+
+def test_limit_counts_new_listings_not_duplicates():
+    collector = ListingCollector(keep_listings=False)
+    collector.add_new(listings('1', '2', '3'))
+
+    new = collector.add_new(listings('1', '2', '3', '4', '5'), limit=4)
+
+    assert [listing.olx_id for listing in new] == ['4']
+    assert len(collector) == 4
+    assert collector.truncated
+
+
+def test_limit_reached_on_last_listing_does_not_truncate():
+    collector = ListingCollector()
+    collector.add_new(listings('1', '2'), limit=2)
+    assert len(collector) == 2 and not collector.truncated
@@ -0,0 +1,86 @@
+import json
+
+import plan_cache as plan_cache_module
+from plan_cache import PartitionPlanCache
+
+KEY = PartitionPlanCache.make_key('rower', 767, None, 1.0, 60000.0)
+LEAVES = [(500.01, 1000.0, 800), (1.0, 500.0, 900)]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+
+def make_cache(tmp_path, monkeypatch, ttl=3600):
+    clock = FakeClock()
+    monkeypatch.setattr(plan_cache_module, 'time', clock)
+    return PartitionPlanCache(str(tmp_path / 'plans' / 'plans.json'), ttl), clock
+
+
+def test_key_separates_search_parameters():
+    keys = {
+        KEY,
+        PartitionPlanCache.make_key('rower', 767, 'used', 1.0, 60000.0),
+        PartitionPlanCache.make_key('rower', 767, None, None, 60000.0),
+        PartitionPlanCache.make_key('rower', 768, None, 1.0, 60000.0),
+    }
+    assert len(keys) == 4
+    assert KEY == PartitionPlanCache.make_key('rower', 767, None, 1, 60000)
+
+
+def test_stored_plan_is_loaded_sorted_by_price(tmp_path, monkeypatch):
+    cache, _clock = make_cache(tmp_path, monkeypatch)
+    cache.store(KEY, LEAVES)
+
+    assert cache.load(KEY) == sorted(LEAVES)
+    assert cache.load(PartitionPlanCache.make_key('rower', 767, 'new', 1.0, 60000.0)) is None
+
+
+def test_plan_expires_after_ttl(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch, ttl=3600)
+    cache.store(KEY, LEAVES)
+
+    clock.now += 3600
+    assert cache.load(KEY) == sorted(LEAVES)
+    clock.now += 1
+    assert cache.load(KEY) is None
+
+
+def test_store_drops_expired_plans(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch, ttl=3600)
+    old_key = PartitionPlanCache.make_key('rower', 767, 'used', 1.0, 60000.0)
+    cache.store(old_key, LEAVES)
+    clock.now += 7200
+    cache.store(KEY, LEAVES)
+
+    with open(cache.path, encoding='utf-8') as f:
+        assert list(json.load(f)) == [KEY]
+
+
+def test_failed_write_keeps_previous_plan(tmp_path, monkeypatch):
+    cache, _clock = make_cache(tmp_path, monkeypatch)
+    cache.store(KEY, LEAVES)
+
+    def dump_and_crash(obj, f):
+        f.write('{"niedokończony')
+        raise OSError('brak miejsca na dysku')
+
+    monkeypatch.setattr(plan_cache_module.json, 'dump', dump_and_crash)
+    cache.store(KEY, [(1.0, 60000.0, 999)])
+
+    # Plik z planem jest podmieniany dopiero po pełnym zapisie pliku tymczasowego
+    assert cache.load(KEY) == sorted(LEAVES)
+
+
+def test_unreadable_file_means_no_plan(tmp_path, monkeypatch):
+    cache, _clock = make_cache(tmp_path, monkeypatch)
+    (tmp_path / 'plans').mkdir()
+    (tmp_path / 'plans' / 'plans.json').write_text('{"uszkodzony', encoding='utf-8')
+
+    assert cache.load(KEY) is None
+    cache.store(KEY, LEAVES)
+    assert cache.load(KEY) == sorted(LEAVES)
@@ -0,0 +1,110 @@
+import json
+import pstats
+import threading
+
+import pytest
+
+import listing_parser
+import profiling
+from profiling import StageProfiler
+from scraper import OLXGraphQLScraper
+
+
+class FakeClock:
+    """Zegar perf_counter przesuwany ręcznie przez mierzone funkcje."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(profiling, 'time', clock)
+    return clock
+
+
+def test_self_time_excludes_nested_stages(clock):
+    profiler = StageProfiler()
+
+    def parse():
+        clock.now += 0.25
+
+    parse = profiler.wrap(parse, 'parse')
+
+    def search():
+        clock.now += 1.0
+        parse()
+        parse()
+
+    profiler.wrap(search, 'search')()
+
+    stages = {row['stage']: row for row in profiler.summary()['stages']}
+    assert (stages['search']['calls'], stages['search']['total_seconds'], stages['search']['self_seconds']) == (
+        1, 1.5, 1.0)
+    assert (stages['parse']['calls'], stages['parse']['total_seconds'], stages['parse']['self_seconds']) == (
+        2, 0.5, 0.5)
+    assert stages['parse']['avg_ms'] == 250.0
+    assert profiler.stacks == {'search': 1.0, 'search;parse': 0.5}
+
+
+def test_stage_stacks_are_kept_per_thread():
+    profiler = StageProfiler()
+    barrier = threading.Barrier(2)
+    inner = profiler.wrap(barrier.wait, 'inner')
+
+    threads = [threading.Thread(target=profiler.wrap(inner, name)) for name in ('thread_a', 'thread_b')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert set(profiler.stacks) == {'thread_a', 'thread_a;inner', 'thread_b', 'thread_b;inner'}
+
+
+def test_exception_is_recorded_and_propagated(clock):
+    profiler = StageProfiler()
+
+    def fail():
+        clock.now += 2.0
+        raise ValueError('błąd')
+
+    with pytest.raises(ValueError):
+        profiler.wrap(fail, 'fail')()
+    assert profiler.stages['fail'] == [1, 2.0, 2.0]
+
+
+def test_uninstall_restores_hooked_functions():
+    search = OLXGraphQLScraper.__dict__['search']
+    parse_listing = listing_parser.parse_listing
+
+    profiler = profiling.install()
+    assert OLXGraphQLScraper.__dict__['search'] is not search
+    assert listing_parser.parse_listing is not parse_listing
+    profiler.uninstall()
+
+    assert OLXGraphQLScraper.__dict__['search'] is search
+    assert listing_parser.parse_listing is parse_listing
+
+
+def test_profiled_crawl_reports_stages(make_scraper, mock_server, tmp_path):
+    scraper = make_scraper(mock_server(total=200))
+    profiler = profiling.install(cprofile=True)
+    try:
+        listings = scraper.scrape_latest('rower', max_results=200, batch_size=40, category_id=767)
+    finally:
+        profiler.report(str(tmp_path), 'test')
+
+    summary = json.loads((tmp_path / 'test-stages.json').read_text(encoding='utf-8'))
+    calls = {row['stage']: row['calls'] for row in summary['stages']}
+    assert calls['search'] == len(scraper.transport.requests)
+    assert calls['parse_listing'] == 200 == listings
+    folded = dict(line.rsplit(' ', 1) for line in (tmp_path / 'test-stages.folded').read_text(
+        encoding='utf-8').splitlines())
+    # Dekodowanie JSON mierzone wewnątrz zapytania, parsowanie dat wewnątrz parse_listing
+    assert {'search', 'search;json_decode', 'parse_listing', 'parse_listing;parse_timestamp'} <= set(folded)
+    assert all(microseconds.isdigit() for microseconds in folded.values())
+    assert pstats.Stats(str(tmp_path / 'test.prof')).total_calls > 0
@@ -0,0 +1,99 @@
+import re
+
+import pytest
+
+import config
+from conftest import InProcessTransport, _dumps
+from transport import make_response
+
+
+def selection(query):
+    """Drzewo pól zapytania GraphQL ({pole: poddrzewo albo None}); fragmenty '... on Typ' są scalane."""
+    text = re.sub(r'\([^()]*\)', '', query)
+    tokens = re.findall(r'\.\.\.\s*on\s+\w+|\w+|[{}]', text)
+    assert tokens[:3] == ['query', tokens[1], '{']
+
+    def parse(i):
+        fields = {}
+        while tokens[i] != '}':
+            if tokens[i].startswith('...'):
+                fragment, i = parse(i + 2)
+                for name, sub in fragment.items():
+                    fields[name] = {**(fields.get(name) or {}), **sub} if sub else sub
+                continue
+            name = tokens[i]
+            i += 1
+            sub = None
+            if tokens[i] == '{':
+                sub, i = parse(i + 1)
+            fields[name] = {**(fields.get(name) or {}), **sub} if sub else sub
+        return fields, i + 1
+
+    return parse(3)[0]
+
+
+def project(value, fields):
+    """Zostawia w odpowiedzi tylko pola wybrane przez zapytanie (jak serwer GraphQL)."""
+    if fields is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, fields) for item in value]
+    if isinstance(value, dict):
+        return {name: project(item, fields[name]) for name, item in value.items() if name in fields}
+    return value
+
+
+class ProjectingTransport(InProcessTransport):
+    """Odpowiada tylko polami z projekcji zapytania i zapamiętuje nazwy wysłanych zapytań."""
+
+    def __init__(self, server):
+        super().__init__(server)
+        self.operations = []
+
+    def post(self, url, json=None, timeout=None):
+        params = {param['key']: param['value'] for param in json['variables']['searchParameters']}
+        self.requests.append(params)
+        self.operations.append((json['query'].split()[1].split('(')[0], params))
+        response = self.server.respond(json)
+        return make_response(200, _dumps({'data': project(response['data'], selection(json['query']))}), url=url)
+
+
+def test_trimmed_projections_select_subsets_of_the_full_query():
+    full = selection(config.GRAPHQL_QUERY)['clientCompatibleListings']
+    count = selection(config.GRAPHQL_COUNT_QUERY)['clientCompatibleListings']
+    price = selection(config.GRAPHQL_PRICE_QUERY)['clientCompatibleListings']
+    region = selection(config.GRAPHQL_REGION_QUERY)['clientCompatibleListings']
+
+    assert 'data' not in count and set(count['metadata']) == {'total_elements', 'visible_total_count'}
+    assert set(price['data']) == {'id', 'promotion', 'params'} and set(price['data']['promotion']) == {'top_ad'}
+    assert set(price['data']['params']['value']) == {'__typename', 'value', 'currency', 'negotiable', 'label'}
+    assert set(region['data']) == {'id', 'location'} and set(region['data']['location']) == {'region'}
+
+    def is_subset(part, whole):
+        return all(name in whole and (sub is None or is_subset(sub, whole[name] or {})) for name, sub in part.items())
+
+    for trimmed in (count, price, region):
+        assert is_subset(trimmed, full)
+
+
+@pytest.mark.parametrize('concurrency', [1, 3])
+def test_crawl_phases_work_with_their_trimmed_projections(make_scraper, mock_server, monkeypatch, concurrency):
+    monkeypatch.setattr(config, 'OLX_REGION_IDS', [])
+    server = mock_server(total=3000, spikes={2999.0: 2500})
+    scraper = make_scraper(server)
+    scraper.transport = ProjectingTransport(server)
+
+    # Bez górnej granicy cena maksymalna jest szukana zapytaniem z projekcją ceny
+    summary = scraper.scrape_recursive('rower', target_results=10000, category_id=767, initial_price_from=1.0,
+                                       initial_price_to=None, concurrency=concurrency, keep_listings=False)
+
+    assert summary['fetched'] == 5500 and summary['complete']
+    operations = scraper.transport.operations
+    # Ceny graniczne, sprawdzenia liczności i odkrywanie regionów używają własnych projekcji
+    assert [params['sort_by'] for name, params in operations if name == 'ListingPriceQuery'] == [
+        'filter_float_price:desc']
+    assert all(params['limit'] == '1' for name, params in operations if name == 'ListingCountQuery')
+    assert any(name == 'ListingCountQuery' for name, _params in operations)
+    assert any(name == 'ListingRegionQuery' for name, _params in operations)
+    # Pełna projekcja tylko dla stron z ogłoszeniami
+    assert all(params['limit'] != '1' for name, params in operations if name == 'ListingSearchQuery')
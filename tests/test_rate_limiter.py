@@ -0,0 +1,48 @@
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from rate_limiter import RateLimiter
+
+
+def test_throttle_halves_rate_and_success_recovers_to_maximum():
+    limiter = RateLimiter(rate=8.0, burst=2, min_rate=1.0, backoff_base=0.0)
+
+    limiter.on_throttle()
+    assert limiter.rate == 4.0
+    for _ in range(5):
+        limiter.on_throttle()
+    assert limiter.rate == 1.0
+
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.rate == 8.0
+
+
+def test_burst_is_served_immediately_then_rate_applies():
+    limiter = RateLimiter(rate=50.0, burst=5)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    assert time.monotonic() - start < 0.05
+
+    for _ in range(5):
+        limiter.acquire()
+    assert time.monotonic() - start >= 5 / 50.0 * 0.8
+
+
+def test_throttle_blocks_for_retry_after():
+    limiter = RateLimiter(rate=1000.0, burst=10, backoff_base=0.0)
+    delay = limiter.on_throttle(retry_after=0.1)
+    start = time.monotonic()
+    limiter.acquire()
+    assert delay == 0.1
+    assert time.monotonic() - start >= 0.09
+
+
+def test_parse_retry_after_accepts_seconds_and_http_dates():
+    assert RateLimiter.parse_retry_after('7') == 7.0
+    assert RateLimiter.parse_retry_after(None) is None
+    assert RateLimiter.parse_retry_after('soon') is None
+    in_a_minute = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60), usegmt=True)
+    assert 55 <= RateLimiter.parse_retry_after(in_a_minute) <= 60
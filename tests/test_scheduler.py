@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+import scheduler as scheduler_module
+from scheduler import Scheduler, Tier
+
+
+class FakeClock:
+    """Zegar monotoniczny przesuwany ręcznie (zamiast modułu time w scheduler)."""
+
+    strftime = staticmethod(time.strftime)
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler_module, 'time', clock)
+    return clock
+
+
+def test_first_run_and_next_run_after_success(clock):
+    tier = Tier('incremental', 900, lambda: None, first_run_in=60)
+    assert tier.next_run == 1060
+
+    clock.now = 1060
+    assert Scheduler([tier]).run_tier(tier)
+    assert tier.next_run == 1060 + 900 and tier.runs == 1
+
+
+def test_next_run_counts_from_pass_start(clock):
+    def job():
+        clock.now += 300
+
+    tier = Tier('full', 3600, job)
+    Scheduler([tier]).run_tier(tier)
+
+    assert tier.next_run == 1000 + 3600
+
+
+def test_failed_pass_is_retried_no_later_than_interval(clock):
+    def job():
+        raise RuntimeError('błąd sieci')
+
+    short = Tier('incremental', 300, job)
+    long = Tier('full', 86400, job)
+    scheduler = Scheduler([short, long], retry_seconds=600)
+
+    assert not scheduler.run_tier(short) and not scheduler.run_tier(long)
+    assert short.next_run == 1000 + 300 and long.next_run == 1000 + 600
+    assert short.failures == long.failures == 1 and scheduler.running is None
+
+
+def test_overdue_tiers_run_by_priority(clock):
+    incremental = Tier('incremental', 900, lambda: None, first_run_in=0)
+    full = Tier('full', 86400, lambda: None, priority=2, first_run_in=10)
+    scheduler = Scheduler([incremental, full])
+
+    assert scheduler.next_tier() is incremental
+    clock.now += 20
+    # Oba zaległe - wygrywa wyższy priorytet, nie wcześniejszy termin
+    assert scheduler.next_tier() is full
+
+
+def test_successful_pass_postpones_covered_tier(clock):
+    full = Tier('full', 86400, lambda: None, covers=('revalidate',))
+    revalidate = Tier('revalidate', 4 * 3600, lambda: None, first_run_in=60)
+    scheduler = Scheduler([full, revalidate])
+
+    scheduler.run_tier(full)
+    assert revalidate.next_run == 1000 + 4 * 3600
+
+
+def test_failed_pass_does_not_postpone_covered_tier(clock):
+    def job():
+        raise RuntimeError('błąd')
+
+    full = Tier('full', 86400, job, covers=('revalidate',))
+    revalidate = Tier('revalidate', 4 * 3600, lambda: None, first_run_in=60)
+    Scheduler([full, revalidate]).run_tier(full)
+
+    assert revalidate.next_run == 1060
@@ -0,0 +1,53 @@
+import threading
+
+from conftest import FakeDatabase
+from rate_limiter import RateLimiter
+from scraper import OLXGraphQLScraper
+
+
+def make_live_scraper(server, pool_size=10):
+    """Scraper wysyłający zapytania przez własną sesję HTTP do uruchomionego serwera testowego."""
+    scraper = OLXGraphQLScraper(database=FakeDatabase(), pool_size=pool_size, max_retries=0,
+                                rate_limiter=RateLimiter(rate=100000, burst=100000), transport=None)
+    scraper.api_url = server.url
+    return scraper
+
+
+def connection_pools(scraper):
+    return list(scraper.session.get_adapter(scraper.api_url).poolmanager.pools._container.values())
+
+
+def test_session_shares_one_bounded_keep_alive_pool(make_scraper, mock_server):
+    scraper = make_scraper(mock_server(total=0), pool_size=3)
+    adapter = scraper.session.get_adapter('https://www.olx.pl/apigateway/graphql')
+
+    assert adapter is scraper.session.get_adapter('http://127.0.0.1/graphql')
+    assert adapter._pool_maxsize == 3 and adapter._pool_block
+    assert scraper.session.headers['Connection'] == 'keep-alive'
+    assert 'gzip' in scraper.session.headers['Accept-Encoding']
+
+
+def test_sequential_requests_reuse_one_connection(mock_server):
+    with mock_server(total=200).start() as server, make_live_scraper(server) as scraper:
+        for offset in range(0, 200, 40):
+            assert scraper.search('rower', offset=offset) is not None
+
+        pools = connection_pools(scraper)
+        assert server.requests_served == 5
+        assert len(pools) == 1 and pools[0].num_connections == 1
+
+
+def test_concurrent_requests_stay_within_pool_size(mock_server):
+    with mock_server(total=200, latency=0.01).start() as server, make_live_scraper(server, pool_size=2) as scraper:
+        def search_many():
+            for _ in range(5):
+                assert scraper.search('rower') is not None
+
+        threads = [threading.Thread(target=search_many) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert server.requests_served == 30
+        assert connection_pools(scraper)[0].num_connections <= 2
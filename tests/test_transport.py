@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from conftest import InProcessTransport
+from transport import (TRANSPORT_LIVE, TRANSPORT_RECORD, TRANSPORT_REPLAY, RecordingTransport, ReplayTransport,
+                       create_transport, make_response, request_key)
+
+URL = 'https://www.olx.pl/apigateway/graphql'
+
+
+def payload(offset=0, query='rower'):
+    return {'query': 'query ListingSearchQuery { x }', 'variables': {'searchParameters': [
+        {'key': 'query', 'value': query}, {'key': 'offset', 'value': str(offset)}]}}
+
+
+class StaticSession:
+    """Sesja zwracająca zawsze tę samą odpowiedź."""
+
+    def __init__(self, response):
+        self.response = response
+        self.posts = 0
+
+    def post(self, url, json=None, timeout=None):
+        self.posts += 1
+        return self.response
+
+    def close(self):
+        pass
+
+
+def test_request_key_depends_on_content_not_key_order():
+    reordered = {'variables': payload()['variables'], 'query': payload()['query']}
+
+    assert request_key(payload()) == request_key(reordered)
+    assert request_key(payload()) != request_key(payload(offset=40))
+    assert request_key(payload()) != request_key(payload(query='rower górski'))
+
+
+def test_recorded_response_replays_status_body_and_kept_headers(tmp_path):
+    body = '{"data": {"opis": "zażółć \\\\ gęślą"}}'.encode('utf-8')
+    response = make_response(429, body, reason='Too Many Requests',
+                             headers={'Retry-After': '7', 'Content-Type': 'application/json', 'Set-Cookie': 'x=1'})
+    recorder = RecordingTransport(StaticSession(response), str(tmp_path))
+
+    assert recorder.post(URL, json=payload(), timeout=5) is response
+    assert os.listdir(tmp_path) == [f"{request_key(payload())}.json.gz"]
+
+    replayed = ReplayTransport(str(tmp_path)).post(URL, json=payload())
+    assert (replayed.status_code, replayed.reason, replayed.content) == (429, 'Too Many Requests', body)
+    assert dict(replayed.headers) == {'Retry-After': '7', 'Content-Type': 'application/json'}
+
+
+def test_missing_recording_is_a_404(tmp_path):
+    replay = ReplayTransport(str(tmp_path))
+
+    assert replay.post(URL, json=payload()).status_code == 404
+    assert replay.misses == 1
+
+
+def test_recording_again_overwrites_the_previous_response(tmp_path):
+    RecordingTransport(StaticSession(make_response(500, b'')), str(tmp_path)).post(URL, json=payload())
+    RecordingTransport(StaticSession(make_response(200, b'{}')), str(tmp_path)).post(URL, json=payload())
+
+    assert ReplayTransport(str(tmp_path)).post(URL, json=payload()).status_code == 200
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_replayed_crawl_matches_recorded_crawl(make_scraper, mock_server, tmp_path):
+    server = mock_server(total=1500)
+    recording = make_scraper(server)
+    recording.transport = RecordingTransport(InProcessTransport(server), str(tmp_path))
+    recorded = recording.scrape_recursive('rower', target_results=10000, category_id=767, initial_price_from=1.0,
+                                          initial_price_to=60000.0)
+
+    replaying = make_scraper(server)
+    replaying.transport = ReplayTransport(str(tmp_path))
+    replayed = replaying.scrape_recursive('rower', target_results=10000, category_id=767, initial_price_from=1.0,
+                                          initial_price_to=60000.0)
+
+    assert replaying.last_crawl_complete and replaying.transport.misses == 0
+    assert [listing.olx_id for listing in replayed] == [listing.olx_id for listing in recorded]
+    assert len(replayed) == 1500
+
+
+def test_create_transport_modes(tmp_path):
+    session = StaticSession(None)
+
+    assert create_transport(session, TRANSPORT_LIVE) is session
+    assert isinstance(create_transport(session, TRANSPORT_RECORD, str(tmp_path / 'nagrania')), RecordingTransport)
+    assert isinstance(create_transport(session, TRANSPORT_REPLAY, str(tmp_path)), ReplayTransport)
+    with pytest.raises(ValueError):
+        create_transport(session, 'ftp')
@@ -0,0 +1,45 @@
+import pytest
+
+
+def dimension_ranges(scraper):
+    """Zakresy cen, dla których użyto podziału po stanie lub regionie."""
+    return {
+        (params.get('filter_float_price:from'), params.get('filter_float_price:to'))
+        for params in scraper.transport.requests
+        if 'filter_enum_state[0]' in params or 'region_id' in params
+    }
+
+
+@pytest.mark.parametrize('concurrency', [1, 3])
+def test_two_price_range_is_split_by_price_before_dimensions(make_scraper, mock_server, concurrency):
+    server = mock_server(total=0, spikes={2999.0: 1200, 2999.01: 1100})
+    scraper = make_scraper(server)
+    summary = scraper.scrape_recursive('rower', target_results=10000, category_id=767, initial_price_from=2999.0,
+                                       initial_price_to=2999.01, concurrency=concurrency, keep_listings=False)
+
+    assert summary['fetched'] == 2300
+    assert summary['complete']
+    assert dimension_ranges(scraper) == {('2999.00', '2999.00'), ('2999.01', '2999.01')}
+
+
+def test_single_price_spike_is_fully_covered(make_scraper, mock_server):
+    server = mock_server(total=0, spikes={1999.0: 2500})
+    scraper = make_scraper(server)
+    summary = scraper.scrape_recursive('rower', target_results=10000, category_id=767, initial_price_from=1999.0,
+                                       initial_price_to=1999.0, keep_listings=False)
+    assert summary['fetched'] == 2500
+    assert len({listing.olx_id for listing in scraper.db.saved}) == 2500
+
+
+@pytest.mark.parametrize('concurrency', [1, 3])
+def test_subset_above_two_offset_limits_makes_crawl_incomplete(make_scraper, mock_server, monkeypatch, concurrency):
+    # Region bez ogłoszeń - podział po regionie nic nie daje, zostaje sortowanie (do 2 * 999 na podzbiór stanu)
+    monkeypatch.setattr('config.OLX_REGION_IDS', [99])
+    server = mock_server(total=0, spikes={1999.0: 5000})
+    scraper = make_scraper(server)
+    summary = scraper.scrape_recursive('rower', target_results=10000, category_id=767, initial_price_from=1999.0,
+                                       initial_price_to=1999.0, concurrency=concurrency, keep_listings=False)
+
+    assert summary['fetched'] < 5000
+    assert scraper.coverage_shortfalls == 1
+    assert not summary['complete'] and not scraper.last_crawl_complete
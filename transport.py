@@ -0,0 +1,156 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+import requests
+
+# post() przyjmuje argument 'json' (jak requests.Session.post), który przesłania nazwę modułu
+_json = json
+
+# Tryby transportu HTTP scrapera (config.HTTP_TRANSPORT)
+TRANSPORT_LIVE = 'live'
+TRANSPORT_RECORD = 'record'
+TRANSPORT_REPLAY = 'replay'
+TRANSPORT_MOCK = 'mock'
+
+
+def request_key(payload):
+    """Klucz nagrania: skrót zapytania GraphQL wraz z parametrami wyszukiwania."""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+def make_response(status_code, content, reason='OK', headers=None, url=None):
+    """Buduje obiekt requests.Response z zapisanych danych (tak, jakby przyszedł z sieci)."""
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = reason
+    response._content = content
+    response.headers.update(headers or {})
+    response.url = url
+    response.encoding = 'utf-8'
+    return response
+
+
+class RecordingTransport:
+    """
+    Wysyła zapytania przez prawdziwą sesję HTTP i zapisuje każdą odpowiedź na dysk.
+
+    Każda odpowiedź trafia do osobnego pliku '<katalog>/<klucz>.json.gz' (gzip), gdzie klucz
+    to skrót zapytania i parametrów wyszukiwania (request_key). Ponowne zapytanie o te same
+    parametry nadpisuje nagranie.
+    """
+
+    # Nagłówki odpowiedzi istotne dla scrapera (limiter zapytań)
+    KEPT_HEADERS = ('Retry-After', 'Content-Type')
+
+    def __init__(self, session, directory):
+        """
+        Args:
+            session (requests.Session): Sesja używana do prawdziwych zapytań.
+            directory (str): Katalog nagrań.
+        """
+        self.session = session
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def post(self, url, json=None, timeout=None):
+        response = self.session.post(url, json=json, timeout=timeout)
+        record = {
+            'request': json,
+            'status_code': response.status_code,
+            'reason': response.reason,
+            'headers': {name: response.headers[name] for name in self.KEPT_HEADERS if name in response.headers},
+            'body': response.content.decode('utf-8', errors='replace')
+        }
+        path = os.path.join(self.directory, f"{request_key(json)}.json.gz")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            _json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+class ReplayTransport:
+    """
+    Odtwarza odpowiedzi nagrane przez RecordingTransport, bez dostępu do sieci.
+    Zapytanie, którego nie nagrano, dostaje odpowiedź 404 (scraper traktuje je jak błąd HTTP, bez ponowień).
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): Katalog nagrań.
+        """
+        self.directory = directory
+        self.misses = 0
+
+    def post(self, url, json=None, timeout=None):
+        path = os.path.join(self.directory, f"{request_key(json)}.json.gz")
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                record = _json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return make_response(404, b'', reason='Not Recorded', url=url)
+
+        return make_response(
+            record['status_code'],
+            record['body'].encode('utf-8'),
+            reason=record.get('reason', 'OK'),
+            headers=record.get('headers'),
+            url=url
+        )
+
+    def close(self):
+        pass
+
+
+class MockServerTransport:
+    """
+    Kieruje zapytania sesji HTTP do lokalnego MockGraphQLServer (uruchamianego w tle)
+    zamiast do API OLX - pełna ścieżka HTTP, ale z syntetycznymi danymi.
+    """
+
+    def __init__(self, session, server):
+        """
+        Args:
+            session (requests.Session): Sesja HTTP scrapera.
+            server (MockGraphQLServer): Serwer testowy (zostanie uruchomiony).
+        """
+        self.session = session
+        self.server = server.start()
+
+    def post(self, url, json=None, timeout=None):
+        return self.session.post(self.server.url, json=json, timeout=timeout)
+
+    def close(self):
+        self.server.stop()
+        self.session.close()
+
+
+def create_transport(session, mode=TRANSPORT_LIVE, directory=None, mock_options=None):
+    """
+    Zwraca transport dla trybu z config.HTTP_TRANSPORT.
+
+    Args:
+        session (requests.Session): Sesja HTTP scrapera (używana w trybach 'live', 'record' i 'mock').
+        mode (str): 'live', 'record', 'replay' albo 'mock'.
+        directory (str): Katalog nagrań (tryby 'record' i 'replay').
+        mock_options (dict): Argumenty MockGraphQLServer (tryb 'mock'), np. {'total': 20000, 'latency': 0.05}.
+    """
+    if mode == TRANSPORT_LIVE:
+        return session
+    if mode == TRANSPORT_RECORD:
+        return RecordingTransport(session, directory)
+    if mode == TRANSPORT_REPLAY:
+        return ReplayTransport(directory)
+    if mode == TRANSPORT_MOCK:
+        from mock_server import MockGraphQLServer
+        return MockServerTransport(session, MockGraphQLServer(**(mock_options or {})))
+    raise ValueError(f"Nieznany tryb transportu HTTP: {mode}")